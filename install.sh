@@ -1,6 +1,10 @@
 # install Python library for the parser and lexer
 pip3 install rply
 
+# prebuild the parser table cache so that mini-js does not generate the
+# LALR table on its first launch
+python3 src/cache.py
+
 # export bin directory to system PATH variable
 echo "export PATH=\"`pwd`/bin:\$PATH\"" >> ~/.zshrc
 
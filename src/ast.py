@@ -5,7 +5,8 @@
 # main difference between expression and statements: interpret() function for
 # expressions returns, interpret() function for statement do not have to return.
 import sys
-import copy
+
+import rope
 
 
 class NotImplementedError(Exception):
@@ -33,60 +34,89 @@ class TypeError(Exception):
     pass
 
 
-# note that context uses the value of the identifier as the "key" to index the
-# dictionary
+# identifiers are resolved to (depth, slot) addresses by resolver.py before
+# the program is interpreted, a context stores the values of its scope in a
+# list of slots (None for identifiers that are not defined yet)
+# contexts form a scope chain: entering a scope (if, while, for) creates a
+# context that points to the context of the enclosing scope
 class Context(object):
-    def __init__(self, context={}, outerContext={}):
-        # by default, context will be initialized as an empty dictionary
-        self.context = context
-
-        # upperLevelContext stores the shallow copy of the context of the outer scope
-        # handles the case where an identifier is declared outside the scope and
-        # being modified within the scope
+    def __init__(self, slotCount=0, outerContext=None, output=None):
+        self.slots = [None] * slotCount
+
+        # stream print statements write to, inherited by nested contexts
+        # (None writes to sys.stdout)
+        if output is None and outerContext is not None:
+            output = outerContext.output
+        self.output = output
+
+        # outerContext is the context of the enclosing scope (None for the
+        # global scope). Identifiers declared outside the scope are looked up
+        # and modified through it
         self.outerContext = outerContext
 
     def add(self, identifier, value):
-        # update the current context
-        self.context.update({identifier.getValue(): value})
-
-        # if identifier (key) is defined in the outer context, also
-        # update the binding for the outer context
-        if (identifier.getValue() in self.getOuterContextIdentifierValues()):
-            self.outerContext.update({identifier.getValue(): value})
+        # if identifier is defined in an outer context, update the binding
+        # where it is defined, otherwise declare it in this scope
+        for depth, slot in identifier.addresses:
+            ctx = self
+            while depth:
+                ctx = ctx.outerContext
+                depth -= 1
+            if ctx.slots[slot] is not None:
+                ctx.slots[slot] = value
+                return
+        self.slots[identifier.declareSlot] = value
 
     def lookup(self, identifier):
-        try:
-            return self.context[identifier.getValue()]
-        except KeyError:
-            raise ContextError(
-                "Identifier \"" + identifier.getValue() + "\" specified is not in the scope of the context!")
-
-    def getEmptyContext(self):
-        return Context()
-
-    def getContextDictionary(self):
-        return self.context
-
-    def copy(self, other):
-        # make the deep copy and a shallow of the context.
-        return Context(copy.deepcopy(other.getContextDictionary()), other.getContextDictionary())
+        for depth, slot in identifier.addresses:
+            ctx = self
+            while depth:
+                ctx = ctx.outerContext
+                depth -= 1
+            value = ctx.slots[slot]
+            if value is not None:
+                return value
+        raise ContextError(
+            "Identifier \"" + identifier.getValue() + "\" specified is not in the scope of the context!")
+
+    def getSlots(self):
+        return self.slots
+
+    def getOuterContext(self):
+        return self.outerContext
+
+    def getOutput(self):
+        if self.output is None:
+            return sys.stdout
+        return self.output
+
+    # enter a new scope nested in this one
+    def enterScope(self, slotCount):
+        return Context(slotCount, self)
 
     def __repr__(self):
-        return str(self.context)
+        return str(self.slots)
 
-    def getContextIdentifierValues(self):
-      return self.context.keys()
+class Node(object):
+    # the runtime values (Null, Number, String, Boolean) list their attributes
+    # in __slots__, the other nodes keep them in __dict__
+    __slots__ = ()
 
-    def getOuterContextIdentifierValues(self):
-      return self.outerContext.keys()
+    # line of the first token of the node in the program (set by the parser,
+    # None for nodes created while optimizing or interpreting)
+    lineno = None
 
-class Node(object):
         # equal operator overload
     def __eq__(self, other):
         if not isinstance(other, Node):
             return NotImplemented
-            # __dict__ contains object's symbol table
-        return (type(self) is type(other) and self.__dict__ == other.__dict__)
+        return (type(self) is type(other) and self.getFields() == other.getFields())
+
+    # the attributes of the node (name -> value)
+    def getFields(self):
+        if hasattr(self, "__dict__"):
+            return self.__dict__
+        return dict((name, getattr(self, name)) for name in self.__slots__)
 
     def isSubTypeOf(self, other):
         return type(self) is type(other)
@@ -98,12 +128,34 @@ class Node(object):
     def type(self):
         return type(self)
 
+    # indented listing of the tree, for debug purposes (interp.py --dump-ast)
+    def dump(self, indent=0):
+        padding = "  " * indent
+        lines = [padding + type(self).__name__]
+        if self.lineno is not None:
+            lines[0] += " (line " + str(self.lineno) + ")"
+        for name, value in self.getFields().items():
+            if name == "lineno":
+                continue
+            if isinstance(value, Node):
+                lines.append(padding + "  " + name + ":")
+                lines.append(value.dump(indent + 2))
+            elif isinstance(value, list):
+                lines.append(padding + "  " + name + ": [" + str(len(value)) + "]")
+                for element in value:
+                    lines.append(element.dump(indent + 2))
+            else:
+                lines.append(padding + "  " + name + ": " + repr(value))
+        return "\n".join(lines)
+
 # define Null type
 
 
 class Null(Node):
+    __slots__ = ("lineno",)
+
     def __init__(self):
-        pass
+        self.lineno = None
 
     def getString(self):
         return "null"
@@ -130,41 +182,48 @@ class Expr(Node):
 
 # number primitive, all numbers are floats
 class Number(Node):
+    __slots__ = ("value", "lineno")
+
     def __init__(self, value):
         self.value = value
+        self.lineno = None
 
     def __repr__(self):
         return "Number: " + self.getString()
 
     def add(self, other):
-        return Number(self.getValue() + other.getValue())
+        # a parenthesized operand is added without a type check (see
+        # BinaryOperator.interpret), a string is concatenated
+        if type(other) is String:
+            return concatenate(self, other)
+        return getNumber(self.getValue() + other.getValue())
 
     def minus(self, other):
-        return Number(self.getValue() - other.getValue())
+        return getNumber(self.getValue() - other.getValue())
 
     def multiply(self, other):
-        return Number(self.getValue() * other.getValue())
+        return getNumber(self.getValue() * other.getValue())
 
     def divide(self, other):
-        return Number(self.getValue() / other.getValue())
+        return getNumber(self.getValue() / other.getValue())
 
     def greater_than_or_equal_to(self, other):
-        return Boolean(self.getValue() >= other.getValue())
+        return getBoolean(self.getValue() >= other.getValue())
 
     def less_than_or_equal_to(self, other):
-        return Boolean(self.getValue() <= other.getValue())
+        return getBoolean(self.getValue() <= other.getValue())
 
     def greater_than(self, other):
-        return Boolean(self.getValue() > other.getValue())
+        return getBoolean(self.getValue() > other.getValue())
 
     def less_than(self, other):
-        return Boolean(self.getValue() < other.getValue())
+        return getBoolean(self.getValue() < other.getValue())
 
     def equal_to(self, other):
-        return Boolean(self.getValue() == other.getValue())
+        return getBoolean(self.getValue() == other.getValue())
 
-    def equal_to(self, other):
-        return Boolean(self.getValue() != other.getValue())
+    def not_equal_to(self, other):
+        return getBoolean(self.getValue() != other.getValue())
 
     def getValue(self):
         return self.value
@@ -176,13 +235,25 @@ class Number(Node):
         return self
 
 
-# string primitive
+# string primitive, the value is stored without the quotes of the literal
+# the value of a concatenation is a rope.Rope until its text is needed
 class String(Node):
+    __slots__ = ("value", "lineno")
+
     def __init__(self, value):
         self.value = value
+        self.lineno = None
+
+    def add(self, other):
+        if type(other) is not String and type(other) is not Number:
+            raise TypeError("Left Expression Type " + str(String) +
+                            " Does Not Match the Right Expression Type " + str(other.type()))
+        return concatenate(self, other)
 
     def getValue(self):
-        return self.value[1:-1]
+        if type(self.value) is not str:
+            self.value = rope.flatten(self.value)
+        return self.value
 
     def getString(self):
         return self.getValue()
@@ -193,24 +264,27 @@ class String(Node):
 
 # boolean primitive
 class Boolean(Node):
+    __slots__ = ("value", "lineno")
+
     def __init__(self, value):
         # the value of Boolean will just be python boolean
-        if (value == "true" or value == True):
+        if (value == True):
             self.value = True
-        if (value == "false" or value == False):
+        elif (value == False):
             self.value = False
+        self.lineno = None
 
     def boolean_or(self, other):
-        return Boolean(self.value or other.value)
+        return getBoolean(self.value or other.value)
 
     def boolean_and(self, other):
-        return Boolean(self.value and other.value)
+        return getBoolean(self.value and other.value)
 
     def equal_to(self, other):
-        return Boolean(self.value == other.value)
+        return getBoolean(self.value == other.value)
 
     def not_equal_to(self, other):
-        return Boolean(self.value != other.value)
+        return getBoolean(self.value != other.value)
 
     def getValue(self):
         return self.value
@@ -233,6 +307,43 @@ class Boolean(Node):
         return self
 
 
+# the runtime values true, false and null are shared, numbers with a small
+# integral value are cached (except 0, which may be -0.0)
+NULL = Null()
+TRUE = Boolean(True)
+FALSE = Boolean(False)
+SMALL_NUMBERS = dict((float(i), Number(float(i))) for i in range(-128, 1025) if i != 0)
+
+
+def getBoolean(value):
+    if value is True:
+        return TRUE
+    if value is False:
+        return FALSE
+    # e.g. "false || 1" with a parenthesized operand
+    return Boolean(value)
+
+
+def getNumber(value):
+    number = SMALL_NUMBERS.get(value)
+    if number is None:
+        return Number(value)
+    return number
+
+
+# operand types of "+" concatenating strings, numbers are converted to the
+# text print writes
+TEXT_TYPES = (String, Number)
+
+
+# String of the text of left followed by the text of right, the text of a
+# String is not joined (see rope.py)
+def concatenate(left, right):
+    leftText = left.value if type(left) is String else left.getString()
+    rightText = right.value if type(right) is String else right.getString()
+    return String(rope.concatenate(leftText, rightText))
+
+
 # identifier primitive
 class Identifier(Node):
     def __init__(self, name):
@@ -294,19 +405,6 @@ class BinaryOperator(Node):
         self.left = left
         self.right = right
 
-    def getLeftType(self):
-      return self.left.getValue().type()
-    
-    def getRightType(self):
-      return self.right.getValue().type()
-
-    def restoreSelfValues(self, leftIdentifierCache, rightIdentifierCache):
-        if (leftIdentifierCache != None):
-          self.left = leftIdentifierCache
-
-        if (rightIdentifierCache != None):
-          self.right = rightIdentifierCache
-
     def interpret(self, ctx):
         # Over all (Expr, Expr) -> (Expr))
         # Expr is the super type of Numbers, Strings and Booleans
@@ -319,101 +417,109 @@ class BinaryOperator(Node):
         # temporarily suspended type check as a hack for the parent expression
         # to-do add parentedExpr class to the AST and treat it different than other Exprs
         # in the parser wrap it with Expr class for getValue()
-        leftIdentifierCache = None
-        rightIdentifierCache = None
 
-        if (self.left.getValue().type() == Identifier):
+        # the operands are kept in local variables, the tree itself is never
+        # modified so that it can be interpreted again (loops, other threads)
+        left = self.left
+        right = self.right
+
+        if (left.getValue().type() == Identifier):
             # look up the value of the identifier, assign to the left hand side
             # wrap it with expression class so that getValue works for the expression
-            leftIdentifierCache = self.left
-            self.left = Expr(ctx.lookup(self.left.interpret(ctx)))
+            left = Expr(ctx.lookup(left.interpret(ctx)))
 
-        if (self.right.getValue().type() == Identifier):
+        if (right.getValue().type() == Identifier):
             # look up the value of the identifier, assign to the left hand side
             # wrap it with expression class so that getValue works for the expression
-            rightIdentifierCache = self.right
-            self.right = Expr(ctx.lookup(self.right.interpret(ctx)))
+            right = Expr(ctx.lookup(right.interpret(ctx)))
+
+        leftType = left.getValue().type()
+        rightType = right.getValue().type()
 
         result = None 
-        if (self.getLeftType() == self.getRightType() == Number or self.getLeftType() == ParentheseValue or self.getRightType() == ParentheseValue):
+        if (leftType == rightType == Number or leftType == ParentheseValue or rightType == ParentheseValue):
             # (Number, Number) -> Number
             if self.op == "+":
-                result = self.left.interpret(ctx).add(self.right.interpret(ctx))
+                result = left.interpret(ctx).add(right.interpret(ctx))
             elif self.op == "-":
-                result = self.left.interpret(ctx).minus(self.right.interpret(ctx))
+                result = left.interpret(ctx).minus(right.interpret(ctx))
             elif self.op == "*":
-                result = self.left.interpret(ctx).multiply(self.right.interpret(ctx))
+                result = left.interpret(ctx).multiply(right.interpret(ctx))
             elif self.op == "/":
-                result = self.left.interpret(ctx).divide(self.right.interpret(ctx))
+                result = left.interpret(ctx).divide(right.interpret(ctx))
 
             # (Number, Number) -> Boolean
             elif self.op == ">=":
-                result = self.left.interpret(ctx).greater_than_or_equal_to(self.right.interpret(ctx))
+                result = left.interpret(ctx).greater_than_or_equal_to(right.interpret(ctx))
             elif self.op == "<=":
-                result = self.left.interpret(ctx).less_than_or_equal_to(self.right.interpret(ctx))
+                result = left.interpret(ctx).less_than_or_equal_to(right.interpret(ctx))
             elif self.op == ">":
-                result = self.left.interpret(ctx).greater_than(self.right.interpret(ctx))
+                result = left.interpret(ctx).greater_than(right.interpret(ctx))
             elif self.op == "<":
-                result = self.left.interpret(ctx).less_than(self.right.interpret(ctx))
+                result = left.interpret(ctx).less_than(right.interpret(ctx))
 
             # duplicate function (Number/Boolean, Number/Boolean) -> Boolean
             # note that interpreter must make sure the consistency of type between the two sides of the operator
             elif self.op == "==":
-                result = self.left.interpret(ctx).equal_to(self.right.interpret(ctx))
+                result = left.interpret(ctx).equal_to(right.interpret(ctx))
             elif self.op == "!=":
-                result = self.left.interpret(ctx).not_equal_to(self.right.interpret(ctx))
+                result = left.interpret(ctx).not_equal_to(right.interpret(ctx))
 
             else:
                 raise NotImplementedError("Operator \"" + self.op + "\" is not implemented for Expression Type " +
-                                          str(self.left.getValue().type()) +
+                                          str(left.getValue().type()) +
                                           " and Expression Type " +
-                                          str(self.right.getValue().type()))
+                                          str(right.getValue().type()))
 
         # (Boolean, Boolean) -> Number/Boolean
-        elif (self.getLeftType() == self.getRightType() == Boolean or self.getLeftType() == ParentheseValue or self.getRightType() == ParentheseValue):
+        elif (leftType == rightType == Boolean or leftType == ParentheseValue or rightType == ParentheseValue):
             # (Boolean, Boolean) -> Boolean
             if self.op == "||":
                 # short circuit evaluation
                 # evaluate left side first
-                self.left = self.left.interpret(ctx)
-                if (self.left.isTrue()):
-                    result = Boolean(True)
+                leftValue = left.interpret(ctx)
+                if (leftValue.isTrue()):
+                    result = TRUE
                 # otherwise, return the fully evaluated clause
-                # since self.left has already been evaluated, no need to call interpret again
+                # since the left side has already been evaluated, no need to call interpret again
                 else:
-                  result = self.left.boolean_or(self.right.interpret(ctx))
+                  result = leftValue.boolean_or(right.interpret(ctx))
 
             elif self.op == "&&":
                 # supports short circuit evaluation
                 # evalute left side first
-                self.left = self.left.interpret(ctx)
-                if (self.left.isFalse()):
-                    result = Boolean(False)
+                leftValue = left.interpret(ctx)
+                if (leftValue.isFalse()):
+                    result = FALSE
                 # otherwise, return the fully evaluated clause
-                # since self.left has already been evaluated, no need to call interpret again
+                # since the left side has already been evaluated, no need to call interpret again
                 else:
-                  result = self.left.boolean_and(self.right.interpret(ctx))
+                  result = leftValue.boolean_and(right.interpret(ctx))
 
             # duplicate function (Number/Boolean, Number/Boolean) -> Boolean
             # note that interpreter must make sure the consistency of type between the two sides of the operator
             elif self.op == "==":
-                result = self.left.interpret(ctx).equal_to(self.right.interpret(ctx))
+                result = left.interpret(ctx).equal_to(right.interpret(ctx))
             elif self.op == "!=":
-                result = self.left.interpret(ctx).not_equal_to(self.right.interpret(ctx))
+                result = left.interpret(ctx).not_equal_to(right.interpret(ctx))
 
             else:
                 raise NotImplementedError("Operator \"" + self.op + "\" is not implemented for Expression Type " +
-                                          str(self.left.getValue().type()) +
+                                          str(left.getValue().type()) +
                                           " and Expression Type " +
-                                          str(self.right.getValue().type()))
+                                          str(right.getValue().type()))
+
+        # (String, String), (String, Number), (Number, String) -> String
+        elif (self.op == "+" and (leftType == String or rightType == String) and
+              leftType in TEXT_TYPES and rightType in TEXT_TYPES):
+            result = concatenate(left.interpret(ctx), right.interpret(ctx))
 
         else:
             raise TypeError("Left Expression Type " +
-                            str(self.left.getValue().type()) +
+                            str(left.getValue().type()) +
                             " Does Not Match the Right Expression Type " +
-                            str(self.right.getValue().type()))
+                            str(right.getValue().type()))
 
-        self.restoreSelfValues(leftIdentifierCache, rightIdentifierCache)
         return result
 
 class AssignmentExpression(Node):
@@ -423,27 +529,22 @@ class AssignmentExpression(Node):
 
     def interpret(self, ctx):
         # check if LHS is an identifier, raise error if it is not
-        cachedExpr = self.expr
-        self.identifier = self.identifier.interpret(ctx)
-        self.expr = self.expr.interpret(ctx)
+        identifier = self.identifier.interpret(ctx)
+        value = self.expr.interpret(ctx)
 
         # type check
         # left hand side has to be an identifier
-        if (self.identifier.type() != Identifier):
+        if (identifier.type() != Identifier):
             raise AssignmentError(
                 "LHS of assignment statement must be an identifier")
 
-        if (self.expr.type() == Identifier):
-            self.expr = ctx.lookup(self.expr)
+        if (value.type() == Identifier):
+            value = ctx.lookup(value)
 
         # general case
         # append the value of the expression to the lhs identifier
-
-        ctx.add(self.identifier, self.expr)
-
-        result = self.expr
-        self.expr = cachedExpr
-        return result
+        ctx.add(identifier, value)
+        return value
 
         # else:
         #     raise NotImplementedError("Assignment Expression is not implemented for Expression Type " +
@@ -462,19 +563,19 @@ class IfExpression(Node):
         self.if_body = if_body
 
     def interpret(self, ctx):
-        # make the deep copy and a shallow of the context since we are entering a different scope
-        ctx = ctx.copy(ctx)
+        # create a nested context since we are entering a different scope
+        ctx = ctx.enterScope(self.slotCount)
 
         # interpret condition and if_body
-        self.condition = self.condition.interpret(ctx)
+        condition = self.condition.interpret(ctx)
 
         # type check conditional statement (must be Boolean)
-        if (self.condition.type() != Boolean):
+        if (condition.type() != Boolean):
             raise ConditionError(
                 "Conditional statement of if statement must be type Boolean.")
 
         # case when condition is true, execute if block
-        if (self.condition.getValue() == True):
+        if (condition.getValue() == True):
 
             # case when if body consists of expressions
             if (self.if_body.type == Expr):
@@ -483,11 +584,11 @@ class IfExpression(Node):
             # case when if body consists of statements
             if (self.if_body.type() == Block):
                 self.if_body.interpret(ctx)
-                return Null()
+                return NULL
 
         # case when conditional expression is false, return Null
-        if (self.condition.getValue() == False):
-            return Null()
+        if (condition.getValue() == False):
+            return NULL
 
 
 class IfElseIfElseExpression(Node):
@@ -498,19 +599,26 @@ class IfElseIfElseExpression(Node):
         self.else_body = else_body
 
     def interpret(self, ctx):
-        # make the deep copy and a shallow copy of the context since we are entering a different scope
-        ctx = ctx.copy(ctx)
+        # create a nested context since we are entering a different scope
+        ctx = ctx.enterScope(self.slotCount)
+        value = self.interpretArms(ctx)
+
+        # an identifier is looked up in the scope it was resolved in
+        if (value is not None and value.type() == Identifier):
+            return ctx.lookup(value)
+        return value
 
+    def interpretArms(self, ctx):
         # interpret condition and if_body
-        self.condition = self.condition.interpret(ctx)
+        condition = self.condition.interpret(ctx)
 
         # type check conditional statement (must be Boolean)
-        if (self.condition.type() != Boolean):
+        if (condition.type() != Boolean):
             raise ConditionError(
                 "Conditional statement of if statement must be type Boolean.")
 
         # case when condition is true, execute if block
-        if (self.condition.getValue() == True):
+        if (condition.getValue() == True):
 
             # case when if body consists of expressions
             if (self.if_body.type() == Expr):
@@ -519,11 +627,11 @@ class IfElseIfElseExpression(Node):
             # case when if body consists of statements
             if (self.if_body.type() == Block):
                 self.if_body.interpret(ctx)
-                return Null()
+                return NULL
 
         # case when the conditional expression is false, iteratively check expression
         # body list
-        if (self.condition.getValue() == False):
+        if (condition.getValue() == False):
             return self.else_if_body_list.interpret(ctx, self.else_body)
 
 
@@ -547,7 +655,7 @@ class ElseIfBodyList(Node):
                 # case when else if body consists of statements
                 if (else_if_body.getValue().type() == Block):
                     else_if_body.interpretBody(ctx)
-                    return Null()
+                    return NULL
 
             # case when the else_if_body is evaluated to False
             if (else_if_body.interpretCondition(ctx).isFalse()):
@@ -578,7 +686,7 @@ class ElseIfBody(Node):
         # case when if body consists of statements
         if (self.else_if_body.type() == Block):
             self.else_if_body.interpret(ctx)
-            return Null()
+            return NULL
 
 # define else body
 
@@ -599,7 +707,7 @@ class ElseBody(Node):
         # case when if body consists of statements
         if (self.else_body.type() == Block):
             self.else_body.interpret(ctx)
-            return Null()
+            return NULL
 
 
 class WhileStatement(Node):
@@ -608,8 +716,8 @@ class WhileStatement(Node):
         self.body = body
 
     def interpret(self, ctx):
-        # make the deep copy and a shallow of the context since we are entering a different scope
-        ctx = ctx.copy(ctx)
+        # create a nested context since we are entering a different scope
+        ctx = ctx.enterScope(self.slotCount)
 
         # type check whether the condition is of Boolean type
         if (self.condition.interpret(ctx).type() != Boolean):
@@ -626,9 +734,12 @@ class ForStatement(Node):
         self.postStatement = postStatement
         self.body = body
 
+    # set by the resolver, see loops.py
+    countedLoop = None
+
     def interpret(self, ctx):
-        # make the deep copy and a shallow of the context since we are entering a different scope
-        ctx = ctx.copy(ctx)
+        # create a nested context since we are entering a different scope
+        ctx = ctx.enterScope(self.slotCount)
 
         # interpretion cycle
         # check condition (if true) -> execute for statement body -> execute post statement
@@ -641,25 +752,15 @@ class ForStatement(Node):
         # typically assignment statement
         self.preStatement.interpret(ctx)
 
-        # conditionFlag is set to true to start with.
-        conditionFlag = True 
-        uninterpretedBodyCache = self.body
-        uninterpretedPostStatementCache = self.postStatement
-
-        #while (conditionFlag and a != 0):
-        while(True):
-            # check the condition and assign the resulted value to conditionFlag
-            conditionFlag = self.condition.interpret(ctx).isTrue()
-            if (conditionFlag):
-              # execute the body block if condition is evaluted to true
-              uninterpretedBodyCache.interpret(ctx)
-              uninterpretedPostStatementCache.interpret(ctx)
-
-              # reset Cache
-              uninterpretedBodyCache = self.body
-              uninterpretedPostStatementCache = self.postStatement
-            else:
-              break;
+        # counted loops run without interpreting the condition and the post
+        # statement, unless the counter or the bound is not a number
+        if (self.countedLoop is not None and self.countedLoop.run(ctx, self.body.interpret)):
+            return
+
+        while (self.condition.interpret(ctx).isTrue()):
+            # execute the body block if condition is evaluted to true
+            self.body.interpret(ctx)
+            self.postStatement.interpret(ctx)
 
 
 class PrintStatement(Node):
@@ -669,28 +770,30 @@ class PrintStatement(Node):
 
     def interpret(self, ctx):
         # evaluate expression
-        self.expr = self.expr.interpret(ctx)
+        return self.printValue(ctx, self.expr.interpret(ctx))
 
-        # check whether the expressions are Number and String primitives
-        if (self.expr.type() == Number or self.expr.type() == String or self.expr.type() == Null or self.expr.type() == Boolean):
-            sys.stdout.write(self.expr.getString())
+    # print the evaluated expression (also used by closure.py)
+    def printValue(self, ctx, value):
+        output = ctx.getOutput()
 
+        # the text is written with a single call, the output decides when it
+        # is flushed (see output.py)
+        # check whether the expressions are Number and String primitives
+        if (value.type() == Number or value.type() == String or value.type() == Null or value.type() == Boolean):
             # handle println, append "\n" at the end
             if self.cmd == "println":
-                sys.stdout.write("\n")
-
-            # flush stdout
-            sys.stdout.flush()
+                output.write(value.getString() + "\n")
+            else:
+                output.write(value.getString())
 
-        if (self.expr.type() == Identifier):
+        if (value.type() == Identifier):
             # look up the identifier value in the context and print it to stdout
-            sys.stdout.write(ctx.lookup(self.expr).interpret(ctx).getString())
+            text = ctx.lookup(value).interpret(ctx).getString()
 
             # handle println, append "\n" at the end
             if self.cmd == "println":
-                sys.stdout.write("\n")
-
-            # flush stdout
-            sys.stdout.flush()
+                output.write(text + "\n")
+            else:
+                output.write(text)
         else:
             return NotImplemented
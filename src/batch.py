@@ -0,0 +1,82 @@
+# Program to define the batch runner (interp.py --batch)
+#
+# runs every program of the given files and directories on a pool of worker
+# processes. Every worker builds the lexer and the parser once and then runs
+# many programs, each with its own output buffer. The outputs are written in
+# the order of the programs, either to stdout (each after a "==> program <=="
+# line) or to one <program>.out file per program in a directory. Programs
+# that end with an error are reported with the class of the error.
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import program
+
+# programs sent to a worker at a time, at most
+CHUNK_SIZE = 64
+
+
+# build the lexer and the parser of a worker process
+def initializeWorker(lexerName):
+    program.setLexer(lexerName)
+    program.getLexer()
+    program.getParser()
+
+
+# run one program, return (filename, output, error class name, error message)
+def runProgram(task):
+    filename, engine, level, useCache = task
+    output = io.StringIO()
+    try:
+        program.prepareFile(filename, engine, level, useCache)(output)
+    except Exception as e:
+        return filename, output.getvalue(), type(e).__name__, str(e)
+    return filename, output.getvalue(), None, None
+
+
+# the results of runProgram for every task, in the order of the tasks
+def runPrograms(tasks, jobs, lexerName):
+    if jobs <= 1:
+        initializeWorker(lexerName)
+        for task in tasks:
+            yield runProgram(task)
+        return
+
+    chunkSize = max(1, min(CHUNK_SIZE, len(tasks) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializeWorker, initargs=(lexerName,)) as executor:
+        for result in executor.map(runProgram, tasks, chunksize=chunkSize):
+            yield result
+
+
+# file the output of a program is written to in outputDirectory
+def getOutputFile(filename, root, outputDirectory):
+    return os.path.join(outputDirectory, os.path.relpath(filename, root) + ".out")
+
+
+# run the programs and return the exit status (1 when a program failed)
+def run(filenames, jobs, engine="tree", level=0, useCache=True, lexerName="rply", outputDirectory=None,
+        stdout=None, stderr=None):
+    filenames = list(filenames)
+    tasks = [(filename, engine, level, useCache) for filename in filenames]
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(filename)) for filename in filenames]) \
+        if filenames else "."
+
+    failed = 0
+    for filename, text, errorName, errorMessage in runPrograms(tasks, jobs, lexerName):
+        if outputDirectory is None:
+            if text and not text.endswith("\n"):
+                text += "\n"
+            stdout.write("==> " + filename + " <==\n" + text)
+        else:
+            outputFile = getOutputFile(os.path.abspath(filename), root, outputDirectory)
+            os.makedirs(os.path.dirname(outputFile), exist_ok=True)
+            with open(outputFile, "w") as f:
+                f.write(text)
+
+        if errorName is not None:
+            failed += 1
+            stderr.write("error " + filename + ": " + errorName + ": " + errorMessage + "\n")
+
+    stderr.write("%d programs, %d failed\n" % (len(filenames), failed))
+    return 1 if failed else 0
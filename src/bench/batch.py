@@ -0,0 +1,68 @@
+# Program to benchmark the batch runner
+#
+# copies the programs of test/ many times into a temporary directory and runs
+# them with "interp.py --batch" with 1, 2, 4, ... processes (up to the number
+# of CPUs), and for comparison a sample of them with one interp.py process
+# per program. Reports the programs per second of each.
+#
+# usage: python3 bench/batch.py [copies of test/]
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIRECTORY = os.path.join(SRC_DIRECTORY, "test")
+INTERP = os.path.join(SRC_DIRECTORY, "interp.py")
+
+# programs run with one process each
+PROCESS_SAMPLE = 50
+
+
+def makeCorpus(directory, copies):
+    names = [name for name in sorted(os.listdir(TEST_DIRECTORY)) if os.path.isfile(os.path.join(TEST_DIRECTORY, name))]
+    filenames = []
+    for copy in range(copies):
+        copyDirectory = os.path.join(directory, "copy%d" % copy)
+        os.makedirs(copyDirectory)
+        for name in names:
+            filename = os.path.join(copyDirectory, name)
+            shutil.copyfile(os.path.join(TEST_DIRECTORY, name), filename)
+            filenames.append(filename)
+    return filenames
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    cpus = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus")
+        filenames = makeCorpus(corpus, copies)
+        print("%d programs, %d CPUs" % (len(filenames), cpus))
+
+        start = time.perf_counter()
+        for filename in filenames[:PROCESS_SAMPLE]:
+            subprocess.run([sys.executable, INTERP, "--no-cache", filename],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        print("%-20s %10.0f programs/s" % ("process per program", PROCESS_SAMPLE / elapsed))
+
+        jobs = 1
+        while True:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, INTERP, "--no-cache", "--batch", "-j", str(jobs),
+                            "--batch-output", os.path.join(directory, "output"), corpus],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            print("%-20s %10.0f programs/s" % ("--batch -j %d" % jobs, len(filenames) / elapsed))
+            if jobs >= cpus:
+                break
+            jobs = min(jobs * 2, cpus)
+
+
+if __name__ == "__main__":
+    main()
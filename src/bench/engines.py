@@ -0,0 +1,61 @@
+# Program to benchmark the execution engines against each other
+#
+# runs the loop programs of test/ and a generated counting loop with the
+# tree-walker (tree), the closure compiler (closure), the bytecode
+# interpreter (vm) and as Python code (python). Parsing and compiling are not
+# measured.
+#
+# usage: python3 bench/engines.py [repetitions]
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import program
+
+ENGINES = ["tree", "closure", "vm", "python"]
+TEST_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test")
+LOOP_PROGRAMS = ["for", "ifLoop", "p14"]
+
+COUNTING_LOOP = """
+i = 0;
+total = 0;
+while (i < 20000) {
+  if ((i / 2) == 0) {
+    total = (total + 1);
+  } else {
+    total = (total + 2);
+  };
+  i = (i + 1);
+};
+"""
+
+
+# run the program repetitions times, return the milliseconds per run
+def timeProgram(prog, repetitions):
+    output = io.StringIO()
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        prog.run(output=output)
+    return (time.perf_counter() - start) / repetitions * 1e3
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    sources = []
+    for name in LOOP_PROGRAMS:
+        sources.append((name, program.getRawProgramString(os.path.join(TEST_DIRECTORY, name)), repetitions))
+    sources.append(("counting loop", COUNTING_LOOP, max(1, repetitions // 100)))
+
+    print("%-15s" % "program" + "".join("%12s" % (engine + " ms") for engine in ENGINES))
+    for name, rawProgramString, runs in sources:
+        timings = [timeProgram(program.Program.fromString(rawProgramString, engine), runs) for engine in ENGINES]
+        print("%-15s" % name + "".join("%12.3f" % timing for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Program to benchmark the lexers of lexer.py
+#
+# lexes the programs of test/ repeated to a large input with every lexer of
+# lexer.LEXERS, checks that they produce the same tokens and reports the
+# tokens per second of each and the memory held by the tokens of the input
+# (a list of tokens, or the TokenStream of the compact lexer).
+#
+# usage: python3 bench/lexer.py [input size in KiB]
+
+import os
+import sys
+import time
+import tracemalloc
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIRECTORY)
+
+import lexer
+
+
+def getInput(size):
+    testDirectory = os.path.join(SRC_DIRECTORY, "test")
+    programs = []
+    for name in sorted(os.listdir(testDirectory)):
+        filename = os.path.join(testDirectory, name)
+        if os.path.isfile(filename):
+            with open(filename, "r") as f:
+                # line comments need their newline
+                programs.append(f.read() + "\n")
+
+    text = "".join(programs)
+    return text * max(1, size // len(text) + 1)
+
+
+def getTokens(lexerClass, text):
+    return [(token.name, token.value, token.getsourcepos().idx, token.getsourcepos().lineno,
+             token.getsourcepos().colno) for token in lexerClass().lex(text)]
+
+
+def measure(lexerClass, text, runs=3):
+    instance = lexerClass()
+    best = None
+    for run in range(runs):
+        start = time.perf_counter()
+        count = 0
+        for token in instance.lex(text):
+            count += 1
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count, best
+
+
+# bytes allocated for the tokens of text, kept in memory at the same time
+def measureMemory(lexerClass, text):
+    instance = lexerClass()
+    tracemalloc.start()
+    tokens = instance.lex(text)
+    if not isinstance(tokens, lexer.TokenStream):
+        tokens = list(tokens)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(tokens), size
+
+
+def main():
+    size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 1024 * 1024
+    text = getInput(size)
+    print("input: %d characters, %d lines" % (len(text), text.count("\n")))
+
+    reference = getTokens(lexer.Lexer, text)
+    for name in sorted(lexer.LEXERS):
+        if getTokens(lexer.LEXERS[name], text) != reference:
+            print("%-12s produces different tokens" % name)
+            return 1
+
+    results = {}
+    for name in sorted(lexer.LEXERS):
+        count, elapsed = measure(lexer.LEXERS[name], text)
+        results[name] = count / elapsed
+        print("%-12s %8d tokens %8.3fs %12.0f tokens/s" % (name, count, elapsed, results[name]))
+
+    print("single-pass speedup: %.1fx" % (results["single-pass"] / results["rply"]))
+
+    print("memory held by the tokens (input: %d bytes)" % len(text))
+    for name in sorted(lexer.LEXERS):
+        count, size = measureMemory(lexer.LEXERS[name], text)
+        print("%-12s %12d bytes %8.1f bytes/token" % (name, size, size / count))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# Program to benchmark the counted loop fast path of for statements
+#
+# runs counted for loops with the tree-walker (tree) and the closure compiler
+# (closure), once with the fast path of loops.py and once with every for
+# statement run as a general loop. Parsing and compiling are not measured.
+#
+# usage: python3 bench/loops.py [iterations]
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loops
+import program
+
+ENGINES = ["tree", "closure"]
+
+PROGRAMS = [
+    ("constant", """
+i = 0;
+x = 0;
+for (i = 0; i < %(n)d; i = (i + 1);) {
+  x = 1;
+}
+"""),
+    ("sum", """
+i = 0;
+total = 0;
+for (i = 0; i < %(n)d; i = (i + 1);) {
+  total = (total + i);
+}
+"""),
+    ("nested", """
+i = 0;
+j = 0;
+total = 0;
+for (i = 0; i < %(m)d; i = (i + 1);) {
+  for (j = %(m)d; j > 0; j = (j - 1);) {
+    total = (total + j);
+  }
+}
+"""),
+]
+
+
+# prepare the program, with or without the counted loop fast path
+def prepare(rawProgramString, engine, countedLoops):
+    getCountedLoop = loops.getCountedLoop
+    if not countedLoops:
+        loops.getCountedLoop = lambda node: None
+    try:
+        return program.Program.fromString(rawProgramString, engine)
+    finally:
+        loops.getCountedLoop = getCountedLoop
+
+
+# run the program once, return the milliseconds
+def timeProgram(prog):
+    start = time.perf_counter()
+    prog.run(output=io.StringIO())
+    return (time.perf_counter() - start) * 1e3
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sizes = {"n": iterations, "m": int(iterations ** 0.5)}
+
+    print("%-12s %-8s %12s %12s %8s" % ("program", "engine", "general ms", "counted ms", "speedup"))
+    for name, source in PROGRAMS:
+        rawProgramString = source % sizes
+        for engine in ENGINES:
+            general = timeProgram(prepare(rawProgramString, engine, False))
+            counted = timeProgram(prepare(rawProgramString, engine, True))
+            print("%-12s %-8s %12.1f %12.1f %7.1fx" % (name, engine, general, counted, general / counted))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# Program to benchmark the flush policies of the program output
+#
+# runs a loop that prints one line per iteration with stdout connected to a
+# pipe, once per flush policy, and reports the time of each run.
+#
+# usage: python3 bench/output.py [lines]
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIRECTORY)
+
+import output
+
+
+def getProgram(lines):
+    return "i = 0;\nwhile (i < %d) {\n  println i;\n  i = (i + 1);\n};\n" % lines
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as directory:
+        programFile = os.path.join(directory, "print")
+        with open(programFile, "w") as f:
+            f.write(getProgram(lines))
+
+        print("%-8s %10s" % ("flush", "seconds"))
+        for policy in output.FLUSH_POLICIES:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(SRC_DIRECTORY, "interp.py"), "--engine=python",
+                            "--flush=" + policy, programFile], stdout=subprocess.PIPE, check=True)
+            print("%-8s %10.3f" % (policy, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Program to benchmark the parser on very long programs
+#
+# parses generated programs of 1k statements up to the given number of
+# statements (ten times more at every step): a list of top-level statements
+# and a single if expression with as many else-if arms. Lexing is timed
+# separately and subtracted, the parse time per statement stays the same
+# when the parser builds the statement lists in linear time.
+#
+# usage: python3 bench/parse.py [statements] [lexer]
+
+import os
+import sys
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIRECTORY)
+
+import program
+
+
+def getStatements(count):
+    lines = ["a = 0;"]
+    for index in range(count - 2):
+        if index % 10 == 9:
+            lines.append("println a;")
+        else:
+            lines.append("a = (a + %d);" % (index % 7))
+    lines.append("println a;")
+    return "\n".join(lines) + "\n"
+
+
+def getElseIfChain(count):
+    lines = ["x = 1;", "if (x == 0) {", "  y = 0;"]
+    for arm in range(1, count):
+        lines.append("} else if (x == %d) {" % arm)
+        lines.append("  y = %d;" % arm)
+    lines.append("} else {")
+    lines.append("  y = 0;")
+    lines.append("};")
+    return "\n".join(lines) + "\n"
+
+
+WORKLOADS = [
+    ("statements", getStatements),
+    ("else-if chain", getElseIfChain),
+]
+
+
+def measure(text):
+    lexer = program.getLexer()
+    parser = program.getParser()
+
+    start = time.perf_counter()
+    for token in lexer.lex(text):
+        pass
+    lexing = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parser.parse(lexer.lex(text))
+    total = time.perf_counter() - start
+    return lexing, total - lexing
+
+
+def main():
+    maxCount = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    program.setLexer(sys.argv[2] if len(sys.argv) > 2 else "single-pass")
+
+    for name, getProgram in WORKLOADS:
+        print(name)
+        previous = None
+        count = 1000
+        while count <= maxCount:
+            lexing, parsing = measure(getProgram(count))
+            perStatement = parsing / count * 1e6
+            growth = "" if previous is None else "%5.2fx" % (perStatement / previous)
+            print("  %8d statements  lex %8.3fs  parse %8.3fs  %6.1f us/statement %s"
+                  % (count, lexing, parsing, perStatement, growth))
+            previous = perStatement
+            count *= 10
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
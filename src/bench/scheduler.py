@@ -0,0 +1,96 @@
+# Program to benchmark the cooperative scheduler with many concurrent scripts
+#
+#   throughput - identical counting loops run one after the other with
+#                Interpreter.run and concurrently with scheduler.runScripts
+#                (instructions per second of both)
+#   fairness   - the completion times of the identical loops, and the
+#                instructions executed by runaway "while (true)" scripts until
+#                their deadline (Jain's fairness index, 1.0 when every script
+#                got the same share)
+#   latency    - time until a short script started after the runaways has
+#                finished
+#
+# usage: python3 bench/scheduler.py [scripts] [slice size]
+
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import interpreter
+import scheduler
+
+COUNTING_LOOP = """
+i = 0;
+total = 0;
+while (i < 2000) {
+  total = (total + i);
+  i = (i + 1);
+};
+"""
+
+RUNAWAY = """
+x = 0;
+while (true) {
+  x = (x + 1);
+};
+"""
+
+SHORT = """
+println "done";
+"""
+
+# deadline of the runaway scripts, in seconds
+RUNAWAY_TIMEOUT = 1.0
+
+
+# Jain's fairness index of the shares
+def getFairness(shares):
+    return sum(shares) ** 2 / (len(shares) * sum(share * share for share in shares))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sliceSize = int(sys.argv[2]) if len(sys.argv) > 2 else scheduler.SLICE_SIZE
+
+    # throughput
+    scripts = [scheduler.Script.fromString("loop %d" % index, COUNTING_LOOP) for index in range(count)]
+    start = time.perf_counter()
+    for script in scripts:
+        interpreter.Interpreter(script.bytecode, None, io.StringIO()).run()
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scheduler.runScripts(scripts, sliceSize)
+    concurrent = time.perf_counter() - start
+    instructions = sum(script.instructions for script in scripts)
+
+    print("%d scripts, %d instructions each, slices of %d instructions" % (count, scripts[0].instructions, sliceSize))
+    print("sequential  %8.1f ms %12.0f instructions/s" % (sequential * 1e3, instructions / sequential))
+    print("concurrent  %8.1f ms %12.0f instructions/s" % (concurrent * 1e3, instructions / concurrent))
+
+    # fairness
+    elapsed = sorted(script.elapsed for script in scripts)
+    print("completion of identical scripts: first %.1f ms, median %.1f ms, last %.1f ms" %
+          (elapsed[0] * 1e3, statistics.median(elapsed) * 1e3, elapsed[-1] * 1e3))
+
+    runaways = [scheduler.Script.fromString("runaway %d" % index, RUNAWAY, timeout=RUNAWAY_TIMEOUT)
+                for index in range(count)]
+    short = scheduler.Script.fromString("short", SHORT)
+    start = time.monotonic()
+    scheduler.runScripts(runaways + [short], sliceSize)
+    latency = short.started + short.elapsed - start
+    shares = [script.instructions for script in runaways]
+    aborted = sum(isinstance(script.error, scheduler.DeadlineExceeded) for script in runaways)
+    print("%d runaway scripts aborted after %.1f s, instructions each: min %d, max %d, fairness index %.3f" %
+          (aborted, RUNAWAY_TIMEOUT, min(shares), max(shares), getFairness(shares)))
+
+    # latency
+    print("short script started last next to the runaways: done after %.1f ms" % (latency * 1e3))
+
+
+if __name__ == "__main__":
+    main()
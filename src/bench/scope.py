@@ -0,0 +1,64 @@
+# Program to benchmark entering scopes with many live variables
+#
+# runs a while loop whose body enters an if - else scope on every iteration,
+# after declaring an increasing number of global variables. The time per
+# iteration should not depend on the number of live variables.
+#
+# usage: python3 bench/scope.py [iterations]
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer
+from parser import Parser
+import ast
+import resolver
+
+
+def getProgram(variableCount, iterations):
+    lines = ["v%d = %d;" % (i, i) for i in range(variableCount)]
+    lines.append("i = 0;")
+    lines.append("while (i < %d) {" % iterations)
+    lines.append("  if (i < 0) {")
+    lines.append("    x = 1;")
+    lines.append("  } else {")
+    lines.append("    x = 2;")
+    lines.append("  };")
+    lines.append("  i = (i + 1);")
+    lines.append("};")
+    return "\n".join(lines) + "\n"
+
+
+# interpret the program with a fresh global context, return the seconds taken
+def runProgram(parsedAST):
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        resolver.resolve(parsedAST)
+        start = time.perf_counter()
+        parsedAST.interpret(ast.Context(parsedAST.slotCount))
+        return time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    lexer = Lexer()
+    parser = Parser()
+
+    print("%10s %12s" % ("variables", "us/iteration"))
+    for variableCount in [10, 100, 1000, 10000]:
+        # the loop with zero iterations measures the declarations, which are
+        # subtracted from the measurement
+        declarations = runProgram(parser.parse(lexer.lex(getProgram(variableCount, 0))))
+        elapsed = runProgram(parser.parse(lexer.lex(getProgram(variableCount, iterations))))
+        print("%10d %12.2f" % (variableCount, (elapsed - declarations) / iterations * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Program to benchmark the daemon against starting the interpreter
+#
+# runs the programs of test/ once with "python3 interp.py" (a new process
+# building or loading the lexer and parser each time) and once with the
+# client of a daemon started by this benchmark, and reports the average time
+# per program.
+#
+# usage: python3 bench/serve.py [rounds]
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIRECTORY = os.path.join(SRC_DIRECTORY, "test")
+
+
+def getPrograms():
+    return [os.path.join(TEST_DIRECTORY, name) for name in sorted(os.listdir(TEST_DIRECTORY))
+            if os.path.isfile(os.path.join(TEST_DIRECTORY, name))]
+
+
+# seconds per program run with the given command
+def timePrograms(command, programs, rounds, env):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for filename in programs:
+            subprocess.run(command + [filename], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    return (time.perf_counter() - start) / (rounds * len(programs))
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    programs = getPrograms()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, MINIJS_SOCKET=os.path.join(directory, "mini-js.sock"))
+        interp = [sys.executable, os.path.join(SRC_DIRECTORY, "interp.py")]
+        client = [sys.executable, os.path.join(SRC_DIRECTORY, "client.py")]
+
+        direct = timePrograms(interp, programs, rounds, env)
+
+        daemon = subprocess.Popen(interp + ["--serve"], stdout=subprocess.PIPE, env=env, universal_newlines=True)
+        try:
+            # the daemon prints a line once it listens
+            daemon.stdout.readline()
+            timePrograms(client, programs, 1, env)
+            served = timePrograms(client, programs, rounds, env)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    print("interp.py  %8.1f ms per program" % (direct * 1e3))
+    print("daemon     %8.1f ms per program" % (served * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Program to benchmark the start up time of mini-js
+#
+# measures the time-to-first-statement: the time from launching
+# "python3 interp.py <program>" until the output of the first statement is
+# read back, once with an empty parser table cache (cold) and once with a
+# prebuilt cache (warm).
+#
+# usage: python3 bench/startup.py [number of runs]
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERP = os.path.join(SRC_DIRECTORY, "interp.py")
+
+
+# launch the interpreter and return the seconds until the first statement printed
+def timeToFirstStatement(programFile, cacheDirectory):
+    env = dict(os.environ, MINIJS_CACHE_DIR=cacheDirectory)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, INTERP, programFile], stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, env=env, universal_newlines=True)
+    for line in process.stdout:
+        if line.startswith("first"):
+            elapsed = time.perf_counter() - start
+            break
+    process.communicate()
+    return elapsed
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    print("%-5s min %7.1f ms   median %7.1f ms" % (name, samples[0] * 1000, samples[len(samples) // 2] * 1000))
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    workDirectory = tempfile.mkdtemp()
+    try:
+        programFile = os.path.join(workDirectory, "first.minjs")
+        with open(programFile, "w") as f:
+            f.write('println "first";\n')
+
+        # cold: every launch starts from an empty cache directory
+        cold = []
+        for i in range(runs):
+            cacheDirectory = os.path.join(workDirectory, "cold%d" % i)
+            cold.append(timeToFirstStatement(programFile, cacheDirectory))
+
+        # warm: the cache is populated by the first launch
+        cacheDirectory = os.path.join(workDirectory, "warm")
+        timeToFirstStatement(programFile, cacheDirectory)
+        warm = [timeToFirstStatement(programFile, cacheDirectory) for i in range(runs)]
+
+        report("cold", cold)
+        report("warm", warm)
+    finally:
+        shutil.rmtree(workDirectory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Program to benchmark streaming execution of a large generated program
+#
+# generates a program of many small top-level statements and runs it with
+# and without --stream, reporting the time until the first line of output,
+# the total time and the peak memory (maximum resident set size) of each run.
+#
+# usage: python3 bench/stream.py [statements]
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs interp.py and reports its peak memory on stderr
+RUNNER = """
+import resource, runpy, sys
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+finally:
+    sys.stderr.write("maxrss %d\\n" % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def getProgram(statements):
+    lines = ["i = 0;", "println i;"]
+    for index in range(statements):
+        lines.append("v%d = (i + %d);" % (index % 100, index))
+        if index % 10000 == 0:
+            lines.append("while (i < 3) { i = (i + 1); };")
+    lines.append("println i;")
+    return "\n".join(lines) + "\n"
+
+
+def runProgram(programFile, arguments):
+    command = [sys.executable, "-c", RUNNER, os.path.join(SRC_DIRECTORY, "interp.py"), "--no-cache"]
+    start = time.perf_counter()
+    process = subprocess.Popen(command + arguments + [programFile], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, universal_newlines=True)
+
+    # the banner comes first, the first line of the program after it
+    firstOutput = None
+    for line in process.stdout:
+        if firstOutput is None and line.strip() == "0.0":
+            firstOutput = time.perf_counter() - start
+    process.wait()
+    elapsed = time.perf_counter() - start
+
+    maxrss = 0
+    for line in process.stderr.read().splitlines():
+        if line.startswith("maxrss "):
+            maxrss = int(line.split()[1])
+    return firstOutput, elapsed, maxrss
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    with tempfile.TemporaryDirectory() as directory:
+        programFile = os.path.join(directory, "generated")
+        with open(programFile, "w") as f:
+            f.write(getProgram(statements))
+        print("program: %d statements, %.1f MB" % (statements, os.path.getsize(programFile) / 1e6))
+
+        print("%-10s %14s %10s %12s" % ("mode", "first output s", "total s", "peak MB"))
+        for mode, arguments in [("whole", ["--flush=line"]), ("--stream", ["--stream", "--flush=line"])]:
+            firstOutput, elapsed, maxrss = runProgram(programFile, arguments)
+            print("%-10s %14.3f %10.3f %12.1f" % (mode, firstOutput or 0, elapsed, maxrss / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Program to benchmark string concatenation
+#
+# builds a string in a for loop, appending a literal and the counter on every
+# iteration (about 14 bytes), and prints it once at the end. The loop is run
+# with ropes (rope.py) and, up to COPY_LIMIT iterations, with a
+# concatenation that copies both strings every time. The time per iteration
+# of the ropes stays the same as the string grows, the one of copying grows
+# with the length of the string.
+#
+# usage: python3 bench/strings.py [iterations] [engine]
+
+import io
+import os
+import sys
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIRECTORY)
+
+import program
+import rope
+
+# copying is quadratic, larger strings take too long
+COPY_LIMIT = 50000
+
+PROGRAM = """
+s = "";
+i = 0;
+for (i = 0; i < %d; i = (i + 1);) {
+  s = (((s + "item ") + i) + ";");
+};
+println s;
+"""
+
+
+# concatenation without ropes
+def copyingConcatenate(left, right):
+    return rope.flatten(left) + rope.flatten(right)
+
+
+def measure(iterations, engine):
+    prog = program.Program.fromString(PROGRAM % iterations, engine)
+    output = io.StringIO()
+    start = time.perf_counter()
+    prog.run(output=output)
+    return time.perf_counter() - start, output.getvalue()
+
+
+def main():
+    maxIterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    engine = sys.argv[2] if len(sys.argv) > 2 else "tree"
+
+    # 1000, 2000, 5000, 10000, ...
+    sizes = [step * 10 ** power for power in range(3, 10) for step in (1, 2, 5)]
+    for iterations in [size for size in sizes if size <= maxIterations]:
+        elapsed, text = measure(iterations, engine)
+        line = "%8d iterations %7.2f MB  rope %8.3fs %6.2f us/iteration" % (
+            iterations, len(text) / 1e6, elapsed, elapsed / iterations * 1e6)
+
+        if iterations <= COPY_LIMIT:
+            concatenate = rope.concatenate
+            rope.concatenate = copyingConcatenate
+            try:
+                copyElapsed, copyText = measure(iterations, engine)
+            finally:
+                rope.concatenate = concatenate
+            if copyText != text:
+                print("copying and ropes build different strings")
+                return 1
+            line += "  copy %8.3fs %6.2f us/iteration" % (copyElapsed, copyElapsed / iterations * 1e6)
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
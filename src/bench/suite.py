@@ -0,0 +1,296 @@
+# Program to benchmark the phases of running a program
+#
+# times every phase of running a program separately: lexing (Lexer.lex),
+# parsing (Parser.parse), optimizing, resolving, compiling (for the engines
+# other than tree) and executing (Block.interpret or the engine), on the
+# programs of test/ and on generated workloads:
+#
+#   deep loops        - nested while loops
+#   long statements   - a long list of top-level assignments
+#   else-if chain     - a long if - else if chain evaluated in a loop
+#   many variables    - a large number of distinct variables
+#
+# Every phase is run several times, the result is written as JSON. Pass a
+# previous result to --compare to report the phases that got slower.
+#
+# usage: python3 bench/suite.py [--engine ENGINE] [--lexer LEXER] [-O LEVEL]
+#                               [--scale N] [--runs N] [--output FILE]
+#                               [--compare FILE] [--threshold PERCENT]
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIRECTORY)
+
+import ast
+import closure
+import compiler
+import interpreter
+import lexer
+import optimizer
+import program
+import resolver
+import transpiler
+
+ENGINES = ["tree", "closure", "vm", "python"]
+PHASES = ["lex", "parse", "optimize", "resolve", "compile", "execute"]
+TEST_DIRECTORY = os.path.join(SRC_DIRECTORY, "test")
+
+# phases faster than this are not compared (timer and scheduling noise)
+MINIMUM_COMPARED_MS = 1.0
+
+
+def getDeepLoops(scale):
+    n = 10 * scale
+    return "\n".join([
+        "total = 0;",
+        "i = 0;",
+        "while (i < %d) {" % n,
+        "  j = 0;",
+        "  while (j < %d) {" % n,
+        "    k = 0;",
+        "    while (k < 10) {",
+        "      total = (total + 1);",
+        "      k = (k + 1);",
+        "    };",
+        "    j = (j + 1);",
+        "  };",
+        "  i = (i + 1);",
+        "};",
+        "println total;",
+    ]) + "\n"
+
+
+def getLongStatements(scale):
+    lines = ["a = 0;"]
+    for index in range(2000 * scale):
+        lines.append("a = (a + %d);" % (index % 10))
+    lines.append("println a;")
+    return "\n".join(lines) + "\n"
+
+
+def getElseIfChain(scale):
+    arms = 50
+    lines = ["i = 0;", "hits = 0;", "while (i < %d) {" % (100 * scale)]
+    lines.append("  if (i == 0) {")
+    lines.append("    hits = (hits + 1);")
+    for arm in range(1, arms):
+        lines.append("  } else if (i == %d) {" % arm)
+        lines.append("    hits = (hits + %d);" % (arm + 1))
+    lines.append("  } else {")
+    lines.append("    hits = (hits - 1);")
+    lines.append("  };")
+    lines.append("  i = (i + 1);")
+    lines.append("};")
+    lines.append("println hits;")
+    return "\n".join(lines) + "\n"
+
+
+def getManyVariables(scale):
+    count = 1000 * scale
+    lines = ["v%d = %d;" % (index, index) for index in range(count)]
+    lines.append("sum = 0;")
+    lines += ["sum = (sum + v%d);" % index for index in range(count)]
+    lines.append("println sum;")
+    return "\n".join(lines) + "\n"
+
+
+GENERATED_WORKLOADS = [
+    ("deep loops", getDeepLoops),
+    ("long statements", getLongStatements),
+    ("else-if chain", getElseIfChain),
+    ("many variables", getManyVariables),
+]
+
+
+def getWorkloads(scale):
+    workloads = []
+    for name in sorted(os.listdir(TEST_DIRECTORY)):
+        filename = os.path.join(TEST_DIRECTORY, name)
+        if os.path.isfile(filename):
+            workloads.append(("test/" + name, program.getRawProgramString(filename)))
+    for name, generate in GENERATED_WORKLOADS:
+        workloads.append((name, generate(scale)))
+    return workloads
+
+
+# compile the resolved AST for the engine, return a function executing it
+def compileProgram(parsedAST, engine, output):
+    if engine == "closure":
+        function = closure.compileProgram(parsedAST)
+        return lambda: function(ast.Context(parsedAST.slotCount, None, output))
+    if engine == "vm":
+        bytecode = compiler.Compiler().compileProgram(parsedAST)
+        return lambda: interpreter.Interpreter(bytecode, None, output).run()
+    if engine == "python":
+        code = transpiler.compileProgram(parsedAST)
+        return lambda: transpiler.run(code, output)
+    return lambda: parsedAST.interpret(ast.Context(parsedAST.slotCount, None, output))
+
+
+# run every phase once, return the seconds of each phase and the error class
+# name the program ended with (later phases are not run after an error)
+def runOnce(rawProgramString, engine, level, programLexer, programParser):
+    timings = {}
+    output = io.StringIO()
+    phase = None
+    try:
+        phase = "lex"
+        start = time.perf_counter()
+        tokens = list(programLexer.lex(rawProgramString))
+        timings["lex"] = time.perf_counter() - start
+
+        phase = "parse"
+        start = time.perf_counter()
+        parsedAST = programParser.parse(iter(tokens))
+        timings["parse"] = time.perf_counter() - start
+
+        phase = "optimize"
+        start = time.perf_counter()
+        parsedAST = optimizer.optimize(parsedAST, level)
+        timings["optimize"] = time.perf_counter() - start
+
+        phase = "resolve"
+        start = time.perf_counter()
+        resolver.resolve(parsedAST)
+        timings["resolve"] = time.perf_counter() - start
+
+        phase = "compile"
+        start = time.perf_counter()
+        execute = compileProgram(parsedAST, engine, output)
+        timings["compile"] = time.perf_counter() - start
+
+        phase = "execute"
+        start = time.perf_counter()
+        execute()
+        timings["execute"] = time.perf_counter() - start
+    except Exception as e:
+        timings[phase] = time.perf_counter() - start
+        return timings, type(e).__name__
+    return timings, None
+
+
+def benchmark(rawProgramString, engine, level, runs, programLexer, programParser):
+    samples = {}
+    error = None
+    for run in range(runs):
+        timings, error = runOnce(rawProgramString, engine, level, programLexer, programParser)
+        for phase, seconds in timings.items():
+            samples.setdefault(phase, []).append(seconds)
+
+    phases = {}
+    for phase in PHASES:
+        if phase in samples:
+            values = sorted(samples[phase])
+            phases[phase] = {
+                "min_ms": values[0] * 1e3,
+                "median_ms": values[len(values) // 2] * 1e3,
+                "mean_ms": sum(values) / len(values) * 1e3,
+            }
+    return {
+        "characters": len(rawProgramString),
+        "lines": rawProgramString.count("\n"),
+        "error": error,
+        "phases": phases,
+    }
+
+
+def getCommit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=SRC_DIRECTORY,
+                                       stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# the phases that are more than threshold percent slower (by the minimum
+# time) than in the baseline result
+def compare(baseline, result, threshold):
+    regressions = []
+    for name, workload in result["workloads"].items():
+        previous = baseline["workloads"].get(name)
+        if previous is None:
+            continue
+        for phase, timing in workload["phases"].items():
+            if phase not in previous["phases"]:
+                continue
+            before = previous["phases"][phase]["min_ms"]
+            after = timing["min_ms"]
+            # too short to compare reliably
+            if before < MINIMUM_COMPARED_MS:
+                continue
+            change = (after - before) / before * 100
+            if change > threshold:
+                regressions.append((name, phase, before, after, change))
+    return regressions
+
+
+def getArgumentParser():
+    argumentParser = argparse.ArgumentParser(prog="python3 bench/suite.py")
+    argumentParser.add_argument("--engine", choices=ENGINES, default="tree",
+                                help="engine executing the programs (default tree)")
+    argumentParser.add_argument("--lexer", choices=sorted(lexer.LEXERS), default="rply",
+                                help="lexer implementation (default rply)")
+    argumentParser.add_argument("-O", dest="optimize", type=int, default=0, choices=[0, 1, 2],
+                                help="optimization level (default 0)")
+    argumentParser.add_argument("--scale", type=int, default=1,
+                                help="size factor of the generated workloads (default 1)")
+    argumentParser.add_argument("--runs", type=int, default=5,
+                                help="runs of every workload (default 5)")
+    argumentParser.add_argument("--output", metavar="FILE",
+                                help="write the JSON result to FILE instead of stdout")
+    argumentParser.add_argument("--compare", metavar="FILE",
+                                help="report the phases that are slower than in the JSON result FILE")
+    argumentParser.add_argument("--threshold", type=float, default=10.0,
+                                help="percentage a phase may be slower before it is reported (default 10)")
+    return argumentParser
+
+
+def main():
+    args = getArgumentParser().parse_args()
+
+    programLexer = lexer.LEXERS[args.lexer]()
+    programParser = program.getParser()
+
+    result = {
+        "commit": getCommit(),
+        "python": platform.python_version(),
+        "engine": args.engine,
+        "lexer": args.lexer,
+        "optimize": args.optimize,
+        "scale": args.scale,
+        "runs": args.runs,
+        "workloads": {},
+    }
+    for name, rawProgramString in getWorkloads(args.scale):
+        result["workloads"][name] = benchmark(rawProgramString, args.engine, args.optimize, args.runs,
+                                              programLexer, programParser)
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, result, args.threshold)
+        for name, phase, before, after, change in regressions:
+            sys.stderr.write("slower: %-20s %-8s %10.3f ms -> %10.3f ms (+%.0f%%)\n" %
+                             (name, phase, before, after, change))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
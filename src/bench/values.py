@@ -0,0 +1,105 @@
+# Program to benchmark the memory and time spent on runtime values
+#
+# runs a counting loop and a program assigning many variables with the
+# tree-walker (tree) and the bytecode interpreter (vm) and reports, measured
+# with tracemalloc:
+#
+#   loop ms      - time of the counting loop (without tracemalloc)
+#   loop peak    - peak memory allocated while the loop runs
+#   retained     - memory and number of memory blocks still held by the
+#                  values of the variables after the second program
+#
+# usage: python3 bench/values.py [iterations]
+
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ast
+import compiler
+import interpreter
+import program
+import resolver
+
+ENGINES = ["tree", "vm"]
+VARIABLES = 10000
+
+COUNTING_LOOP = """
+i = 0;
+total = 0;
+while (i < %d) {
+  total = (total + (i * 2));
+  i = (i + 1);
+};
+"""
+
+
+def getVariables():
+    lines = ["x = 1;"]
+    lines += ["v%d = ((x + %d) / 2);" % (index, index) for index in range(VARIABLES)]
+    lines += ["b%d = (x < %d);" % (index, index) for index in range(VARIABLES)]
+    return "\n".join(lines) + "\n"
+
+
+# a function running the program once, returning what holds its variables
+def prepare(rawProgramString, engine):
+    parsedAST = program.parseString(rawProgramString)
+    if engine == "vm":
+        bytecode = compiler.Compiler().compileProgram(parsedAST)
+
+        def runVm():
+            globalScope = {}
+            interpreter.Interpreter(bytecode, globalScope, io.StringIO()).run()
+            return globalScope
+        return runVm
+
+    resolver.resolve(parsedAST)
+
+    def runTree():
+        ctx = ast.Context(parsedAST.slotCount, None, io.StringIO())
+        parsedAST.interpret(ctx)
+        return ctx
+    return runTree
+
+
+def measure(engine, iterations):
+    run = prepare(COUNTING_LOOP % iterations, engine)
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    run = prepare(getVariables(), engine)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    variables = run()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    retained = 0
+    blocks = 0
+    for stat in after.compare_to(before, "filename"):
+        retained += stat.size_diff
+        blocks += stat.count_diff
+    del variables
+    return elapsed * 1e3, peak, retained, blocks
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("%-6s %12s %12s %14s %14s" % ("engine", "loop ms", "loop peak", "retained KiB", "retained blocks"))
+    for engine in ENGINES:
+        elapsed, peak, retained, blocks = measure(engine, iterations)
+        print("%-6s %12.1f %10.1fKiB %14.1f %14d" % (engine, elapsed, peak / 1024.0, retained / 1024.0, blocks))
+
+
+if __name__ == "__main__":
+    main()
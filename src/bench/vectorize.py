@@ -0,0 +1,70 @@
+# Program to benchmark the vectorized evaluation of a formula over columns
+#
+# evaluates a formula (arithmetic, comparisons and an if - else if - else)
+# over generated columns with vectorize.VectorProgram, and per row with
+# Program.run on the first rows (the time per row is extrapolated to every
+# row). The results of those rows are checked to be the same. Needs NumPy.
+#
+# usage: python3 bench/vectorize.py [rows]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import program
+import vectorize
+
+# rows run per row with Program.run
+SAMPLE_ROWS = 2000
+
+FORMULA = """
+total = ((price * quantity) - discount);
+band = if (total < 100) { 1 } else if (total < 1000) { 2 } else { 3 };
+small = (band == 1);
+fee = if (small && member) { 0 } else { (total / 20) };
+due = (total + fee);
+"""
+
+
+def getColumns(rows):
+    numpy = vectorize.numpy
+    generator = numpy.random.default_rng(0)
+    return {
+        "price": generator.integers(1, 500, rows).astype(float),
+        "quantity": generator.integers(1, 20, rows).astype(float),
+        "discount": generator.integers(0, 50, rows).astype(float),
+        "member": generator.random(rows) < 0.3,
+    }
+
+
+def main():
+    if vectorize.numpy is None:
+        sys.exit("bench/vectorize.py needs NumPy")
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    columns = getColumns(rows)
+
+    vectorProgram = vectorize.VectorProgram.fromString(FORMULA)
+    start = time.perf_counter()
+    result = vectorProgram.run(columns)
+    vectorized = time.perf_counter() - start
+
+    rowProgram = program.Program.fromString(FORMULA)
+    sampleRows = min(rows, SAMPLE_ROWS)
+    start = time.perf_counter()
+    for row in range(sampleRows):
+        values = rowProgram.run(dict((name, column[row].item()) for name, column in columns.items()))
+        for name, value in values.items():
+            if result[name][row] != value:
+                sys.exit("row %d: %s is %r, vectorized %r" % (row, name, value, result[name][row]))
+    perRow = (time.perf_counter() - start) / sampleRows * rows
+
+    print("%d rows" % rows)
+    print("per row     %10.1f ms (extrapolated from %d rows)" % (perRow * 1e3, sampleRows))
+    print("vectorized  %10.1f ms" % (vectorized * 1e3))
+    print("speedup     %10.0fx" % (perRow / vectorized))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Program to benchmark the incremental updates of the watch mode
+#
+# builds a generated program of the given number of statements, then edits
+# one line in the middle of it in place, inserts a line and deletes a line.
+# Every edit updates the program incrementally (watch.py: parsing, then
+# optimizing, resolving and compiling for the engine), which is compared
+# with parsing and preparing the whole program like a normal run. Both
+# programs are executed and must print the same. An update only depends on
+# the size of the edit, inserting or deleting a line moves the offsets and
+# first lines of the statements after it in a list.
+#
+# usage: python3 bench/watch.py [statements] [engine]
+
+import io
+import os
+import sys
+import time
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIRECTORY)
+
+import program
+import watch
+
+
+def getProgram(count):
+    lines = ["a = 0;"]
+    for index in range(count - 2):
+        if index % 10 == 9:
+            lines.append("if (a > %d) { a = 0; } else { a = (a + 1); };" % index)
+        else:
+            lines.append("a = (a + %d);" % (index % 7))
+    lines.append("println a;")
+    return lines
+
+
+def getEdits(lines):
+    middle = len(lines) // 2
+    edited = lines[:middle] + ["a = (a + 100);"] + lines[middle + 1:]
+    inserted = edited[:middle] + ["println a;"] + edited[middle:]
+    deleted = inserted[:middle + 1] + inserted[middle + 2:]
+    return [
+        ("edit a line", edited),
+        ("insert a line", inserted),
+        ("delete a line", deleted),
+    ]
+
+
+# what executing the prepared program prints
+def getOutput(execute):
+    output = io.StringIO()
+    execute(output)
+    return output.getvalue()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    engine = sys.argv[2] if len(sys.argv) > 2 else "tree"
+    lines = getProgram(count)
+    text = "\n".join(lines) + "\n"
+
+    start = time.perf_counter()
+    watched = watch.IncrementalProgram(text, engine)
+    print("%d statements, %.2f MB, engine %s, first parse and prepare %.3fs"
+          % (count, len(text) / 1e6, engine, time.perf_counter() - start))
+
+    for name, newLines in getEdits(lines):
+        text = "\n".join(newLines) + "\n"
+
+        start = time.perf_counter()
+        parsed = watched.update(text)
+        incremental = time.perf_counter() - start
+
+        start = time.perf_counter()
+        execute = program.prepareProgram(program.parseString(text), engine)
+        full = time.perf_counter() - start
+
+        if getOutput(watched.prepared.execute) != getOutput(execute):
+            print("%s: the incremental and the full program differ" % name)
+            return 1
+        print("  %-14s %d statements updated in %8.2f ms  full parse and prepare %8.3fs  %6.0fx"
+              % (name, parsed, incremental * 1e3, full, full / incremental))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+# Program to define the on-disk cache of the generated parser tables and of
+# the parsed programs
+#
+# Building the LALR table in ParserGenerator.build() is the most expensive part
+# of starting mini-js, so the table is computed once and stored as a marshal
+# file. The file name is keyed by the grammar in parser.py (productions,
+# terminals and precedence) and by the token rules in lexer.py, so editing
+# either of them invalidates the cache automatically.
+#
+# The compiled regular expressions of the lexer cannot be persisted across
+# processes, but they only take about a millisecond to build; the token rules
+# are still part of the cache key.
+#
+# Parsed programs are cached the same way CPython caches .pyc files: the
+# ast.Block of a program is pickled into __minjscache__/<program>.minjsc next
+# to the source file, with a header holding the hash of the source and the
+# interpreter version. A valid .minjsc file is loaded instead of lexing and
+# parsing the source again. Programs transpiled to Python (--engine=python)
+# are cached next to them as marshalled code objects (.minjspy).
+#
+# Loading a pickle or a code object runs whatever its author wants, and the
+# header of a cache file is easy to compute from the source. A cache file is
+# only loaded when it belongs to the current user (or root) and no other
+# user can write to it, otherwise it is ignored like a stale file.
+#
+# prebuild the cache (install.sh does this):
+#   python3 cache.py
+
+import hashlib
+import marshal
+import os
+import pickle
+import stat
+import sys
+import tempfile
+import warnings
+
+from rply.errors import ParserGeneratorWarning
+from rply.grammar import Grammar
+from rply.parser import LRParser
+from rply.parsergenerator import LRTable
+
+import lexer
+
+# bump whenever the layout of the cached data changes
+CACHE_VERSION = 1
+
+
+# the cache directory can be overridden by the MINIJS_CACHE_DIR environment
+# variable, by default the cache lives next to the source like __pycache__
+def getCacheDirectory():
+    cacheDirectory = os.environ.get("MINIJS_CACHE_DIR")
+    if cacheDirectory:
+        return cacheDirectory
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "__minjscache__")
+
+
+# hash of every ignore/token rule of the lexer (name, pattern, flags)
+def getLexerSignature():
+    lg = lexer.getLexerGenerator()
+    hasher = hashlib.sha1()
+    for rule in lg.ignore_rules:
+        hasher.update(b"ignore\0" + rule.re.pattern.encode() + b"\0" + str(rule.re.flags).encode())
+    for rule in lg.rules:
+        hasher.update(rule.name.encode() + b"\0" + rule.re.pattern.encode() + b"\0" + str(rule.re.flags).encode())
+    return hasher.hexdigest()
+
+
+def getParserCacheFile(pg, grammar):
+    hasher = hashlib.sha1()
+    hasher.update(pg.compute_grammar_hash(grammar).encode())
+    hasher.update(getLexerSignature().encode())
+    return os.path.join(getCacheDirectory(), "parser-%d.%s.%s.marshal" % (
+        CACHE_VERSION, sys.implementation.cache_tag, hasher.hexdigest()))
+
+
+# same grammar construction as ParserGenerator.build(), this part is cheap
+def buildGrammar(pg):
+    grammar = Grammar(pg.tokens)
+
+    for level, (assoc, terms) in enumerate(pg.precedence, 1):
+        for term in terms:
+            grammar.set_precedence(term, assoc, level)
+
+    for productionName, symbols, func, precedence in pg.productions:
+        grammar.add_production(productionName, symbols, func, precedence)
+
+    grammar.set_start()
+    grammar.build_lritems()
+    grammar.compute_first()
+    grammar.compute_follow()
+    return grammar
+
+
+# whether the opened cache file can only have been written by the current
+# user (or root)
+def isTrustedFile(f):
+    status = os.fstat(f.fileno())
+    if hasattr(os, "getuid") and status.st_uid not in (0, os.getuid()):
+        return False
+    return not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+# write data to the cache file through a temporary file, so that concurrent
+# launches never read a partially written file; returns False when the
+# cache directory cannot be written (e.g. a read-only installation)
+def replaceFile(cacheFile, write):
+    cacheDirectory = os.path.dirname(cacheFile)
+    temporaryFile = None
+    try:
+        os.makedirs(cacheDirectory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cacheDirectory, delete=False) as f:
+            temporaryFile = f.name
+            write(f)
+        os.replace(temporaryFile, cacheFile)
+        temporaryFile = None
+    except OSError:
+        return False
+    finally:
+        # the temporary file is not left behind when it was not renamed
+        if temporaryFile is not None:
+            try:
+                os.unlink(temporaryFile)
+            except OSError:
+                pass
+    return True
+
+
+def loadTable(cacheFile, pg, grammar):
+    try:
+        with open(cacheFile, "rb") as f:
+            if not isTrustedFile(f):
+                return None
+            data = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    # the file name already contains the grammar hash, this guards against
+    # hash collisions and truncated files
+    if not pg.data_is_valid(grammar, data):
+        return None
+    return LRTable(grammar, data["lr_action"], data["lr_goto"], data["default_reductions"],
+                   data["sr_conflicts"], data["rr_conflicts"])
+
+
+def storeTable(cacheFile, pg, table):
+    data = pg.serialize_table(table)
+    # marshal only supports the builtin types, precedence values are tuples
+    data["precedence"] = dict((term, list(value)) for term, value in data["precedence"].items())
+    data["productions"] = [(name, prod, list(prec)) for name, prod, prec in data["productions"]]
+
+    # on a read-only installation the table is simply rebuilt next time
+    replaceFile(cacheFile, lambda f: marshal.dump(data, f))
+
+
+def warnConflicts(table):
+    if table.sr_conflicts:
+        warnings.warn("%d shift/reduce conflict%s" % (len(table.sr_conflicts), "s" if len(table.sr_conflicts) > 1 else ""),
+                      ParserGeneratorWarning, stacklevel=3)
+    if table.rr_conflicts:
+        warnings.warn("%d reduce/reduce conflict%s" % (len(table.rr_conflicts), "s" if len(table.rr_conflicts) > 1 else ""),
+                      ParserGeneratorWarning, stacklevel=3)
+
+
+# drop-in replacement of pg.build() that goes through the on-disk cache
+def buildParser(pg):
+    grammar = buildGrammar(pg)
+    cacheFile = getParserCacheFile(pg, grammar)
+
+    table = loadTable(cacheFile, pg, grammar)
+    if table is None:
+        table = LRTable.from_grammar(grammar)
+        storeTable(cacheFile, pg, table)
+
+        # conflicts are only reported when the table is generated
+        warnConflicts(table)
+
+    return LRParser(table, pg.error_handler)
+
+
+# compiled program (.minjsc) cache
+
+COMPILED_PROGRAM_MAGIC = b"MJSC"
+COMPILED_PROGRAM_DIRECTORY = "__minjscache__"
+COMPILED_PROGRAM_SUFFIX = ".minjsc"
+
+# the interpreter version covers every module that defines the shape of the
+# parsed AST, it is computed once per process
+interpreterVersion = None
+
+
+def getInterpreterVersion():
+    global interpreterVersion
+    if interpreterVersion is None:
+        hasher = hashlib.sha1()
+        hasher.update(str(CACHE_VERSION).encode())
+        hasher.update(sys.implementation.cache_tag.encode())
+        srcDirectory = os.path.dirname(os.path.abspath(__file__))
+        for moduleName in ["ast.py", "lexer.py", "parser.py"]:
+            with open(os.path.join(srcDirectory, moduleName), "rb") as f:
+                hasher.update(f.read())
+        interpreterVersion = hasher.digest()
+    return interpreterVersion
+
+
+def getCompiledProgramFile(filename):
+    directory, basename = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, COMPILED_PROGRAM_DIRECTORY, basename + COMPILED_PROGRAM_SUFFIX)
+
+
+def getCompiledProgramHeader(rawProgramString):
+    return COMPILED_PROGRAM_MAGIC + getInterpreterVersion() + hashlib.sha1(rawProgramString.encode()).digest()
+
+
+# payload of a cache file that starts with header, None when the file is
+# missing, stale or not trusted
+def readCacheFile(cacheFile, header):
+    try:
+        with open(cacheFile, "rb") as f:
+            if not isTrustedFile(f):
+                return None
+            data = f.read()
+    except OSError:
+        return None
+
+    if not data.startswith(header):
+        return None
+    return data[len(header):]
+
+
+def writeCacheFile(cacheFile, header, payload):
+    replaceFile(cacheFile, lambda f: f.write(header + payload))
+
+
+# return the cached AST of the program, or None when there is no valid .minjsc file
+def loadCompiledProgram(filename, rawProgramString):
+    payload = readCacheFile(getCompiledProgramFile(filename), getCompiledProgramHeader(rawProgramString))
+    if payload is None:
+        return None
+
+    try:
+        return pickle.loads(payload)
+    except Exception:
+        # stale or corrupted file, it is overwritten by the next store
+        return None
+
+
+def storeCompiledProgram(filename, rawProgramString, parsedAST):
+    try:
+        payload = pickle.dumps(parsedAST, pickle.HIGHEST_PROTOCOL)
+    except (RecursionError, pickle.PicklingError):
+        return
+    writeCacheFile(getCompiledProgramFile(filename), getCompiledProgramHeader(rawProgramString), payload)
+
+
+# transpiled program (--engine=python) cache
+#
+# the code object generated by transpiler.py is stored with marshal in
+# __minjscache__/<program>.O<level>.minjspy, one file per optimization level
+
+TRANSPILED_PROGRAM_MAGIC = b"MJSP"
+TRANSPILED_PROGRAM_SUFFIX = ".minjspy"
+
+transpilerVersion = None
+
+
+# the generated code also depends on the optimizer, the resolver and the
+# transpiler itself
+def getTranspilerVersion():
+    global transpilerVersion
+    if transpilerVersion is None:
+        hasher = hashlib.sha1(getInterpreterVersion())
+        srcDirectory = os.path.dirname(os.path.abspath(__file__))
+        for moduleName in ["optimizer.py", "resolver.py", "transpiler.py", "runtime.py"]:
+            with open(os.path.join(srcDirectory, moduleName), "rb") as f:
+                hasher.update(f.read())
+        transpilerVersion = hasher.digest()
+    return transpilerVersion
+
+
+def getTranspiledProgramFile(filename, level):
+    directory, basename = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, COMPILED_PROGRAM_DIRECTORY,
+                        "%s.O%d%s" % (basename, level, TRANSPILED_PROGRAM_SUFFIX))
+
+
+def getTranspiledProgramHeader(rawProgramString, level):
+    return (TRANSPILED_PROGRAM_MAGIC + getTranspilerVersion() + bytes([level]) +
+            hashlib.sha1(rawProgramString.encode()).digest())
+
+
+# return the cached code object of the program, or None
+def loadTranspiledProgram(filename, rawProgramString, level):
+    payload = readCacheFile(getTranspiledProgramFile(filename, level),
+                            getTranspiledProgramHeader(rawProgramString, level))
+    if payload is None:
+        return None
+
+    try:
+        return marshal.loads(payload)
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def storeTranspiledProgram(filename, rawProgramString, level, code):
+    writeCacheFile(getTranspiledProgramFile(filename, level),
+                   getTranspiledProgramHeader(rawProgramString, level), marshal.dumps(code))
+
+
+def main():
+    from parser import Parser
+
+    # building the parser populates the cache
+    Parser()
+    print("parser tables cached in " + getCacheDirectory())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Program to define the client of the mini-js daemon
+#
+# bin/mini-js runs this client instead of interp.py when a daemon started
+# with "mini-js --serve" is listening. The client sends its command line and
+# working directory over the Unix domain socket of the daemon, writes what
+# the daemon streams back to its own stdout and stderr, and exits with the
+# exit status of the program. When no daemon answers, it runs interp.py.
+#
+# Only the standard library is imported, rply is never loaded by the client.
+#
+# The default socket is in a directory only its user can access, and both
+# ends check that the other one runs as the same user (where the platform
+# reports it), so a socket created by another user is never used.
+#
+# Every message on the socket is a channel byte, the payload length (4 bytes,
+# big endian) and the payload:
+#
+#   r  request (client -> daemon): JSON {"argv": [...], "cwd": ..., "isatty": ...}
+#   o  text written to stdout (daemon -> client)
+#   e  text written to stderr (daemon -> client)
+#   x  exit status, the last message (daemon -> client)
+
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+
+REQUEST = b"r"
+STDOUT = b"o"
+STDERR = b"e"
+EXIT = b"x"
+
+HEADER = struct.Struct(">cI")
+
+# pid, uid and gid of the other end of a socket (SO_PEERCRED)
+PEER_CREDENTIALS = struct.Struct("3i")
+
+
+# raised when the socket or the other end of it may belong to another user
+class UnsafeSocketError(OSError):
+    pass
+
+
+# the directory of the default socket, mini-js-<uid> in the runtime
+# directory of the user
+def getSocketDirectory():
+    return os.path.join(os.environ.get("XDG_RUNTIME_DIR") or "/tmp", "mini-js-%d" % os.getuid())
+
+
+# the socket of the daemon, $MINIJS_SOCKET or mini-js.sock in the socket
+# directory (the same path as in bin/mini-js)
+def getSocketPath(path=None):
+    if path:
+        return path
+    if os.environ.get("MINIJS_SOCKET"):
+        return os.environ["MINIJS_SOCKET"]
+    return os.path.join(getSocketDirectory(), "mini-js.sock")
+
+
+# the socket directory must be a directory (not a link) of the user that the
+# other users cannot access, another user could have created it first
+def checkSocketDirectory(directory):
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid():
+        raise UnsafeSocketError(directory + " is not a directory owned by the user")
+    if stat.S_IMODE(status.st_mode) & 0o077:
+        raise UnsafeSocketError("%s can be accessed by other users (mode %o)" % (directory, stat.S_IMODE(status.st_mode)))
+
+
+# the other end of the connection must run as the same user, only the socket
+# directory protects the socket where the platform does not report it
+def checkPeer(connection):
+    if not hasattr(socket, "SO_PEERCRED"):
+        return
+    pid, uid, gid = PEER_CREDENTIALS.unpack(
+        connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CREDENTIALS.size))
+    if uid != os.getuid():
+        raise UnsafeSocketError("the other end of the socket runs as uid %d" % uid)
+
+
+def sendMessage(connection, channel, payload):
+    connection.sendall(HEADER.pack(channel, len(payload)) + payload)
+
+
+def receiveExactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+# return (channel, payload), None when the connection is closed
+def receiveMessage(connection):
+    header = receiveExactly(connection, HEADER.size)
+    if header is None:
+        return None
+    channel, size = HEADER.unpack(header)
+    payload = receiveExactly(connection, size)
+    if payload is None:
+        return None
+    return channel, payload
+
+
+def connect(path=None):
+    socketPath = getSocketPath(path)
+    if os.path.dirname(socketPath) == getSocketDirectory():
+        checkSocketDirectory(os.path.dirname(socketPath))
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socketPath)
+        checkPeer(connection)
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+# run interp.py in this process instead
+def runLocally(argv):
+    interp = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interp.py")
+    os.execv(sys.executable, [sys.executable, interp] + argv)
+
+
+def main():
+    argv = sys.argv[1:]
+    try:
+        connection = connect()
+    except UnsafeSocketError as e:
+        sys.stderr.write("mini-js: not using the daemon, " + str(e) + "\n")
+        runLocally(argv)
+    except OSError:
+        runLocally(argv)
+
+    request = {"argv": argv, "cwd": os.getcwd(), "isatty": sys.stdout.isatty()}
+    with connection:
+        sendMessage(connection, REQUEST, json.dumps(request).encode())
+        while True:
+            message = receiveMessage(connection)
+            if message is None:
+                sys.stderr.write("mini-js: the daemon closed the connection\n")
+                return 1
+
+            channel, payload = message
+            if channel == STDOUT:
+                sys.stdout.buffer.write(payload)
+                sys.stdout.buffer.flush()
+            elif channel == STDERR:
+                sys.stderr.buffer.write(payload)
+                sys.stderr.buffer.flush()
+            elif channel == EXIT:
+                return int(payload)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+# Program to define the closure compiler
+#
+# The closure compiler turns every node of a resolved AST (see resolver.py)
+# once into a Python closure that takes the Context and returns what
+# node.interpret(ctx) would return. The work AST.interpret repeats on every
+# evaluation is done once at compile time:
+#
+#   - the operator of a BinaryOperator is picked when it is compiled, the
+#     closure calls the arithmetic/comparison directly
+#   - operand evaluators are captured by the closure, identifiers are read
+#     from their resolved slot without wrapping the value in an Expr
+#   - the shape of if - else arms (Expr or Block body) is checked once
+#
+# The closures follow the tree-walker exactly, including its type checks.
+# Operators are only specialized for operands that are literals, identifiers
+# or parenthesized expressions; when the operand types seen at runtime are
+# not the fast (Number, Number) / (Boolean, Boolean) case (or a string
+# concatenation), and for every
+# other node shape, the closure falls back to node.interpret, which raises the
+# same errors.
+
+import ast
+
+# shared Null value returned by if - else arms with a statement body
+NULL = ast.NULL
+
+# operator -> function of the two Python values of Number operands
+NUMBER_OPERATORS = {
+    "+": lambda left, right: ast.getNumber(left + right),
+    "-": lambda left, right: ast.getNumber(left - right),
+    "*": lambda left, right: ast.getNumber(left * right),
+    "/": lambda left, right: ast.getNumber(left / right),
+    ">=": lambda left, right: ast.getBoolean(left >= right),
+    "<=": lambda left, right: ast.getBoolean(left <= right),
+    ">": lambda left, right: ast.getBoolean(left > right),
+    "<": lambda left, right: ast.getBoolean(left < right),
+    "==": lambda left, right: ast.getBoolean(left == right),
+    "!=": lambda left, right: ast.getBoolean(left != right),
+}
+
+# operator -> function of the two Python values of Boolean operands
+BOOLEAN_OPERATORS = {
+    "||": lambda left, right: ast.getBoolean(left or right),
+    "&&": lambda left, right: ast.getBoolean(left and right),
+    "==": lambda left, right: ast.getBoolean(left == right),
+    "!=": lambda left, right: ast.getBoolean(left != right),
+}
+
+# operator -> method of the left operand, used when an operand is
+# parenthesized (BinaryOperator.interpret does not check its type then)
+OPERATOR_METHODS = {
+    "+": "add",
+    "-": "minus",
+    "*": "multiply",
+    "/": "divide",
+    ">=": "greater_than_or_equal_to",
+    "<=": "less_than_or_equal_to",
+    ">": "greater_than",
+    "<": "less_than",
+    "==": "equal_to",
+    "!=": "not_equal_to",
+}
+
+# operands evaluated by the specialized operators
+LITERAL_TYPES = (ast.Number, ast.String, ast.Boolean)
+
+
+# kind of a BinaryOperator operand: the type of the value inside its Expr,
+# None for operands that are not specialized
+def getOperandKind(node):
+    if node.type() != ast.Expr:
+        return None
+    valueType = node.getValue().type()
+    if valueType in LITERAL_TYPES or valueType in (ast.Identifier, ast.ParentheseValue):
+        return valueType
+    return None
+
+
+# whether evaluating the node twice has the same effect as evaluating it once
+def isPure(node):
+    if node.type() in (ast.Expr, ast.ParentheseValue):
+        return isPure(node.getValue() if node.type() == ast.Expr else node.value)
+    if node.type() == ast.BinaryOperator:
+        return isPure(node.left) and isPure(node.right)
+    return node.type() in LITERAL_TYPES or node.type() == ast.Identifier
+
+
+# closure returning the value of a resolved identifier
+def makeLoad(identifier):
+    addresses = identifier.addresses
+    if len(addresses) == 1 and addresses[0][0] == 0:
+        slot = addresses[0][1]
+
+        def load(ctx):
+            value = ctx.slots[slot]
+            if value is None:
+                return ctx.lookup(identifier)
+            return value
+        return load
+
+    return lambda ctx: ctx.lookup(identifier)
+
+
+# closure assigning a value to a resolved identifier
+def makeStore(identifier):
+    addresses = identifier.addresses
+    if len(addresses) == 1 and addresses[0] == (0, identifier.declareSlot):
+        slot = identifier.declareSlot
+
+        def store(ctx, value):
+            ctx.slots[slot] = value
+        return store
+
+    return lambda ctx, value: ctx.add(identifier, value)
+
+
+class ClosureCompiler(object):
+    # compile the program block to a closure taking the global Context
+    def compileProgram(self, block):
+        return self.compile(block)
+
+    def compile(self, node):
+        # dispatch on the AST class, e.g. compileBinaryOperator
+        method = getattr(self, "compile" + type(node).__name__, None)
+        if method is None:
+            return node.interpret
+        return method(node)
+
+    # statements
+
+    def compileBlock(self, node):
+        statements = tuple(self.compile(statement) for statement in node.getASTList())
+
+        def block(ctx):
+            for statement in statements:
+                statement(ctx)
+        return block
+
+    def compileStatement(self, node):
+        expr = self.compile(node.expr)
+
+        def statement(ctx):
+            expr(ctx)
+        return statement
+
+    def compilePrintStatement(self, node):
+        expr = self.compile(node.expr)
+        printValue = node.printValue
+        return lambda ctx: printValue(ctx, expr(ctx))
+
+    def compileWhileStatement(self, node):
+        slotCount = node.slotCount
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+        Context = ast.Context
+
+        def whileStatement(ctx):
+            # create a nested context since we are entering a different scope
+            ctx = Context(slotCount, ctx)
+            if condition(ctx).type() != ast.Boolean:
+                raise ast.ConditionError(
+                    "Conditional statement of while statement must be type Boolean.")
+            while condition(ctx).isTrue():
+                body(ctx)
+        return whileStatement
+
+    def compileForStatement(self, node):
+        slotCount = node.slotCount
+        preStatement = self.compile(node.preStatement)
+        condition = self.compile(node.condition)
+        postStatement = self.compile(node.postStatement)
+        body = self.compile(node.body)
+        countedLoop = node.countedLoop
+        Context = ast.Context
+
+        def forStatement(ctx):
+            # create a nested context since we are entering a different scope
+            ctx = Context(slotCount, ctx)
+            if condition(ctx).type() != ast.Boolean:
+                raise ast.ConditionError(
+                    "Conditional statement of while statement must be type Boolean.")
+            preStatement(ctx)
+            # see loops.py
+            if countedLoop is not None and countedLoop.run(ctx, body):
+                return
+            while condition(ctx).isTrue():
+                body(ctx)
+                postStatement(ctx)
+        return forStatement
+
+    # expressions
+
+    def compileExpr(self, node):
+        return self.compile(node.getValue())
+
+    def compileParentheseValue(self, node):
+        return self.compile(node.value)
+
+    def compileNumber(self, node):
+        return lambda ctx: node
+
+    def compileString(self, node):
+        return lambda ctx: node
+
+    def compileBoolean(self, node):
+        return lambda ctx: node
+
+    # identifiers evaluate to themselves, the node using the value looks
+    # them up (see compileOperand)
+    def compileIdentifier(self, node):
+        return lambda ctx: node
+
+    # closure returning the value of an operand, identifiers are looked up
+    def compileOperand(self, node):
+        value = node.getValue()
+        if value.type() == ast.Identifier:
+            return makeLoad(value)
+        return self.compile(value)
+
+    def compileBinaryOperator(self, node):
+        leftKind = getOperandKind(node.left)
+        rightKind = getOperandKind(node.right)
+        if leftKind is None or rightKind is None:
+            return node.interpret
+
+        left = self.compileOperand(node.left)
+        right = self.compileOperand(node.right)
+        interpret = node.interpret
+
+        if leftKind == ast.ParentheseValue or rightKind == ast.ParentheseValue:
+            # the tree-walker calls the operator method of the left value
+            # without checking the operand types
+            if node.op not in OPERATOR_METHODS:
+                return interpret
+            name = OPERATOR_METHODS[node.op]
+
+            if rightKind == ast.Identifier and leftKind != ast.Identifier:
+                # identifiers are looked up before the other operand is evaluated
+                def binaryOperator(ctx):
+                    rightValue = right(ctx)
+                    return getattr(left(ctx), name)(rightValue)
+                return binaryOperator
+
+            return lambda ctx: getattr(left(ctx), name)(right(ctx))
+
+        # literals and identifiers have no side effects, both are evaluated
+        # first, any other combination of types is left to the tree-walker
+        numberOperator = NUMBER_OPERATORS.get(node.op)
+        booleanOperator = BOOLEAN_OPERATORS.get(node.op)
+        Number = ast.Number
+        Boolean = ast.Boolean
+
+        if node.op == "+":
+            String = ast.String
+            textTypes = ast.TEXT_TYPES
+            concatenate = ast.concatenate
+
+            def binaryOperator(ctx):
+                leftValue = left(ctx)
+                rightValue = right(ctx)
+                if type(leftValue) is Number and type(rightValue) is Number:
+                    return numberOperator(leftValue.value, rightValue.value)
+                if ((type(leftValue) is String or type(rightValue) is String) and
+                        type(leftValue) in textTypes and type(rightValue) in textTypes):
+                    return concatenate(leftValue, rightValue)
+                return interpret(ctx)
+        elif numberOperator is not None and booleanOperator is not None:
+            def binaryOperator(ctx):
+                leftValue = left(ctx)
+                rightValue = right(ctx)
+                if type(leftValue) is Number and type(rightValue) is Number:
+                    return numberOperator(leftValue.value, rightValue.value)
+                if type(leftValue) is Boolean and type(rightValue) is Boolean:
+                    return booleanOperator(leftValue.value, rightValue.value)
+                return interpret(ctx)
+        elif numberOperator is not None:
+            def binaryOperator(ctx):
+                leftValue = left(ctx)
+                rightValue = right(ctx)
+                if type(leftValue) is Number and type(rightValue) is Number:
+                    return numberOperator(leftValue.value, rightValue.value)
+                return interpret(ctx)
+        elif booleanOperator is not None:
+            def binaryOperator(ctx):
+                leftValue = left(ctx)
+                rightValue = right(ctx)
+                if type(leftValue) is Boolean and type(rightValue) is Boolean:
+                    return booleanOperator(leftValue.value, rightValue.value)
+                return interpret(ctx)
+        else:
+            return interpret
+        return binaryOperator
+
+    def compileAssignmentExpression(self, node):
+        # left hand side has to be an identifier, AssignmentError is raised
+        # by the tree-walker
+        identifier = node.identifier
+        if identifier.type() == ast.Expr:
+            identifier = identifier.getValue()
+        if identifier.type() != ast.Identifier:
+            return node.interpret
+
+        store = makeStore(identifier)
+        if node.expr.type() == ast.Expr and node.expr.getValue().type() == ast.Identifier:
+            load = makeLoad(node.expr.getValue())
+
+            def assignmentExpression(ctx):
+                value = load(ctx)
+                store(ctx, value)
+                return value
+            return assignmentExpression
+
+        expr = self.compile(node.expr)
+
+        def assignmentExpression(ctx):
+            value = expr(ctx)
+            if value.type() == ast.Identifier:
+                value = ctx.lookup(value)
+            store(ctx, value)
+            return value
+        return assignmentExpression
+
+    def compileIfExpression(self, node):
+        slotCount = node.slotCount
+        condition = self.compile(node.condition)
+        Context = ast.Context
+
+        # IfExpression.interpret only executes statement bodies, an arm with
+        # an expression body returns None
+        if node.if_body.type() == ast.Block:
+            body = self.compile(node.if_body)
+        else:
+            body = None
+
+        def ifExpression(ctx):
+            ctx = Context(slotCount, ctx)
+            value = condition(ctx)
+            if value.type() != ast.Boolean:
+                raise ast.ConditionError(
+                    "Conditional statement of if statement must be type Boolean.")
+            if value.value:
+                if body is None:
+                    return None
+                body(ctx)
+            return NULL
+        return ifExpression
+
+    # closure of an arm body: the value of an Expr body, Null after a
+    # statement body and None for other bodies
+    def compileArmBody(self, body):
+        if body.type() == ast.Expr:
+            return self.compile(body)
+        if body.type() == ast.Block:
+            block = self.compile(body)
+
+            def armBody(ctx):
+                block(ctx)
+                return NULL
+            return armBody
+        return lambda ctx: None
+
+    def compileIfElseIfElseExpression(self, node):
+        slotCount = node.slotCount
+        condition = self.compile(node.condition)
+        ifBody = self.compileArmBody(node.if_body)
+        elseBody = self.compileArmBody(node.else_body.getValue())
+        Context = ast.Context
+
+        # (condition, body) of the else if arms. An arm whose body is neither
+        # an Expr nor a Block is never taken, and ElseIfBodyList.interpret
+        # evaluates the condition of an arm that is not taken a second time
+        arms = []
+        for elseIfBody in node.else_if_body_list.getASTList():
+            body = elseIfBody.getValue()
+            taken = body.type() in (ast.Expr, ast.Block)
+            arms.append((self.compile(elseIfBody.condition), self.compileArmBody(body),
+                         taken, not isPure(elseIfBody.condition)))
+        arms = tuple(arms)
+
+        def interpretArms(ctx):
+            value = condition(ctx)
+            if value.type() != ast.Boolean:
+                raise ast.ConditionError(
+                    "Conditional statement of if statement must be type Boolean.")
+            if value.value:
+                return ifBody(ctx)
+
+            for armCondition, armBody, taken, evaluateTwice in arms:
+                if armCondition(ctx).isTrue() and taken:
+                    return armBody(ctx)
+                if evaluateTwice:
+                    armCondition(ctx).isFalse()
+            return elseBody(ctx)
+
+        def ifElseIfElseExpression(ctx):
+            ctx = Context(slotCount, ctx)
+            value = interpretArms(ctx)
+
+            # an identifier is looked up in the scope it was resolved in
+            if value is not None and value.type() == ast.Identifier:
+                return ctx.lookup(value)
+            return value
+        return ifElseIfElseExpression
+
+
+# compile the resolved program block to a closure taking the global Context
+def compileProgram(block):
+    return ClosureCompiler().compileProgram(block)
@@ -0,0 +1,368 @@
+# Program to define the bytecode compiler
+#
+# compiles the AST produced by the parser to the flat bytecode executed by
+# the Interpreter in interpreter.py. Every expression leaves exactly one value
+# on the stack, statements leave the stack unchanged.
+#
+# The bytecode follows the nodes of ast.py exactly, including their type
+# checks and errors (like closure.py and transpiler.py):
+#
+#   - an expression whose value is an identifier ("a", "(a)") is only looked
+#     up where the tree-walker looks it up, e.g. not by a statement or a
+#     condition, otherwise its value is a JSName
+#   - operators with literal or identifier operands type check both values,
+#     with a parenthesized operand the operator method of the left value is
+#     called without type checks (LOAD_METHOD, see obj.getMethod)
+#   - an if arm whose body is neither an expression nor statements is not
+#     evaluated, its value is None
+#   - errors that do not depend on values (e.g. "1 + 2 + 3", whose left
+#     operand is not wrapped in an Expr) are raised by RAISE_ERROR where the
+#     tree-walker raises them
+
+import ast
+import obj
+from interpreter import *
+
+# binary operator -> opcode
+BINARY_OPCODES = {
+    "+": BINARY_ADD,
+    "-": BINARY_SUBTRACT,
+    "*": BINARY_MULTIPLY,
+    "/": BINARY_DIVIDE,
+    ">=": COMPARE_GREATER_EQUAL,
+    "<=": COMPARE_LESS_EQUAL,
+    ">": COMPARE_GREATER,
+    "<": COMPARE_LESS,
+    "==": COMPARE_EQUAL,
+    "!=": COMPARE_NOT_EQUAL,
+    "||": BOOLEAN_OR,
+    "&&": BOOLEAN_AND,
+}
+
+
+# innermost value of Expr and ParentheseValue wrappers
+def unwrap(node):
+    while node.type() in (ast.Expr, ast.ParentheseValue):
+        node = node.getValue() if node.type() == ast.Expr else node.value
+    return node
+
+
+# the result of interpreting node is an Identifier, which the node using it
+# has to look up (e.g. "a" or "(a)")
+def isIdentifierResult(node):
+    return unwrap(node).type() == ast.Identifier
+
+
+# whether evaluating the node twice has the same effect as evaluating it once
+def isPure(node):
+    node = unwrap(node)
+    if node.type() == ast.BinaryOperator:
+        return isPure(node.left) and isPure(node.right)
+    return node.type() in (ast.Number, ast.String, ast.Boolean, ast.Identifier)
+
+
+class Compiler(object):
+    def __init__(self):
+        self.code = []
+        self.consts = []
+        self.names = []
+
+        # (type, value) -> index in the constant pool
+        self.constIndex = {}
+        # identifier name -> index in the name table
+        self.nameIndex = {}
+
+    # compile the program block to a Bytecode object
+    def compileProgram(self, block):
+        self.compile(block)
+        return Bytecode(self.code, self.consts, self.names)
+
+    def compile(self, node):
+        # dispatch on the AST class, e.g. compileBinaryOperator
+        method = getattr(self, "compile" + type(node).__name__, None)
+        if method is None:
+            raise ast.NotImplementedError("Node type " + type(node).__name__ + " cannot be compiled")
+        method(node)
+
+    # emit an instruction and return the position of its argument
+    def emit(self, opcode, arg=None):
+        self.code.append(opcode)
+        if opcode >= HAVE_ARGUMENT:
+            self.code.append(arg)
+            return len(self.code) - 1
+
+    # jump targets are patched once the position of the target is known
+    def emitJump(self, opcode):
+        return self.emit(opcode, -1)
+
+    def patchJump(self, argPosition):
+        self.code[argPosition] = len(self.code)
+
+    def addConst(self, value):
+        key = (type(value), value.getString())
+        if key not in self.constIndex:
+            self.constIndex[key] = len(self.consts)
+            self.consts.append(value)
+        return self.constIndex[key]
+
+    def addName(self, name):
+        if name not in self.nameIndex:
+            self.nameIndex[name] = len(self.names)
+            self.names.append(name)
+        return self.nameIndex[name]
+
+    def emitNull(self):
+        self.emit(LOAD_CONST, self.addConst(obj.NULL))
+
+    # raise exceptionClass(message), formatted with the types of the
+    # operandCount values on top of the stack (see obj.Error)
+    def emitError(self, exceptionClass, message, operandCount=0):
+        self.emit(RAISE_ERROR, self.addConst(obj.Error(exceptionClass, message, operandCount)))
+
+    # the AttributeError of calling a missing method on a node
+    def emitNoAttribute(self, typeName, attribute):
+        self.emitError(AttributeError, "'" + typeName + "' object has no attribute '" + attribute + "'")
+
+    # statements
+
+    def compileBlock(self, node):
+        for statement in node.getASTList():
+            self.compile(statement)
+
+    def compileStatement(self, node):
+        # an identifier is never looked up by a statement
+        if isIdentifierResult(node.expr):
+            return
+        self.compile(node.expr)
+        self.emit(POP_TOP)
+
+    def compilePrintStatement(self, node):
+        self.compileValue(node.expr)
+        if node.cmd == "println":
+            self.emit(PRINTLN)
+        else:
+            self.emit(PRINT)
+
+    # the condition is type checked once before the loop
+    def compileLoopCondition(self, condition):
+        if isIdentifierResult(condition):
+            self.emitError(ast.ConditionError, "Conditional statement of while statement must be type Boolean.")
+            return
+        self.compile(condition)
+        self.emit(CHECK_CONDITION)
+        self.emit(POP_TOP)
+
+    def compileLoop(self, condition, body, postStatement=None):
+        loopStart = len(self.code)
+        self.compileValue(condition)
+        loopExit = self.emitJump(POP_JUMP_IF_FALSE)
+        self.compile(body)
+        if postStatement is not None:
+            self.compile(postStatement)
+        self.emit(JUMP_ABSOLUTE, loopStart)
+        self.patchJump(loopExit)
+
+    def compileWhileStatement(self, node):
+        self.emit(PUSH_SCOPE)
+        self.compileLoopCondition(node.condition)
+        self.compileLoop(node.condition, node.body)
+        self.emit(POP_SCOPE)
+
+    def compileForStatement(self, node):
+        self.emit(PUSH_SCOPE)
+        # the condition is type checked before the pre statement runs, the
+        # same order as ForStatement.interpret
+        self.compileLoopCondition(node.condition)
+        self.compile(node.preStatement)
+        self.compileLoop(node.condition, node.body, node.postStatement)
+        self.emit(POP_SCOPE)
+
+    # expressions
+
+    # the value of node, an identifier is looked up
+    def compileValue(self, node):
+        value = unwrap(node)
+        if value.type() == ast.Identifier:
+            self.emit(LOAD_NAME, self.addName(value.getValue()))
+        else:
+            self.compile(value)
+
+    # compile() leaves what node.interpret(ctx) returns on the stack
+    def compileExpr(self, node):
+        self.compile(node.getValue())
+
+    def compileParentheseValue(self, node):
+        self.compile(node.value)
+
+    def compileNumber(self, node):
+        self.emit(LOAD_CONST, self.addConst(obj.JSNumber(node.getValue())))
+
+    def compileString(self, node):
+        self.emit(LOAD_CONST, self.addConst(obj.JSString(node.getValue())))
+
+    def compileBoolean(self, node):
+        self.emit(LOAD_CONST, self.addConst(obj.getBoolean(node.getValue())))
+
+    def compileNull(self, node):
+        self.emitNull()
+
+    # identifiers evaluate to themselves, the node using the value looks
+    # them up (see compileValue)
+    def compileIdentifier(self, node):
+        self.emit(LOAD_CONST, self.addConst(obj.JSName(node.getValue())))
+
+    def compileAssignmentExpression(self, node):
+        # "(a) = 1" assigns to a, the LHS is interpreted to the identifier
+        identifier = unwrap(node.identifier)
+        if identifier.type() != ast.Identifier:
+            # both sides are interpreted before the error is raised
+            self.compile(node.identifier)
+            self.compile(node.expr)
+            self.emit(POP_TOP)
+            self.emit(CHECK_VALUE)
+            self.emitError(ast.AssignmentError, "LHS of assignment statement must be an identifier")
+            return
+
+        self.compileValue(node.expr)
+        if unwrap(node.expr).type() in (ast.IfExpression, ast.IfElseIfElseExpression):
+            self.emit(CHECK_VALUE)
+        self.emit(STORE_NAME, self.addName(identifier.getValue()))
+
+    def compileBinaryOperator(self, node):
+        left = node.left
+        right = node.right
+
+        # operands are wrapped in an Expr, except for chained operators
+        # (e.g. "1 + 2 + 3"), BinaryOperator.interpret fails on getValue
+        if left.type() != ast.Expr:
+            self.emitNoAttribute(type(left).__name__, "getValue")
+            return
+        if right.type() != ast.Expr:
+            if left.getValue().type() == ast.Identifier:
+                self.compileValue(left)
+            self.emitNoAttribute(type(right).__name__, "getValue")
+            return
+
+        if left.getValue().type() == ast.ParentheseValue or right.getValue().type() == ast.ParentheseValue:
+            self.compileMethodOperator(node)
+            return
+
+        # literals and identifiers, both operands are evaluated first
+        self.compileValue(left)
+        self.compileValue(right)
+        self.emit(BINARY_OPCODES[node.op])
+
+    # operator with a parenthesized operand: the operator method of the left
+    # value is called without type checks
+    def compileMethodOperator(self, node):
+        left = node.left.getValue()
+        right = node.right.getValue()
+
+        if node.op not in OPERATORS.values():
+            # || and &&: BinaryOperator.interpret raises before evaluating the
+            # operands, identifiers that are not parenthesized are looked up
+            # and the type of their value is reported
+            types = []
+            for operand in [left, right]:
+                if operand.type() == ast.Identifier:
+                    self.compileValue(operand)
+                    types.append("%s")
+                else:
+                    types.append(str(type(operand)))
+            self.emitError(ast.NotImplementedError,
+                           "Operator \"" + node.op + "\" is not implemented for Expression Type " + types[0] +
+                           " and Expression Type " + types[1], types.count("%s"))
+            return
+
+        opcode = BINARY_OPCODES[node.op]
+        if right.type() == ast.Identifier:
+            # identifiers that are not parenthesized are looked up first
+            self.compileValue(right)
+            self.compile(node.left)
+            self.emit(ROT_TWO)
+            self.emit(APPLY_METHOD, opcode)
+        elif right.type() != ast.ParentheseValue:
+            # a literal, evaluating it first has no effect
+            self.compile(node.left)
+            self.compile(node.right)
+            self.emit(APPLY_METHOD, opcode)
+        else:
+            if left.type() == ast.Identifier:
+                self.compileValue(node.left)
+            else:
+                self.compile(node.left)
+            self.emit(LOAD_METHOD, opcode)
+            self.compile(node.right)
+            self.emit(CALL_METHOD)
+
+    # the value of an arm: the value of an Expr body, Null after a statement
+    # body and None for other bodies (which are not evaluated)
+    def compileArm(self, body):
+        if body.type() == ast.Block:
+            self.compile(body)
+            self.emitNull()
+        elif body.type() == ast.Expr:
+            self.compileValue(body)
+        else:
+            self.emit(LOAD_NONE)
+
+    # type check the condition of an if, leave it on the stack
+    def compileIfCondition(self, condition):
+        if isIdentifierResult(condition):
+            self.emitError(ast.ConditionError, "Conditional statement of if statement must be type Boolean.")
+            return
+        self.compile(condition)
+        self.emit(CHECK_IF_CONDITION)
+
+    # condition of an else if arm, an identifier has no isTrue method
+    def compileArmCondition(self, condition):
+        if isIdentifierResult(condition):
+            self.emitNoAttribute("Identifier", "isTrue")
+            return
+        self.compile(condition)
+
+    def compileIfExpression(self, node):
+        self.emit(PUSH_SCOPE)
+        self.compileIfCondition(node.condition)
+        elseJump = self.emitJump(POP_JUMP_IF_FALSE)
+
+        # IfExpression only executes statement bodies
+        if node.if_body.type() == ast.Block:
+            self.compileArm(node.if_body)
+        else:
+            self.emit(LOAD_NONE)
+        endJump = self.emitJump(JUMP_ABSOLUTE)
+        self.patchJump(elseJump)
+        self.emitNull()
+        self.patchJump(endJump)
+        self.emit(POP_SCOPE)
+
+    def compileIfElseIfElseExpression(self, node):
+        self.emit(PUSH_SCOPE)
+        endJumps = []
+
+        self.compileIfCondition(node.condition)
+        nextArm = self.emitJump(POP_JUMP_IF_FALSE)
+        self.compileArm(node.if_body)
+        endJumps.append(self.emitJump(JUMP_ABSOLUTE))
+        self.patchJump(nextArm)
+
+        # the arms of ElseIfBodyList.interpret
+        for elseIfBody in node.else_if_body_list.getASTList():
+            body = elseIfBody.getValue()
+            self.compileArmCondition(elseIfBody.condition)
+            nextArm = self.emitJump(POP_JUMP_IF_FALSE)
+            if body.type() in (ast.Expr, ast.Block):
+                self.compileArm(body)
+                endJumps.append(self.emitJump(JUMP_ABSOLUTE))
+            self.patchJump(nextArm)
+
+            # an arm that is not taken interprets its condition a second time
+            if not isPure(elseIfBody.condition):
+                self.compileArmCondition(elseIfBody.condition)
+                self.emit(CHECK_IS_FALSE)
+
+        self.compileArm(node.else_body.getValue())
+        for endJump in endJumps:
+            self.patchJump(endJump)
+        self.emit(POP_SCOPE)
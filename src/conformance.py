@@ -0,0 +1,76 @@
+# Program to check that the execution engines agree with the tree-walker
+#
+# runs every program of test/ with the tree-walking interpreter and with the
+# other engines, and compares what they print and the class of the error they
+# end with (if any). Every engine also runs the programs optimized at every
+# level (optimizer.py) and is compared with the unoptimized tree-walker.
+#
+# usage: python3 conformance.py [engine ...]   (default: every engine)
+
+import io
+import os
+import sys
+
+import ast
+import closure
+import compiler
+import interpreter
+import optimizer
+import program
+import resolver
+import transpiler
+
+ENGINES = ["closure", "vm", "python"]
+LEVELS = [0, 1, 2]
+TEST_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test")
+
+
+def execute(parsedAST, engine, output):
+    if engine == "tree":
+        parsedAST.interpret(ast.Context(parsedAST.slotCount, None, output))
+    elif engine == "closure":
+        closure.compileProgram(parsedAST)(ast.Context(parsedAST.slotCount, None, output))
+    elif engine == "vm":
+        interpreter.Interpreter(compiler.Compiler().compileProgram(parsedAST), None, output).run()
+    elif engine == "python":
+        transpiler.run(transpiler.compileProgram(parsedAST), output)
+
+
+# run the program like interp.py does, return (output, error class name)
+def runProgram(filename, engine, level=0):
+    output = io.StringIO()
+    try:
+        parsedAST = optimizer.optimize(program.parseString(program.getRawProgramString(filename)), level)
+        resolver.resolve(parsedAST)
+        execute(parsedAST, engine, output)
+    except Exception as e:
+        return output.getvalue(), type(e).__name__
+    return output.getvalue(), None
+
+
+def main():
+    engines = sys.argv[1:] or ENGINES
+    failed = 0
+    for name in sorted(os.listdir(TEST_DIRECTORY)):
+        filename = os.path.join(TEST_DIRECTORY, name)
+        if os.path.isdir(filename):
+            continue
+
+        expected = runProgram(filename, "tree")
+        for engine in ["tree"] + engines:
+            for level in LEVELS:
+                if engine == "tree" and level == 0:
+                    continue
+                result = runProgram(filename, engine, level)
+                if result == expected:
+                    print("ok       %-8s -O%d %s" % (engine, level, name))
+                else:
+                    failed += 1
+                    print("MISMATCH %-8s -O%d %s: expected %r, got %r" % (engine, level, name, expected, result))
+
+    print("%d mismatches" % failed)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
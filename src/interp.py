@@ -13,36 +13,289 @@ else {
 }
 '''
 
-from lexer import Lexer
-from parser import Parser
-import ast
+import argparse
+import batch
+import cache
+import contextlib
+import lexer
+import optimizer
+import output
+import os
+import profiler
+import program
+import sampler
+import server
+import stream
 import sys
+import watch
 
 
-def getRawProgramString(filename):
-    lines = open(filename, "r").readlines()
-    rawString = "".join(lines)
-    return rawString
+# list the programs of the given files and directories (recursively),
+# skipping the cache directories
+def getProgramFiles(paths):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, subdirectories, filenames in os.walk(path):
+            subdirectories[:] = sorted(d for d in subdirectories if d != cache.COMPILED_PROGRAM_DIRECTORY)
+            for filename in sorted(filenames):
+                yield os.path.join(directory, filename)
+
+
+# warm the compiled program cache without executing anything
+def compileOnly(paths, stdout=None):
+    failed = False
+    for filename in getProgramFiles(paths):
+        try:
+            program.parseFile(filename)
+            print("compiled " + filename, file=stdout)
+        except Exception as e:
+            failed = True
+            print("error " + filename + ": " + type(e).__name__, file=stdout)
+    return 1 if failed else 0
+
+
+# output of the print statements, stdout unless --output or --output-fd is given
+def getOutput(args, stdout):
+    if args.output_fd is not None:
+        return output.Output(args.output_fd, args.flush)
+    if args.output is not None:
+        return output.Output(args.output, args.flush)
+    return output.Output(stdout, args.flush)
+
+
+# the profiler instruments the AST classes only while the program runs and
+# reports when it terminates (also with an error)
+@contextlib.contextmanager
+def getProfiler(args, stderr):
+    if not args.profile:
+        yield None
+        return
+
+    nodeProfiler = profiler.Profiler()
+    try:
+        with nodeProfiler:
+            yield nodeProfiler
+    finally:
+        nodeProfiler.report(stderr)
+
+
+# the statements are sampled only while the program runs, the samples are
+# written when it terminates (also with an error)
+@contextlib.contextmanager
+def getSampler(args):
+    if args.sample is None:
+        yield None
+        return
+
+    statementSampler = sampler.Sampler(os.path.basename(args.programs[0]), args.sample_interval / 1e3)
+    try:
+        with statementSampler:
+            yield statementSampler
+    finally:
+        with open(args.sample, "w") as f:
+            statementSampler.write(f)
+
+
+def getArgumentParser():
+    argumentParser = argparse.ArgumentParser(prog="python interp.py")
+    addArguments(argumentParser)
+    return argumentParser
+
+
+def addArguments(argumentParser):
+    argumentParser.add_argument("--compile-only", action="store_true",
+                                help="only parse the given programs or directories into the compiled program cache")
+    argumentParser.add_argument("--engine", choices=["tree", "closure", "vm", "python"], default="tree",
+                                help="execute the AST directly (tree), compile it to Python closures (closure), "
+                                     "to bytecode (vm) or transpile it to Python code (python) first")
+    argumentParser.add_argument("--lexer", choices=sorted(lexer.LEXERS), default="rply",
+                                help="lex with the rply lexer, the single-pass lexer (same tokens, faster) or the compact "
+                                     "lexer (same tokens, stored as arrays)")
+    argumentParser.add_argument("-O", dest="optimize", type=int, nargs="?", const=1, default=0, choices=[0, 1, 2],
+                                help="optimization level: 1 folds constants, 2 also prunes dead branches (default 0, -O is -O1)")
+    argumentParser.add_argument("--dump-ast", action="store_true",
+                                help="print the (optimized) AST instead of executing the program")
+    argumentParser.add_argument("--flush", choices=output.FLUSH_POLICIES,
+                                help="flush the program output after every line, when the buffer is full (block) "
+                                     "or at exit (default: line on a terminal, block otherwise)")
+    argumentParser.add_argument("--output", metavar="FILE",
+                                help="write the program output to FILE instead of stdout")
+    argumentParser.add_argument("--output-fd", metavar="FD", type=int,
+                                help="write the program output to the open file descriptor FD")
+    argumentParser.add_argument("--stream", action="store_true",
+                                help="execute every top-level statement as soon as it is read, for very large programs")
+    argumentParser.add_argument("--watch", action="store_true",
+                                help="execute the program again every time its file changes, parsing only the "
+                                     "changed statements again")
+    argumentParser.add_argument("--profile", action="store_true",
+                                help="report the calls and time per AST node type when the program terminates "
+                                     "(tree engine)")
+    argumentParser.add_argument("--sample", metavar="FILE",
+                                help="sample the executed statements and write them to FILE as collapsed stacks "
+                                     "for flame graph tools (tree engine)")
+    argumentParser.add_argument("--sample-interval", metavar="MS", type=float, default=sampler.INTERVAL * 1e3,
+                                help="milliseconds of CPU time between samples (default %(default)g)")
+    argumentParser.add_argument("--no-cache", action="store_true",
+                                help="do not read or write compiled program (.minjsc, .minjspy) files")
+    argumentParser.add_argument("--batch", action="store_true",
+                                help="run every program of the given files and directories on several processes, "
+                                     "report the programs that fail")
+    argumentParser.add_argument("-j", "--jobs", metavar="N", type=int, default=os.cpu_count() or 1,
+                                help="processes of --batch (default: number of CPUs)")
+    argumentParser.add_argument("--batch-output", metavar="DIR",
+                                help="write the output of every program of --batch to DIR/<program>.out "
+                                     "instead of stdout")
+    argumentParser.add_argument("--serve", action="store_true",
+                                help="keep the interpreter resident and run the programs sent by the mini-js client "
+                                     "over a Unix domain socket")
+    argumentParser.add_argument("--socket", metavar="PATH",
+                                help="socket of --serve (default: $MINIJS_SOCKET, or mini-js.sock in the directory "
+                                     "mini-js-<uid> of $XDG_RUNTIME_DIR or /tmp)")
+    argumentParser.add_argument("--workers", metavar="N", type=int, default=server.WORKERS,
+                                help="programs --serve runs at the same time (default %(default)d)")
+    argumentParser.add_argument("programs", nargs="*", metavar="program",
+                                help="program to execute")
+
+
+# the options that cannot be combined, None when there are none
+def checkArguments(args):
+    if args.profile and args.engine != "tree":
+        return "--profile requires --engine=tree"
+    if args.batch and (args.profile or args.sample is not None):
+        return "--profile and --sample cannot be combined with --batch"
+    if args.watch and (args.batch or args.stream or args.compile_only or args.dump_ast or args.serve or
+                       args.profile or args.sample is not None):
+        return "--watch cannot be combined with --batch, --stream, --compile-only, --dump-ast, --serve, " \
+               "--profile or --sample"
+    if args.sample is not None:
+        if args.engine != "tree":
+            return "--sample requires --engine=tree"
+        if not sampler.isSupported():
+            return "--sample is not supported on this platform"
+    return None
+
+
+# the program of args prepared for its engine, returns a function executing
+# it with the given output
+def prepareProgram(args):
+    return program.prepareFile(args.programs[0], args.engine, args.optimize, not args.no_cache)
+
+
+# execute the program (or compile the programs) of args and return the exit
+# status; the banners and the program output go to stdout, the profile to
+# stderr. prepare turns args into a function executing the program
+def run(args, stdout=None, stderr=None, prepare=prepareProgram):
+    if stdout is None:
+        stdout = sys.stdout
+    if stderr is None:
+        stderr = sys.stderr
+
+    if args.compile_only:
+        return compileOnly(args.programs, stdout)
+
+    if args.batch:
+        return batch.run(getProgramFiles(args.programs), args.jobs, args.engine, args.optimize, not args.no_cache,
+                         args.lexer, args.batch_output, stdout, stderr)
+
+    if len(args.programs) != 1:
+        print("usage: python interp.py <program to execute>", file=stdout)
+        return 0
+
+    if args.watch:
+        # until interrupted, every run writes its output like a normal run
+        return watch.run(args.programs[0], args.engine, args.optimize, lambda: getOutput(args, stdout),
+                         stdout, stderr)
+
+    if args.stream:
+        # statements are executed while the program is read
+        print("\n>>> Executing >>>", file=stdout, flush=True)
+        with getProfiler(args, stderr), getSampler(args), getOutput(args, stdout) as programOutput:
+            stream.run(args.programs[0], args.engine, args.optimize, programOutput)
+        print("<<< Terminated <<<\n", file=stdout)
+        return 0
+
+    if args.dump_ast:
+        parsedAST = program.parseFile(args.programs[0], not args.no_cache)
+        print(optimizer.optimize(parsedAST, args.optimize).dump(), file=stdout)
+        return 0
+
+    execute = prepare(args)
+    print("\n>>> Executing >>>", file=stdout, flush=True)
+
+    # the output of the program is flushed before the banner below or the
+    # traceback of an error
+    with getProfiler(args, stderr), getSampler(args), getOutput(args, stdout) as programOutput:
+        execute(programOutput)
+    print("<<< Terminated <<<\n", file=stdout)
+    return 0
+
+
+# run the command line sent by a client of the daemon (--serve), paths are
+# relative to the working directory of the client
+def runRequest(request, stdout, stderr, prepare):
+    argumentParser = server.RequestArgumentParser(stdout, stderr, prog="mini-js")
+    addArguments(argumentParser)
+    # the lexer of the daemon is used when the request does not select one
+    argumentParser.set_defaults(lexer=None)
+    try:
+        args = argumentParser.parse_args(request["argv"])
+        message = checkArguments(args)
+        if message is None:
+            message = checkRequestArguments(args)
+        if message is not None:
+            argumentParser.error(message)
+    except server.RequestExit as e:
+        return e.status
+
+    cwd = request["cwd"]
+    args.programs = [os.path.join(cwd, filename) for filename in args.programs]
+    if args.output is not None:
+        args.output = os.path.join(cwd, args.output)
+    if args.flush is None and request.get("isatty"):
+        args.flush = "line"
+    return run(args, stdout, stderr, prepare)
+
+
+# the options the daemon cannot run, None when there are none
+def checkRequestArguments(args):
+    if args.serve:
+        return "a daemon is already running"
+    if args.profile or args.sample is not None:
+        return "--profile and --sample are not supported by the daemon, stop it or run interp.py"
+    if args.output_fd is not None:
+        return "--output-fd is not supported by the daemon"
+    if args.batch:
+        return "--batch is not supported by the daemon"
+    if args.watch:
+        return "--watch is not supported by the daemon"
+    if args.lexer is not None and args.lexer != program.lexerName:
+        return "--lexer %s: the daemon lexes with the %s lexer, start it with --lexer %s or run interp.py" \
+               % (args.lexer, program.lexerName, args.lexer)
+    return None
 
 
 def main():
     # check command line argument and print usage message
-    if len(sys.argv) != 2:
-        print("usage: python interp.py <program to execute>")
-        exit()
-
-    # create lexer
-    lexer = Lexer()
-    tokenStream = lexer.lex(getRawProgramString(sys.argv[1]))
-
-    # create parser
-    parser = Parser()
-    parsedAST = parser.parse(tokenStream)
-
-    # interpret the block
-    print("\n>>> Executing >>>")
-    parsedAST.interpret(ast.Context().getEmptyContext())
-    print("<<< Terminated <<<\n")
+    argumentParser = getArgumentParser()
+    args = argumentParser.parse_args()
+    message = checkArguments(args)
+    if message is not None:
+        argumentParser.error(message)
+    program.setLexer(args.lexer)
+
+    if args.serve:
+        # the daemon lexes with the lexer selected here
+        programCache = server.ProgramCache(prepareProgram)
+        try:
+            server.serve(args.socket, args.workers,
+                         lambda request, stdout, stderr: runRequest(request, stdout, stderr, programCache.get))
+        except server.ServerError as e:
+            argumentParser.exit(1, "mini-js: " + str(e) + "\n")
+        return
+
+    sys.exit(run(args))
 
 
 if __name__ == "__main__":
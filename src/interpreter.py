@@ -2,32 +2,370 @@
 # 2019-10-06 21:38:06 Sun EDT
 # Program to define the interpreter
 
+# the bytecode interpreter executes the flat bytecode produced by compiler.py
+# on a value stack of obj.py values. Every instruction is an opcode followed
+# by one argument when the opcode is >= HAVE_ARGUMENT, the same layout as the
+# bytecode of CPython.
+import sys
+
+import ast
+import obj
+
+# opcodes without argument
+POP_TOP = 0
+BINARY_ADD = 1
+BINARY_SUBTRACT = 2
+BINARY_MULTIPLY = 3
+BINARY_DIVIDE = 4
+COMPARE_GREATER_EQUAL = 5
+COMPARE_LESS_EQUAL = 6
+COMPARE_GREATER = 7
+COMPARE_LESS = 8
+COMPARE_EQUAL = 9
+COMPARE_NOT_EQUAL = 10
+BOOLEAN_OR = 11
+BOOLEAN_AND = 12
+CHECK_CONDITION = 13
+PRINT = 14
+PRINTLN = 15
+PUSH_SCOPE = 16
+POP_SCOPE = 17
+CHECK_IF_CONDITION = 18
+CHECK_IS_FALSE = 19
+CHECK_VALUE = 20
+LOAD_NONE = 21
+ROT_TWO = 22
+CALL_METHOD = 23
+
+# opcodes with argument
+HAVE_ARGUMENT = 32
+LOAD_CONST = 32
+LOAD_NAME = 33
+STORE_NAME = 34
+JUMP_ABSOLUTE = 35
+POP_JUMP_IF_FALSE = 36
+LOAD_METHOD = 37
+APPLY_METHOD = 38
+RAISE_ERROR = 39
+
+OPCODE_TO_NAME = dict((value, name) for name, value in list(globals().items())
+                      if name.isupper() and name != "HAVE_ARGUMENT" and type(value) is int)
+
+# operator opcode -> operator, the argument of LOAD_METHOD and APPLY_METHOD
+OPERATORS = {
+    BINARY_ADD: "+",
+    BINARY_SUBTRACT: "-",
+    BINARY_MULTIPLY: "*",
+    BINARY_DIVIDE: "/",
+    COMPARE_GREATER_EQUAL: ">=",
+    COMPARE_LESS_EQUAL: "<=",
+    COMPARE_GREATER: ">",
+    COMPARE_LESS: "<",
+    COMPARE_EQUAL: "==",
+    COMPARE_NOT_EQUAL: "!=",
+}
+
+
+# code object of a compiled program
+class Bytecode(object):
+    def __init__(self, code, consts, names):
+        # flat list of opcodes and arguments
+        self.code = code
+        # constant pool, indexed by LOAD_CONST
+        self.consts = consts
+        # identifier names, indexed by LOAD_NAME and STORE_NAME
+        self.names = names
+
+    # human readable listing of the bytecode, for debug purposes
+    def disassemble(self):
+        lines = []
+        pc = 0
+        while pc < len(self.code):
+            opcode = self.code[pc]
+            line = "%4d %s" % (pc, OPCODE_TO_NAME[opcode])
+            if opcode >= HAVE_ARGUMENT:
+                arg = self.code[pc + 1]
+                if opcode == LOAD_CONST or opcode == RAISE_ERROR:
+                    line += " %d (%s)" % (arg, self.consts[arg].getString())
+                elif opcode == LOAD_NAME or opcode == STORE_NAME:
+                    line += " %d (%s)" % (arg, self.names[arg])
+                elif opcode == LOAD_METHOD or opcode == APPLY_METHOD:
+                    line += " %d (%s)" % (arg, OPERATORS[arg])
+                else:
+                    line += " %d" % arg
+                pc += 2
+            else:
+                pc += 1
+            lines.append(line)
+        return "\n".join(lines)
+
+
 # define world's simplest interpreter
 class Interpreter(object):
-    def __init__(self, bytecode):
-        self.bytecode = bytecode
+    def __init__(self, bytecode, globalScope=None, output=None):
+        self.bytecode = bytecode.code
+        self.consts = bytecode.consts
+        self.names = bytecode.names
+        self.stack = []
 
-        # program code, indicates where in the byte code are you
+        # scope chain, the last dictionary is the innermost scope
+        if globalScope is None:
+            globalScope = {}
+        self.scopes = [globalScope]
+
+        # stream print statements write to
+        if output is None:
+            output = sys.stdout
+        self.output = output
+
+        # opcode -> bound method, resolved once instead of on every instruction
+        self.dispatch = [None] * (max(OPCODE_TO_NAME) + 1)
+        for opcode, opname in OPCODE_TO_NAME.items():
+            self.dispatch[opcode] = getattr(self, opname)
+
+        # position of the next instruction executed by step()
         self.pc = 0
-        while pc < len(self.bytecode):
-            opcode = self.bytecode[pc]
-            opname = OPCODE_TO_NAME[opcode]
-            pc = getattr(self, opname) (pc)
+
+    def run(self):
+        # program code, indicates where in the byte code are you
+        pc = 0
+        bytecode = self.bytecode
+        dispatch = self.dispatch
+        end = len(bytecode)
+        while pc < end:
+            pc = dispatch[bytecode[pc]](pc)
+
+    # execute another compiled program in the scopes of this one, e.g. the
+    # next statement of a program compiled one statement at a time (watch.py)
+    def runBytecode(self, bytecode):
+        self.bytecode = bytecode.code
+        self.consts = bytecode.consts
+        self.names = bytecode.names
+        self.run()
+
+    # execute at most count instructions from where the previous call
+    # stopped, return the number of instructions executed (see scheduler.py)
+    def step(self, count):
+        pc = self.pc
+        bytecode = self.bytecode
+        dispatch = self.dispatch
+        end = len(bytecode)
+        executed = 0
+        while executed < count and pc < end:
+            pc = dispatch[bytecode[pc]](pc)
+            executed += 1
+        self.pc = pc
+        return executed
+
+    def isFinished(self):
+        return self.pc >= len(self.bytecode)
+
+    def POP_TOP(self, pc):
+        self.stack.pop()
+        return pc + 1
+
     def LOAD_CONST(self, pc):
-        arg = order(self.bytecode[pc + 1])
-        self.push(self.consts[arg])
+        arg = self.bytecode[pc + 1]
+        self.stack.append(self.consts[arg])
+        return pc + 2
+
+    # value of an if arm that is not evaluated (see compiler.compileArm)
+    def LOAD_NONE(self, pc):
+        self.stack.append(None)
+        return pc + 1
+
+    def ROT_TWO(self, pc):
+        stack = self.stack
+        stack[-1], stack[-2] = stack[-2], stack[-1]
+        return pc + 1
+
+    def LOAD_NAME(self, pc):
+        name = self.names[self.bytecode[pc + 1]]
+        for scope in reversed(self.scopes):
+            if name in scope:
+                self.stack.append(scope[name])
+                return pc + 2
+        raise ast.ContextError(
+            "Identifier \"" + name + "\" specified is not in the scope of the context!")
+
+    # assignment is an expression, the assigned value stays on the stack
+    def STORE_NAME(self, pc):
+        name = self.names[self.bytecode[pc + 1]]
+        value = self.stack[-1]
+
+        # an identifier declared in an outer scope is updated in that scope,
+        # otherwise the identifier is declared in the innermost scope
+        for scope in reversed(self.scopes):
+            if name in scope:
+                scope[name] = value
+                return pc + 2
+        self.scopes[-1][name] = value
         return pc + 2
+
     def BINARY_ADD(self, pc):
-        right = self.pop()
-        left = self.pop()
-        self.push(left.add(right))
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.add(right))
+        return pc + 1
+
+    def BINARY_SUBTRACT(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.minus(right))
+        return pc + 1
+
+    def BINARY_MULTIPLY(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.multiply(right))
+        return pc + 1
+
+    def BINARY_DIVIDE(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.divide(right))
+        return pc + 1
+
+    def COMPARE_GREATER_EQUAL(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.greater_than_or_equal_to(right))
+        return pc + 1
+
+    def COMPARE_LESS_EQUAL(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.less_than_or_equal_to(right))
+        return pc + 1
+
+    def COMPARE_GREATER(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.greater_than(right))
+        return pc + 1
+
+    def COMPARE_LESS(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.less_than(right))
+        return pc + 1
+
+    def COMPARE_EQUAL(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.equal_to(right))
+        return pc + 1
+
+    def COMPARE_NOT_EQUAL(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.not_equal_to(right))
+        return pc + 1
+
+    # both sides are literals or identifiers, which are evaluated first (see
+    # compiler.compileBinaryOperator)
+    def BOOLEAN_OR(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.boolean_or(right))
+        return pc + 1
+
+    def BOOLEAN_AND(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(left.boolean_and(right))
+        return pc + 1
+
+    # operator with a parenthesized operand: the operator method of the left
+    # value is looked up, then the right operand is evaluated and passed to
+    # it by CALL_METHOD (see obj.getMethod)
+    def LOAD_METHOD(self, pc):
+        self.stack.append(obj.getMethod(OPERATORS[self.bytecode[pc + 1]], self.stack.pop()))
+        return pc + 2
+
+    def CALL_METHOD(self, pc):
+        right = self.stack.pop()
+        method = self.stack.pop()
+        self.stack.append(method(right))
+        return pc + 1
+
+    # LOAD_METHOD and CALL_METHOD when the right operand is already evaluated
+    def APPLY_METHOD(self, pc):
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self.stack.append(obj.applyMethod(OPERATORS[self.bytecode[pc + 1]], left, right))
+        return pc + 2
+
+    # type check the condition on top of the stack without popping it, once
+    # before a loop (both loops report a while statement)
+    def CHECK_CONDITION(self, pc):
+        self.checkCondition("while")
+        return pc + 1
+
+    def CHECK_IF_CONDITION(self, pc):
+        self.checkCondition("if")
+        return pc + 1
+
+    def checkCondition(self, statement):
+        condition = self.stack[-1]
+        if condition is None:
+            obj.noAttribute(condition, "type")
+        if not condition.isBoolean():
+            raise ast.ConditionError("Conditional statement of " + statement + " statement must be type Boolean.")
+
+    # the condition of an else if arm is interpreted a second time when its
+    # arm is not taken, Boolean.isFalse type checks it
+    def CHECK_IS_FALSE(self, pc):
+        condition = self.stack.pop()
+        if condition is None or not condition.isBoolean():
+            obj.noAttribute(condition, "isFalse")
+        return pc + 1
+
+    # the value of an if expression is None when the taken arm is not
+    # evaluated, using it as a value fails
+    def CHECK_VALUE(self, pc):
+        if self.stack[-1] is None:
+            obj.noAttribute(None, "type")
+        return pc + 1
+
+    def RAISE_ERROR(self, pc):
+        error = self.consts[self.bytecode[pc + 1]]
+        values = self.stack[len(self.stack) - error.operandCount:] if error.operandCount else []
+        raise error.getException(values)
+
+    # the output decides when the text is flushed (see output.py)
+    def PRINT(self, pc):
+        value = self.stack.pop()
+        if value is None:
+            obj.noAttribute(value, "type")
+        self.output.write(value.getString())
+        return pc + 1
+
+    def PRINTLN(self, pc):
+        value = self.stack.pop()
+        if value is None:
+            obj.noAttribute(value, "type")
+        self.output.write(value.getString() + "\n")
+        return pc + 1
+
+    # entering if - else if - else, while and for
+    def PUSH_SCOPE(self, pc):
+        self.scopes.append({})
+        return pc + 1
+
+    def POP_SCOPE(self, pc):
+        self.scopes.pop()
         return pc + 1
 
-#stream = lexer.lex("1; 2;")
-#print(stream.next())
-#print(stream.next())
-#print(parser.parse(stream).compile())
-#stream2 = lexer.lex("2;")
+    def JUMP_ABSOLUTE(self, pc):
+        return self.bytecode[pc + 1]
 
-# compare two node object
-#print(parser.parse(stream2) == parser.parse(stream))
\ No newline at end of file
+    # Boolean.isTrue of the condition, conditions of if statements and loops
+    # are type checked before (CHECK_CONDITION, CHECK_IF_CONDITION)
+    def POP_JUMP_IF_FALSE(self, pc):
+        condition = self.stack.pop()
+        if condition is None or not condition.isBoolean():
+            obj.noAttribute(condition, "isTrue")
+        if condition.value:
+            return pc + 2
+        return self.bytecode[pc + 1]
@@ -2,64 +2,311 @@
 # 2019-10-06 21:38:06 Sun EDT
 # Program to define the lexer
 
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_right
+
 from rply import LexerGenerator
+from rply.errors import LexingError
+from rply.token import SourcePosition, Token
+
+
+# build the lexer generator holding every token rule of mini-js
+# the token rules are also part of the key of the parser table cache (see cache.py)
+def getLexerGenerator():
+    lg = LexerGenerator()
+    # ignore begin and ending white spaces
+    # lg.ignore(r"\s+") # original
+    # lg.ignore(r"[^\S\n\r\f]+") # this is the regex that just matches a space (emtpy string)
+    # lg.ignore(r"[^\S\n]+") # matches just a space
+
+    # support get rid of white space, single-line comments and multiline comments
+    # since some of the characters are defined in the lexer, I have to ignore them in order to achieve multi-line comments
+    lg.ignore(r"(\s+)|(\/\/.*\n)|(\/\*(.*)|(\s*)\*\/)")
+    # no longer needed. Newline character is not allowed in mini-js
+    lg.add("NEWLINE", r"\n")
+
+    # this is solely for debug purpose.
+    # white space will not be allowed in the actual interpretation of the program
+    lg.add("WHITESPACE", r"\s")
+
+    lg.add("BOOLEAN_OR", r"\|\|")
+    lg.add("BOOLEAN_AND", r"\&\&")
+
+    lg.add("GREATER_EQUAL", r"\>\=")
+    lg.add("LESS_EQUAL", r"\<\=")
+    lg.add("GREATER", r"\>")
+    lg.add("LESS", r"\<")
+    lg.add("EQUAL_EQUAL", r"\=\=")
+    lg.add("NOT_EQUAL", r"\!\=")
+
+    lg.add("WHILE", r"while")
+    lg.add("FOR", r"for")
+    lg.add("IF", r"if")
+    lg.add("ELSE", r"else")
+    lg.add("PRINTLN", r"println")
+    lg.add("PRINT", r"print")
+
+    lg.add("LPAREN", r"\(")
+    lg.add("RPAREN", r"\)")
+    lg.add("LBRACE", r"\{")
+    lg.add("RBRACE", r"\}")
+
+    lg.add("EQUAL", r"=")
+    lg.add("PLUS", r"\+")
+    lg.add("MINUS", r"-")
+    lg.add("MULTIPLY", r"\*")
+    lg.add("DIVIDE", r"/")
+
+    lg.add("SEMICOLON", r";")
+    lg.add("NUMBER", r"\d+")
+    # a string ends at the first closing quote (e.g. "a" + "b" is two strings)
+    lg.add("STRING", r"\"[^\"\n]*\"")
+    lg.add("BOOLEAN", r"true|false")
+
+    lg.add("IDENTIFIER", r"[a-zA-Z_][a-zA-Z0-9_]*")
+
+    return lg
 
 
 class Lexer:
     def __init__(self):
-        lg = LexerGenerator()
-        # ignore begin and ending white spaces
-        # lg.ignore(r"\s+") # original
-        # lg.ignore(r"[^\S\n\r\f]+") # this is the regex that just matches a space (emtpy string)
-        # lg.ignore(r"[^\S\n]+") # matches just a space
-
-        # support get rid of white space, single-line comments and multiline comments
-        # since some of the characters are defined in the lexer, I have to ignore them in order to achieve multi-line comments
-        lg.ignore(r"(\s+)|(\/\/.*\n)|(\/\*(.*)|(\s*)\*\/)")
-        # no longer needed. Newline character is not allowed in mini-js
-        lg.add("NEWLINE", r"\n")
-
-        # this is solely for debug purpose.
-        # white space will not be allowed in the actual interpretation of the program
-        lg.add("WHITESPACE", r"\s")
-
-        lg.add("BOOLEAN_OR", r"\|\|")
-        lg.add("BOOLEAN_AND", r"\&\&")
-
-        lg.add("GREATER_EQUAL", r"\>\=")
-        lg.add("LESS_EQUAL", r"\<\=")
-        lg.add("GREATER", r"\>")
-        lg.add("LESS", r"\<")
-        lg.add("EQUAL_EQUAL", r"\=\=")
-        lg.add("NOT_EQUAL", r"\!\=")
-
-        lg.add("WHILE", r"while")
-        lg.add("FOR", r"for")
-        lg.add("IF", r"if")
-        lg.add("ELSE", r"else")
-        lg.add("PRINTLN", r"println")
-        lg.add("PRINT", r"print")
-
-        lg.add("LPAREN", r"\(")
-        lg.add("RPAREN", r"\)")
-        lg.add("LBRACE", r"\{")
-        lg.add("RBRACE", r"\}")
-
-        lg.add("EQUAL", r"=")
-        lg.add("PLUS", r"\+")
-        lg.add("MINUS", r"-")
-        lg.add("MULTIPLY", r"\*")
-        lg.add("DIVIDE", r"/")
-
-        lg.add("SEMICOLON", r";")
-        lg.add("NUMBER", r"\d+")
-        lg.add("STRING", r"\".*\"")
-        lg.add("BOOLEAN", r"true|false")
-
-        lg.add("IDENTIFIER", r"[a-zA-Z_][a-zA-Z0-9_]*")
-
-        self.lexer = lg.build()
+        self.lexer = getLexerGenerator().build()
 
     # parse raw program string to token stream
     def lex(self, rawProgramString):
         return self.lexer.lex(rawProgramString)
+
+
+# name of the master pattern group matching the ignore rules
+IGNORE = "_IGNORE"
+
+
+# single-pass lexer producing the same tokens as Lexer
+# the rules of getLexerGenerator() are combined into one master pattern, in
+# the same order: the ignore rules first, then the token rules. Python regular
+# expressions take the first alternative that matches, exactly like the rply
+# lexer, so e.g. "format" is still lexed as FOR followed by IDENTIFIER "mat".
+# Every token costs a single match instead of trying each rule in turn.
+class SinglePassLexer:
+    def __init__(self):
+        lg = getLexerGenerator()
+        ignorePattern = "|".join("(?:%s)" % rule.re.pattern for rule in lg.ignore_rules)
+        groups = ["(?P<%s>%s)" % (IGNORE, ignorePattern)]
+        groups += ["(?P<%s>%s)" % (rule.name, rule.re.pattern) for rule in lg.rules]
+        self.pattern = re.compile("|".join(groups))
+
+    # parse raw program string to token stream
+    def lex(self, rawProgramString):
+        return self.tokenize(rawProgramString)
+
+    def tokenize(self, s):
+        match = self.pattern.match
+        end = len(s)
+        position = 0
+
+        # line number and index of the first character of the current line
+        lineno = 1
+        lineStart = 0
+        colno = 1
+
+        while position < end:
+            m = match(s, position)
+            if m is None:
+                # same position as reported by the rply lexer
+                raise LexingError(None, SourcePosition(position, lineno, colno))
+
+            start = position
+            position = m.end()
+            name = m.lastgroup
+            if name == IGNORE:
+                newlines = s.count("\n", start, position)
+                if newlines:
+                    lineno += newlines
+                    lineStart = s.rfind("\n", start, position) + 1
+                continue
+
+            colno = start - lineStart + 1
+            yield Token(name, s[start:position], SourcePosition(start, lineno, colno))
+
+
+# token of a TokenStream, only the stream and the index of the token are
+# stored. The parser consumes these like rply tokens, the lexeme and the
+# source position are computed when they are asked for
+class CompactToken(object):
+    __slots__ = ("stream", "index", "position")
+
+    def __init__(self, stream, index):
+        self.stream = stream
+        self.index = index
+        # set to move the token (see stream.lexChunks)
+        self.position = None
+
+    @property
+    def name(self):
+        return self.stream.names[self.stream.kinds[self.index]]
+
+    @property
+    def value(self):
+        return self.stream.getLexeme(self.index)
+
+    @property
+    def source_pos(self):
+        if self.position is None:
+            return self.stream.getSourcePosition(self.index)
+        return self.position
+
+    @source_pos.setter
+    def source_pos(self, position):
+        self.position = position
+
+    def gettokentype(self):
+        return self.stream.names[self.stream.kinds[self.index]]
+
+    def getstr(self):
+        return self.stream.getLexeme(self.index)
+
+    def getsourcepos(self):
+        return self.source_pos
+
+    def __repr__(self):
+        return "Token(%r, %r)" % (self.name, self.value)
+
+
+# array type holding the offsets of a source of the given length
+def getOffsetType(length):
+    return "I" if length < 2 ** 32 else "Q"
+
+
+# tokens of a source as parallel arrays: the kind of every token (index in
+# names) and its start and end offsets in the source, plus the offset of
+# every line. A token takes 9 bytes (17 for sources of 4 GiB and more).
+#
+# The source is either a string or a bytes-like object (bytes, mmap), the
+# offsets and columns of a bytes-like source count bytes. The source is kept
+# and lexemes are only sliced from it when they are asked for.
+class TokenStream(object):
+    def __init__(self, source, names):
+        self.source = source
+        self.names = names
+        offsetType = getOffsetType(len(source))
+        self.kinds = array("B")
+        self.starts = array(offsetType)
+        self.ends = array(offsetType)
+        self.lineStarts = array(offsetType, [0])
+        # lexing error after the last token, raised when the parser gets there
+        self.error = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield CompactToken(self, index)
+        if self.error is not None:
+            raise self.error
+
+    def getKind(self, index):
+        return self.names[self.kinds[index]]
+
+    # the text of a token, a str slice of the source (or a memoryview of a
+    # bytes-like source) without copying it
+    def getView(self, index):
+        if isinstance(self.source, str):
+            return self.source[self.starts[index]:self.ends[index]]
+        return memoryview(self.source)[self.starts[index]:self.ends[index]]
+
+    # the text of a token as a new string
+    def getLexeme(self, index):
+        lexeme = self.source[self.starts[index]:self.ends[index]]
+        if isinstance(lexeme, str):
+            return lexeme
+        return lexeme.decode("utf-8")
+
+    # position of a character of the source, with its line number and column
+    def getPosition(self, offset):
+        line = bisect_right(self.lineStarts, offset)
+        return SourcePosition(offset, line, offset - self.lineStarts[line - 1] + 1)
+
+    def getSourcePosition(self, index):
+        return self.getPosition(self.starts[index])
+
+
+# lexer producing a TokenStream instead of a token object per token, with the
+# tokens and source positions of SinglePassLexer. The source is lexed in one
+# go, a lexing error is raised when the parser reaches it (as with the other
+# lexers).
+class CompactLexer(SinglePassLexer):
+    def __init__(self):
+        SinglePassLexer.__init__(self)
+        self.bytesPattern = re.compile(self.pattern.pattern.encode())
+        self.names = tuple(rule.name for rule in getLexerGenerator().rules)
+
+        # kind of every group of the master pattern by group number, None
+        # for the ignore group and the groups inside the rules
+        self.groupKinds = [None] * (self.pattern.groups + 1)
+        for kind, name in enumerate(self.names):
+            self.groupKinds[self.pattern.groupindex[name]] = kind
+
+    # lex a string or a bytes-like object (e.g. the mmap of mapFile())
+    def lex(self, source):
+        if isinstance(source, str):
+            return self.tokenize(source, self.pattern.match, "\n")
+        return self.tokenize(source, self.bytesPattern.match, b"\n")
+
+    def lexFile(self, filename):
+        return self.lex(mapFile(filename))
+
+    def tokenize(self, s, match, newline):
+        stream = TokenStream(s, self.names)
+        groupKinds = self.groupKinds
+        appendKind = stream.kinds.append
+        appendStart = stream.starts.append
+        appendEnd = stream.ends.append
+        lineStarts = stream.lineStarts
+        end = len(s)
+        position = 0
+
+        while position < end:
+            m = match(s, position)
+            if m is None:
+                # same position as reported by the rply lexer: the line of
+                # the error and the column of the last token
+                lineno = len(lineStarts)
+                colno = stream.getSourcePosition(len(stream) - 1).colno if len(stream) else 1
+                stream.error = LexingError(None, SourcePosition(position, lineno, colno))
+                break
+
+            start = position
+            position = m.end()
+            kind = groupKinds[m.lastindex]
+            if kind is None:
+                newlineAt = s.find(newline, start, position)
+                while newlineAt >= 0:
+                    lineStarts.append(newlineAt + 1)
+                    newlineAt = s.find(newline, newlineAt + 1, position)
+                continue
+
+            appendKind(kind)
+            appendStart(start)
+            appendEnd(position)
+        return stream
+
+
+# read-only memory map of a file for CompactLexer.lex, the file is not read
+# into memory (an empty file cannot be mapped)
+def mapFile(filename):
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# lexer implementations selectable at runtime (interp.py --lexer)
+LEXERS = {
+    "rply": Lexer,
+    "single-pass": SinglePassLexer,
+    "compact": CompactLexer,
+}
@@ -0,0 +1,160 @@
+# Program to define the counted loop fast path of for statements
+#
+# Most for statements count an identifier up or down to a bound:
+#
+#   for (i = 0; i < n; i = (i + 1);) { ... }
+#
+# The resolver (resolver.py) annotates every ForStatement with countedLoop, a
+# CountedLoop when the statement has this form and None otherwise. After the
+# pre statement, the tree and closure engines run a counted loop as a Python
+# while loop on floats instead of interpreting the condition and the post
+# statement as trees on every iteration. The counter is still stored in its
+# slot before each execution of the body, so the body and the statements
+# after the loop see the same values as before.
+#
+# A for statement is a counted loop when
+#   - the condition compares the counter (<, <=, >, >=) with a number or an
+#     identifier,
+#   - the post statement assigns counter + number or counter - number to the
+#     counter, and
+#   - the body never assigns to the counter or to the bound identifier.
+# At runtime the fast path is only taken when the counter and the bound are
+# numbers, every other case (e.g. type errors) runs the general loop.
+
+import operator
+
+import ast
+
+COMPARISONS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+UPDATES = {
+    "+": operator.add,
+    "-": operator.sub,
+}
+
+
+# the node inside Expr and ParentheseValue wrappers
+def unwrap(node):
+    while node.type() in (ast.Expr, ast.ParentheseValue):
+        node = node.getValue() if node.type() == ast.Expr else node.value
+    return node
+
+
+# the identifier of an operand written as a plain identifier, else None
+def getIdentifier(operand):
+    if operand.type() == ast.Expr and operand.getValue().type() == ast.Identifier:
+        return operand.getValue()
+    return None
+
+
+# the number of an operand written as a plain number, else None
+def getNumber(operand):
+    if operand.type() == ast.Expr and operand.getValue().type() == ast.Number:
+        return operand.getValue()
+    return None
+
+
+# names assigned anywhere in node
+def getAssignedNames(node, names=None):
+    if names is None:
+        names = set()
+    if node.type() == ast.AssignmentExpression:
+        identifier = unwrap(node.identifier)
+        if identifier.type() == ast.Identifier:
+            names.add(identifier.getValue())
+    for value in node.getFields().values():
+        if isinstance(value, ast.Node):
+            getAssignedNames(value, names)
+        elif isinstance(value, list):
+            for element in value:
+                getAssignedNames(element, names)
+    return names
+
+
+class CountedLoop(object):
+    # counter is the assignment target of the post statement, bound a Number
+    # or an Identifier, step the number added to or subtracted from the
+    # counter (updateOp)
+    def __init__(self, counter, op, bound, updateOp, step):
+        self.counter = counter
+        self.compare = COMPARISONS[op]
+        self.bound = bound
+        self.update = UPDATES[updateOp]
+        self.step = step
+
+    # run the loop after the pre statement, executeBody(ctx) executes the
+    # body. Returns False without running anything when the counter or the
+    # bound is not a number, the general loop is run instead
+    def run(self, ctx, executeBody):
+        # the context and the slot holding the counter (see Context.add)
+        for depth, slot in self.counter.addresses:
+            counterCtx = ctx
+            while depth:
+                counterCtx = counterCtx.outerContext
+                depth -= 1
+            if counterCtx.slots[slot] is not None:
+                break
+        else:
+            return False
+
+        counter = counterCtx.slots[slot]
+        bound = self.bound
+        if bound.type() == ast.Identifier:
+            bound = ctx.lookup(bound)
+        if counter.type() != ast.Number or bound.type() != ast.Number:
+            return False
+
+        compare = self.compare
+        update = self.update
+        limit = bound.getValue()
+        step = self.step
+        slots = counterCtx.slots
+        getNumber = ast.getNumber
+        value = counter.getValue()
+        while compare(value, limit):
+            executeBody(ctx)
+            value = update(value, step)
+            slots[slot] = getNumber(value)
+        return True
+
+
+# the CountedLoop of a resolved ForStatement, None when it is not one
+def getCountedLoop(node):
+    condition = unwrap(node.condition)
+    if condition.type() != ast.BinaryOperator or condition.op not in COMPARISONS:
+        return None
+    counter = getIdentifier(condition.left)
+    bound = getIdentifier(condition.right) or getNumber(condition.right)
+    if counter is None or bound is None:
+        return None
+
+    # counter = (counter + step)
+    if node.postStatement.type() != ast.Statement or node.postStatement.expr.type() != ast.AssignmentExpression:
+        return None
+    assignment = node.postStatement.expr
+    target = unwrap(assignment.identifier)
+    update = unwrap(assignment.expr)
+    if target.type() != ast.Identifier or update.type() != ast.BinaryOperator or update.op not in UPDATES:
+        return None
+    operand = getIdentifier(update.left)
+    step = getNumber(update.right)
+    if operand is None or step is None:
+        return None
+
+    name = counter.getValue()
+    if target.getValue() != name or operand.getValue() != name:
+        return None
+
+    # the counter and the bound must not change in the body
+    assigned = getAssignedNames(node.body)
+    if name in assigned or (bound.type() == ast.Identifier and bound.getValue() in assigned):
+        return None
+    if bound.type() == ast.Identifier and bound.getValue() == name:
+        return None
+
+    return CountedLoop(target, condition.op, bound, update.op, step.getValue())
@@ -2,13 +2,352 @@
 # 2019-10-06 21:38:06 Sun EDT
 # Program to define the object model
 
+# runtime values of the bytecode interpreter (see interpreter.py)
+# operations mirror the primitives of ast.py, an operation that is not
+# defined for a pair of values raises the same errors as the AST interpreter
+import ast
+import rope
+
+
 # object model
+# the values only hold their value in a slot, true, false and null are
+# shared and numbers with a small integral value are cached (see below)
 class JSObject(object):
+    __slots__ = ()
+
+    # the AST class of the value, used in error messages
+    nodeType = None
+
+    def getTypeName(self):
+        return str(self.nodeType)
+
+    def unsupported(self, op, other):
+        # (Number, Boolean), (Boolean, String), ... and operators on strings or null
+        if type(self) is not type(other) or type(self) not in (JSNumber, JSBoolean):
+            raise ast.TypeError("Left Expression Type " + self.getTypeName() +
+                                " Does Not Match the Right Expression Type " + other.getTypeName())
+
+        raise ast.NotImplementedError("Operator \"" + op + "\" is not implemented for Expression Type " +
+                                      self.getTypeName() + " and Expression Type " + other.getTypeName())
+
     def add(self, other):
-      # make sure the other side is a number
-      assert isinstance(other, JSNumber)
-      return JSNumber(self.value + other.value)
+        self.unsupported("+", other)
+
+    def minus(self, other):
+        self.unsupported("-", other)
+
+    def multiply(self, other):
+        self.unsupported("*", other)
+
+    def divide(self, other):
+        self.unsupported("/", other)
+
+    def greater_than_or_equal_to(self, other):
+        self.unsupported(">=", other)
+
+    def less_than_or_equal_to(self, other):
+        self.unsupported("<=", other)
 
+    def greater_than(self, other):
+        self.unsupported(">", other)
+
+    def less_than(self, other):
+        self.unsupported("<", other)
+
+    def equal_to(self, other):
+        self.unsupported("==", other)
+
+    def not_equal_to(self, other):
+        self.unsupported("!=", other)
+
+    def boolean_or(self, other):
+        self.unsupported("||", other)
+
+    def boolean_and(self, other):
+        self.unsupported("&&", other)
+
+    def isBoolean(self):
+        return False
+
+
+# all numbers are floats
 class JSNumber(JSObject):
+    __slots__ = ("value",)
+    nodeType = ast.Number
+
     def __init__(self, value):
-        self.value = value
\ No newline at end of file
+        self.value = value
+
+    def add(self, other):
+        # make sure the other side is a number, a string is concatenated
+        if type(other) is not JSNumber:
+            if type(other) is JSString:
+                return concatenate(self, other)
+            self.unsupported("+", other)
+        return getNumber(self.value + other.value)
+
+    def minus(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported("-", other)
+        return getNumber(self.value - other.value)
+
+    def multiply(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported("*", other)
+        return getNumber(self.value * other.value)
+
+    def divide(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported("/", other)
+        return getNumber(self.value / other.value)
+
+    def greater_than_or_equal_to(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported(">=", other)
+        return getBoolean(self.value >= other.value)
+
+    def less_than_or_equal_to(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported("<=", other)
+        return getBoolean(self.value <= other.value)
+
+    def greater_than(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported(">", other)
+        return getBoolean(self.value > other.value)
+
+    def less_than(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported("<", other)
+        return getBoolean(self.value < other.value)
+
+    def equal_to(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported("==", other)
+        return getBoolean(self.value == other.value)
+
+    def not_equal_to(self, other):
+        if type(other) is not JSNumber:
+            self.unsupported("!=", other)
+        return getBoolean(self.value != other.value)
+
+    def getString(self):
+        return str(self.value)
+
+
+class JSBoolean(JSObject):
+    __slots__ = ("value",)
+    nodeType = ast.Boolean
+
+    def __init__(self, value):
+        self.value = value
+
+    def equal_to(self, other):
+        if type(other) is not JSBoolean:
+            self.unsupported("==", other)
+        return getBoolean(self.value == other.value)
+
+    def not_equal_to(self, other):
+        if type(other) is not JSBoolean:
+            self.unsupported("!=", other)
+        return getBoolean(self.value != other.value)
+
+    # the operands of || and && are literals or identifiers, both are always
+    # evaluated (see compiler.compileBinaryOperator)
+    def boolean_or(self, other):
+        if type(other) is not JSBoolean:
+            self.unsupported("||", other)
+        return getBoolean(self.value or other.value)
+
+    def boolean_and(self, other):
+        if type(other) is not JSBoolean:
+            self.unsupported("&&", other)
+        return getBoolean(self.value and other.value)
+
+    def isBoolean(self):
+        return True
+
+    def getString(self):
+        if self.value:
+            return "true"
+        return "false"
+
+
+# the value of a string is stored without the surrounding quotes, the value
+# of a concatenation is a rope.Rope until its text is needed
+class JSString(JSObject):
+    __slots__ = ("value",)
+    nodeType = ast.String
+
+    def __init__(self, value):
+        self.value = value
+
+    def add(self, other):
+        if type(other) is not JSString and type(other) is not JSNumber:
+            self.unsupported("+", other)
+        return concatenate(self, other)
+
+    def getString(self):
+        if type(self.value) is not str:
+            self.value = rope.flatten(self.value)
+        return self.value
+
+
+# value of if expressions whose body consists of statements
+class JSNull(JSObject):
+    __slots__ = ()
+    nodeType = ast.Null
+
+    def getString(self):
+        return "null"
+
+
+# value of a parenthesized identifier operand, BinaryOperator.interpret does
+# not look it up (e.g. "(a) + 1", see getMethod)
+class JSName(JSObject):
+    __slots__ = ("value",)
+    nodeType = ast.Identifier
+
+    def __init__(self, value):
+        self.value = value
+
+    def getString(self):
+        return self.value
+
+
+# error raised by the RAISE_ERROR instruction (see compiler.py). The message
+# is formatted with the AST classes of the operandCount values popped from
+# the stack
+class Error(object):
+    def __init__(self, exceptionClass, message, operandCount=0):
+        self.exceptionClass = exceptionClass
+        self.message = message
+        self.operandCount = operandCount
+
+    def getException(self, values):
+        if not self.operandCount:
+            return self.exceptionClass(self.message)
+        return self.exceptionClass(self.message % tuple(str(getNodeType(value)) for value in values))
+
+    def getString(self):
+        return self.exceptionClass.__name__ + ": " + self.message
+
+
+NULL = JSNull()
+TRUE = JSBoolean(True)
+FALSE = JSBoolean(False)
+
+# 0 is not cached, it may be -0.0
+SMALL_NUMBERS = dict((float(i), JSNumber(float(i))) for i in range(-128, 1025) if i != 0)
+
+
+def getBoolean(value):
+    return TRUE if value else FALSE
+
+
+def getNumber(value):
+    number = SMALL_NUMBERS.get(value)
+    if number is None:
+        return JSNumber(value)
+    return number
+
+
+# JSString of the text of left followed by the text of right (see
+# ast.concatenate)
+def concatenate(left, right):
+    leftText = left.value if type(left) is JSString else left.getString()
+    rightText = right.value if type(right) is JSString else right.getString()
+    return JSString(rope.concatenate(leftText, rightText))
+
+
+# the AST class of a value
+def getNodeType(value):
+    if value is None:
+        return type(None)
+    return value.nodeType
+
+
+# the class name in AttributeError messages of the tree-walker
+def getValueTypeName(value):
+    if value is None:
+        return "NoneType"
+    return value.nodeType.__name__
+
+
+# raise the AttributeError of calling a missing method on a node
+def noAttribute(value, attribute):
+    raise AttributeError("'" + getValueTypeName(value) + "' object has no attribute '" + attribute + "'")
+
+
+# Node.getValue() of a value passed to an operator method
+def getOperandValue(value):
+    if value is None:
+        noAttribute(value, "getValue")
+    if type(value) is JSNull:
+        return None
+    if type(value) is JSString:
+        return value.getString()
+    return value.value
+
+
+# operator -> function of the Python values and the method of ast.Number
+# and ast.Boolean it stands for, used when an operand is parenthesized
+NUMBER_METHODS = {
+    "+": ("add", lambda left, right: getNumber(left + right)),
+    "-": ("minus", lambda left, right: getNumber(left - right)),
+    "*": ("multiply", lambda left, right: getNumber(left * right)),
+    "/": ("divide", lambda left, right: getNumber(left / right)),
+    ">=": ("greater_than_or_equal_to", lambda left, right: getBoolean(left >= right)),
+    "<=": ("less_than_or_equal_to", lambda left, right: getBoolean(left <= right)),
+    ">": ("greater_than", lambda left, right: getBoolean(left > right)),
+    "<": ("less_than", lambda left, right: getBoolean(left < right)),
+    "==": ("equal_to", lambda left, right: getBoolean(left == right)),
+    "!=": ("not_equal_to", lambda left, right: getBoolean(left != right)),
+}
+BOOLEAN_METHODS = {"==", "!="}
+
+
+# the operator method of the left value when an operand is parenthesized:
+# BinaryOperator.interpret calls left.add(right) etc. without checking the
+# types (see runtime.method). Returns a function of the right value, the
+# method is looked up before the right operand is evaluated
+def getMethod(op, left):
+    name, operator = NUMBER_METHODS[op]
+
+    if type(left) is JSNumber:
+        if op == "+":
+            # Number.add concatenates a string
+            def numberAdd(right):
+                if type(right) is JSString:
+                    return concatenate(left, right)
+                return getNumber(left.value + getOperandValue(right))
+            return numberAdd
+        return lambda right: operator(left.value, getOperandValue(right))
+
+    if type(left) is JSString and op == "+":
+        # String.add
+        def stringAdd(right):
+            if right is None:
+                noAttribute(right, "type")
+            if type(right) is not JSString and type(right) is not JSNumber:
+                raise ast.TypeError("Left Expression Type " + str(ast.String) +
+                                    " Does Not Match the Right Expression Type " + right.getTypeName())
+            return concatenate(left, right)
+        return stringAdd
+
+    if type(left) is JSBoolean and op in BOOLEAN_METHODS:
+        # Boolean.equal_to compares the value attributes
+        def booleanMethod(right):
+            if right is None or type(right) is JSName or type(right) is JSNull:
+                noAttribute(right, "value")
+            return operator(left.value, right.value)
+        return booleanMethod
+
+    noAttribute(left, name)
+
+
+# getMethod(op, left)(right) when both operands are evaluated already
+def applyMethod(op, left, right):
+    if type(left) is JSNumber and type(right) is JSNumber:
+        return NUMBER_METHODS[op][1](left.value, right.value)
+    return getMethod(op, left)(right)
@@ -0,0 +1,215 @@
+# Program to define the AST optimizer
+#
+# The optimizer runs after Parser.parse and returns a new AST, the parsed
+# AST is never modified. Optimization levels:
+#   0 - no optimization
+#   1 - fold constant BinaryOperator subtrees and collapse the Expr and
+#       ParentheseValue wrappers around them
+#   2 - additionally prune if - else if - else arms whose condition is known
+#       statically, and while statements whose condition is always false
+#
+# Constant subtrees are folded by interpreting them once, so folding follows
+# exactly the rules of BinaryOperator.interpret. A subtree that raises an
+# error is left untouched, the error is still raised when it runs.
+#
+# Wrappers are only collapsed where the value of an expression is used
+# directly (statements, print, right hand side of an assignment and
+# conditions). BinaryOperator type checks its operands by their wrapper
+# (e.g. ParentheseValue), and if - else arms check for Expr, so operands and
+# arm bodies keep an Expr around them.
+
+import ast
+
+
+# expression built only from values and operators
+def isConstant(node):
+    if node.type() == ast.Expr:
+        return isConstant(node.getValue())
+    if node.type() == ast.ParentheseValue:
+        return isConstant(node.value)
+    if node.type() == ast.BinaryOperator:
+        return isConstant(node.left) and isConstant(node.right)
+    return node.type() in (ast.Number, ast.String, ast.Boolean)
+
+
+# constant condition -> True/False, None when not known statically
+def getConstantCondition(node):
+    if node.type() == ast.Expr and node.getValue().type() == ast.Boolean:
+        return node.getValue().getValue()
+    return None
+
+
+class Optimizer(object):
+    def __init__(self, level=1):
+        self.level = level
+
+    def optimize(self, node):
+        if self.level <= 0:
+            return node
+        return self.visit(node)
+
+    def visit(self, node):
+        # dispatch on the AST class, e.g. visitBinaryOperator
+        method = getattr(self, "visit" + type(node).__name__, None)
+        if method is None:
+            # values and identifiers
+            return node
+
+        # the optimized node keeps the line of the node it replaces
+        optimized = method(node)
+        if optimized is not None and optimized.lineno is None:
+            optimized.lineno = node.lineno
+        return optimized
+
+    # evaluate a constant expression, None when it raises an error
+    def fold(self, node):
+        try:
+            value = node.interpret(ast.Context())
+        except Exception:
+            return None
+        if type(value) is ast.String:
+            # the text of a folded concatenation is joined once
+            value.getValue()
+        return ast.Expr(value)
+
+    # optimize an expression whose value is used directly
+    def visitValue(self, node):
+        node = self.visit(node)
+        while node.type() == ast.Expr and node.getValue().type() == ast.ParentheseValue:
+            node = node.getValue().value
+        return node
+
+    # optimize an operand or an arm body, the result is still an Expr when
+    # node is an Expr
+    def visitOperand(self, node):
+        node = self.visit(node)
+        if node.type() != ast.Expr:
+            return node
+
+        # ((x)) -> (x)
+        value = node.getValue()
+        while value.type() == ast.ParentheseValue and value.value.type() == ast.Expr and \
+                value.value.getValue().type() == ast.ParentheseValue:
+            value = value.value.getValue()
+
+        # (value) -> value is only safe outside of operands, see visitArmBody
+        return ast.Expr(value)
+
+    def visitArmBody(self, node):
+        if node.type() == ast.Block:
+            return self.visit(node)
+
+        if node.type() == ast.BinaryOperator:
+            # an operator body is not folded, the value of an arm is only
+            # taken from an Expr body
+            return ast.BinaryOperator(node.op, self.visitOperand(node.left), self.visitOperand(node.right))
+
+        node = self.visitOperand(node)
+        # (value) -> value, the arm body stays an Expr
+        while node.type() == ast.Expr and node.getValue().type() == ast.ParentheseValue and \
+                node.getValue().value.type() == ast.Expr:
+            node = node.getValue().value
+        return node
+
+    # statements
+
+    def visitBlock(self, node):
+        statements = []
+        for statement in node.getASTList():
+            statement = self.visit(statement)
+            if statement is not None:
+                statements.append(statement)
+        return ast.Block(statements)
+
+    def visitStatement(self, node):
+        return ast.Statement(self.visitValue(node.expr))
+
+    def visitPrintStatement(self, node):
+        return ast.PrintStatement(node.cmd, self.visitValue(node.expr))
+
+    def visitWhileStatement(self, node):
+        condition = self.visitValue(node.condition)
+
+        # while (false) { ... } never executes its body
+        if self.level >= 2 and getConstantCondition(condition) is False:
+            return None
+        return ast.WhileStatement(condition, self.visit(node.body))
+
+    def visitForStatement(self, node):
+        return ast.ForStatement(self.visit(node.preStatement), self.visitValue(node.condition),
+                                self.visit(node.postStatement), self.visit(node.body))
+
+    # expressions
+
+    def visitExpr(self, node):
+        return ast.Expr(self.visit(node.getValue()))
+
+    def visitParentheseValue(self, node):
+        return ast.ParentheseValue(self.visit(node.value))
+
+    # identifiers are annotated by the resolver, the optimized AST does not
+    # share them with the parsed AST
+    def visitIdentifier(self, node):
+        return ast.Identifier(node.getValue())
+
+    def visitBinaryOperator(self, node):
+        if isConstant(node):
+            folded = self.fold(node)
+            if folded is not None:
+                return folded
+            # the error is raised at runtime, keep the subtree as it is
+            return node
+        return ast.BinaryOperator(node.op, self.visitOperand(node.left), self.visitOperand(node.right))
+
+    def visitAssignmentExpression(self, node):
+        return ast.AssignmentExpression(self.visit(node.identifier), self.visitValue(node.expr))
+
+    def visitIfExpression(self, node):
+        return ast.IfExpression(self.visitValue(node.condition), self.visitArmBody(node.if_body))
+
+    def visitIfElseIfElseExpression(self, node):
+        # (condition, body) of every arm, the else arm has no condition
+        arms = [(self.visitValue(node.condition), self.visitArmBody(node.if_body))]
+        for elseIfBody in node.else_if_body_list.getASTList():
+            arms.append((self.visitValue(elseIfBody.condition), self.visitArmBody(elseIfBody.getValue())))
+        elseBody = self.visitArmBody(node.else_body.getValue())
+
+        if self.level >= 2:
+            arms, elseBody = self.pruneArms(arms, elseBody)
+
+        condition, ifBody = arms[0]
+        elseIfBodies = [ast.ElseIfBody(c, b) for c, b in arms[1:]]
+        return ast.IfElseIfElseExpression(condition, ifBody, ast.ElseIfBodyList(elseIfBodies), ast.ElseBody(elseBody))
+
+    # drop the arms that can never be taken; the arms are still evaluated in
+    # the scope of an if - else expression
+    def pruneArms(self, arms, elseBody):
+        prunedArms = []
+        for condition, body in arms:
+            constantCondition = getConstantCondition(condition)
+            if constantCondition is False:
+                continue
+            if constantCondition is True:
+                # the arms after this one are never taken
+                if not prunedArms:
+                    prunedArms.append((condition, body))
+                    elseBody = ast.Block([])
+                else:
+                    elseBody = body
+                break
+            prunedArms.append((condition, body))
+
+        if not prunedArms:
+            # only the else arm is left
+            prunedArms.append((ast.Expr(ast.Boolean(True)), elseBody))
+            elseBody = ast.Block([])
+        elif prunedArms[0][0] is not arms[0][0] and getConstantCondition(prunedArms[0][0]) is None:
+            # an else if condition is evaluated again when it is false and is
+            # not type checked like the if condition, it stays an else if arm
+            # behind an arm that is never taken
+            prunedArms.insert(0, (ast.Expr(ast.Boolean(False)), ast.Block([])))
+        return prunedArms, elseBody
+
+
+def optimize(node, level=1):
+    return Optimizer(level).optimize(node)
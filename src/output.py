@@ -0,0 +1,115 @@
+# Program to define the buffered output of print statements
+#
+# print and println write their text to an Output, which collects it in one
+# reusable buffer and writes it to the file descriptor (or stream) with a
+# single call when the flush policy says so:
+#
+#   line  - after every line (the default when writing to a terminal)
+#   block - when the buffer is full (the default otherwise)
+#   exit  - only when the Output is closed
+#
+# The interpreter closes the Output when the program terminates, also when it
+# ends with an error, so no output is ever lost.
+
+import io
+import os
+import sys
+
+FLUSH_POLICIES = ["line", "block", "exit"]
+
+# bytes collected before the buffer is written with the block policy
+BUFFER_SIZE = 64 * 1024
+
+
+class Output(object):
+    # target is a file descriptor, a file path or a text stream (sys.stdout
+    # when None); policy is one of FLUSH_POLICIES, None picks line for
+    # terminals and block otherwise
+    def __init__(self, target=None, policy=None, bufferSize=BUFFER_SIZE):
+        self.stream = None
+        self.fd = None
+        self.ownsFd = False
+
+        if target is None:
+            target = sys.stdout
+        if isinstance(target, int):
+            self.fd = target
+        elif isinstance(target, str):
+            self.fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            self.ownsFd = True
+        else:
+            # streams backed by a file descriptor are written to directly,
+            # anything buffered in the stream is written first
+            try:
+                self.fd = target.fileno()
+                target.flush()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                self.stream = target
+
+        if policy is None:
+            policy = "line" if self.isatty() else "block"
+        if policy not in FLUSH_POLICIES:
+            raise ValueError("unknown flush policy " + repr(policy))
+        self.policy = policy
+        self.bufferSize = bufferSize
+
+        # text is encoded into one bytearray that is reused after each flush
+        # (strings are collected in a list for streams)
+        self.buffer = bytearray()
+        self.pending = []
+        self.pendingSize = 0
+
+    def isatty(self):
+        if self.fd is not None:
+            return os.isatty(self.fd)
+        isatty = getattr(self.stream, "isatty", None)
+        return bool(isatty and isatty())
+
+    def write(self, text):
+        if self.fd is not None:
+            self.buffer += text.encode()
+            size = len(self.buffer)
+        else:
+            self.pending.append(text)
+            self.pendingSize += len(text)
+            size = self.pendingSize
+
+        if self.policy == "line":
+            if "\n" in text:
+                self.flush()
+        elif self.policy == "block":
+            if size >= self.bufferSize:
+                self.flush()
+
+    # write everything that is buffered
+    def flush(self):
+        if self.fd is not None:
+            view = memoryview(self.buffer)
+            written = 0
+            try:
+                while written < len(view):
+                    written += os.write(self.fd, view[written:])
+            finally:
+                view.release()
+                del self.buffer[:written]
+            return
+
+        if self.pending:
+            self.stream.write("".join(self.pending))
+            self.pending = []
+            self.pendingSize = 0
+        self.stream.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.ownsFd:
+                os.close(self.fd)
+                self.ownsFd = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
@@ -4,6 +4,18 @@
 
 from rply import ParserGenerator
 import ast
+import cache
+
+
+# line of a token in the program
+def getLine(token):
+    return token.getsourcepos().lineno
+
+
+# every node built by the parser records the line of its first token
+def atLine(node, lineno):
+    node.lineno = lineno
+    return node
 
 
 class Parser:
@@ -34,9 +46,12 @@ class Parser:
             return s[0]
 
         # multiple statement statements
+        # the statement is appended to the block built so far (only the
+        # parser holds it) instead of copying its list on every statement
         @pg.production("statements : statements statement")
         def statements(s):
-            return ast.Block(s[0].getASTList() + [s[1]])
+            s[0].getASTList().append(s[1])
+            return s[0]
 
         # single statement statements
         @pg.production("statements : statement")
@@ -46,39 +61,39 @@ class Parser:
         # single expression statement
         @pg.production("statement : expr SEMICOLON")
         def statement_expr(s):
-            return ast.Statement(s[0])
+            return atLine(ast.Statement(s[0]), s[0].lineno)
 
         # print/println statements
         @pg.production("statement : PRINT expr SEMICOLON")
         @pg.production("statement : PRINTLN expr SEMICOLON")
         def statement_print(s):
-            return ast.PrintStatement(s[0].getstr(), s[1])
+            return atLine(ast.PrintStatement(s[0].getstr(), s[1]), getLine(s[0]))
 
         # while statement
         # can end with semicolon or not
         @pg.production("statement : WHILE LPAREN expr RPAREN LBRACE statements RBRACE SEMICOLON")
         @pg.production("statement : WHILE LPAREN expr RPAREN LBRACE statements RBRACE")
         def statement_while(s):
-          return ast.WhileStatement(s[2], s[5])
+          return atLine(ast.WhileStatement(s[2], s[5]), getLine(s[0]))
 
         # for statement
         # can end with semicolon or not
         @pg.production("statement : FOR LPAREN statement expr SEMICOLON statement RPAREN LBRACE statements RBRACE SEMICOLON")
         @pg.production("statement : FOR LPAREN statement expr SEMICOLON statement RPAREN LBRACE statements RBRACE")
         def statement_for(s):
-          return ast.ForStatement(s[2], s[3], s[5], s[8])
+          return atLine(ast.ForStatement(s[2], s[3], s[5], s[8]), getLine(s[0]))
 
 
         # parenthese support for expressions
         # not working
         @pg.production("val : LPAREN expr RPAREN")
         def expr_parens(s):
-          return ast.ParentheseValue(s[1])
+          return atLine(ast.ParentheseValue(s[1]), getLine(s[0]))
 
         # assignment expression
         @pg.production("expr : expr EQUAL expr")
         def expr_assignment(s):
-            return ast.AssignmentExpression(s[0], s[2])
+            return atLine(ast.AssignmentExpression(s[0], s[2]), s[0].lineno)
 
         # binary operator expressions
         # algebratic operations -> return number
@@ -101,17 +116,18 @@ class Parser:
         @pg.production("expr : expr EQUAL_EQUAL expr")
         @pg.production("expr : expr NOT_EQUAL expr")
         def expr_binop(s):
-            return ast.BinaryOperator(s[1].getstr(), s[0], s[2])
+            return atLine(ast.BinaryOperator(s[1].getstr(), s[0], s[2]), s[0].lineno)
 
         # single value/identifier expression
         @pg.production("expr : val")
         def expr_val(s):
-            return ast.Expr(s[0])
+            return atLine(ast.Expr(s[0]), s[0].lineno)
 
         # single identifier expression
         @pg.production("expr : IDENTIFIER")
         def expr_id(s):
-            return ast.Expr(ast.Identifier(s[0].getstr()))
+            lineno = getLine(s[0])
+            return atLine(ast.Expr(atLine(ast.Identifier(s[0].getstr()), lineno)), lineno)
 
         # single if expression, body of if expression can be either statements or expression
         # if expression is evaluated to Null if the body are statements
@@ -120,25 +136,27 @@ class Parser:
         @pg.production("expr : IF LPAREN expr RPAREN LBRACE expr RBRACE ")
         @pg.production("expr : IF LPAREN expr RPAREN LBRACE statements RBRACE")
         def expr_if(s):
-            return ast.IfExpression(s[2], s[5])
+            return atLine(ast.IfExpression(s[2], s[5]), getLine(s[0]))
 
         # if - else if - else expression. Else - if is optional
         @pg.production("expr : IF LPAREN expr RPAREN LBRACE expr RBRACE else-if-body-list else-body")
         @pg.production("expr : IF LPAREN expr RPAREN LBRACE statements RBRACE else-if-body-list else-body")
         def expr_if_elseif_else(s):
-            return ast.IfElseIfElseExpression(s[2], s[5], s[7], s[8])
+            return atLine(ast.IfElseIfElseExpression(s[2], s[5], s[7], s[8]), getLine(s[0]))
 
         # if - else expression. DO NOT INCLUDE else if body lists (put placeholder empty else if body list)
         @pg.production("expr : IF LPAREN expr RPAREN LBRACE expr RBRACE else-body")
         @pg.production("expr : IF LPAREN expr RPAREN LBRACE statements RBRACE else-body")
         def expr_if_else(s):
-            return ast.IfElseIfElseExpression(s[2], s[5], ast.ElseIfBodyList([]), s[7])
+            return atLine(ast.IfElseIfElseExpression(s[2], s[5], ast.ElseIfBodyList([]), s[7]), getLine(s[0]))
 
         # define the else if body in the case of multiple (one or more) else - if expressions
         @pg.production("else-if-body-list : else-if-body-list else-if-body")
         @pg.production("else-if-body-list : else-if-body-list else-if-body")
         def expr_else_if_body_list(s):
-            return ast.ElseIfBodyList(s[0].getASTList() + [s[1]])
+            # appended in place, as statements
+            s[0].getASTList().append(s[1])
+            return s[0]
 
         # define a single else-if-body as a else-if-body-list
         @pg.production("else-if-body-list : else-if-body")
@@ -148,32 +166,34 @@ class Parser:
         @pg.production("else-if-body : ELSE IF LPAREN expr RPAREN LBRACE expr RBRACE")
         @pg.production("else-if-body : ELSE IF LPAREN expr RPAREN LBRACE statements RBRACE")
         def expr_else_if_body(s):
-            return ast.ElseIfBody(s[3], s[6])
+            return atLine(ast.ElseIfBody(s[3], s[6]), getLine(s[0]))
 
         # define the else body
         @pg.production("else-body : ELSE LBRACE expr RBRACE")
         @pg.production("else-body : ELSE LBRACE statements RBRACE")
         def expr_else_body(s):
-            return ast.ElseBody(s[2])
+            return atLine(ast.ElseBody(s[2]), getLine(s[0]))
 
         # number value
         @pg.production("val : NUMBER")
         def val_number(s):
-            return ast.Number(float(s[0].getstr()))
+            return atLine(ast.Number(float(s[0].getstr())), getLine(s[0]))
 
-        # string value
+        # string value, the quotes are removed once here
         @pg.production("val : STRING")
         def val_string(s):
-            return ast.String(s[0].getstr())
+            return atLine(ast.String(s[0].getstr()[1:-1]), getLine(s[0]))
 
         # boolean value
         @pg.production("val : BOOLEAN")
         def val_boolean(s):
-            return ast.Boolean(s[0].getstr())
+            return atLine(ast.Boolean(s[0].getstr() == "true"), getLine(s[0]))
 
-        # build the parser
-        self.parser = pg.build()
+        # build the parser, the LALR table is loaded from the on-disk cache
+        # when the grammar and the token rules have not changed
+        self.parser = cache.buildParser(pg)
 
-    # return the parsedAST
+    # return the parsedAST, tokenStream is an iterator of tokens or the
+    # TokenStream of lexer.CompactLexer
     def parse(self, tokenStream):
-        return self.parser.parse(tokenStream)
+        return self.parser.parse(iter(tokenStream))
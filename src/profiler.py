@@ -0,0 +1,126 @@
+# Program to define the per node type profiler of the tree-walker
+#
+# interp.py --profile replaces the interpret method of every AST class with a
+# timing wrapper while the program runs and restores the original methods
+# afterwards. Without --profile nothing is replaced, so the interpreter runs
+# exactly as fast as before.
+#
+# Every call is recorded under the class name of the node, binary operators
+# also under their operator (e.g. "BinaryOperator +"):
+#
+#   calls       - number of calls
+#   cumulative  - time spent in the calls, including the nodes they interpret
+#                 (recursive calls of the same entry are counted once)
+#   self        - cumulative time minus the time of the nodes they interpret
+
+import sys
+import time
+
+import ast
+
+# entries shown by report()
+REPORT_LIMIT = 20
+
+
+# every AST class defining its own interpret method
+def getNodeClasses():
+    classes = []
+    pending = [ast.Node]
+    while pending:
+        nodeClass = pending.pop()
+        pending.extend(nodeClass.__subclasses__())
+        if "interpret" in vars(nodeClass):
+            classes.append(nodeClass)
+    return classes
+
+
+# name a call is recorded under
+def getEntryName(node):
+    name = type(node).__name__
+    op = getattr(node, "op", None)
+    if op is not None:
+        return name + " " + op
+    return name
+
+
+class Entry(object):
+    def __init__(self):
+        self.calls = 0
+        self.cumulative = 0.0
+        self.self = 0.0
+
+        # calls of this entry that have not returned yet
+        self.active = 0
+
+
+class Profiler(object):
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.entries = {}
+        self.originals = {}
+
+        # time spent in the nodes interpreted by each running call
+        self.childTimes = []
+
+    def install(self):
+        for nodeClass in getNodeClasses():
+            if nodeClass not in self.originals:
+                self.originals[nodeClass] = vars(nodeClass)["interpret"]
+                nodeClass.interpret = self.wrap(vars(nodeClass)["interpret"])
+
+    def uninstall(self):
+        for nodeClass, interpret in self.originals.items():
+            nodeClass.interpret = interpret
+        self.originals = {}
+
+    def wrap(self, interpret):
+        clock = self.clock
+        entries = self.entries
+        childTimes = self.childTimes
+
+        def profiledInterpret(node, *args):
+            name = getEntryName(node)
+            entry = entries.get(name)
+            if entry is None:
+                entry = entries[name] = Entry()
+
+            entry.calls += 1
+            entry.active += 1
+            childTimes.append(0.0)
+            start = clock()
+            try:
+                return interpret(node, *args)
+            finally:
+                elapsed = clock() - start
+                entry.active -= 1
+                entry.self += elapsed - childTimes.pop()
+                if entry.active == 0:
+                    entry.cumulative += elapsed
+                if childTimes:
+                    childTimes[-1] += elapsed
+        return profiledInterpret
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.uninstall()
+
+    # the entries as (name, entry), the most self time first
+    def getEntries(self):
+        return sorted(self.entries.items(), key=lambda item: item[1].self, reverse=True)
+
+    def report(self, stream=None, limit=REPORT_LIMIT):
+        if stream is None:
+            stream = sys.stderr
+        entries = self.getEntries()
+        total = sum(entry.self for name, entry in entries)
+
+        stream.write("\n%-28s %10s %14s %14s %8s\n" % ("node", "calls", "cumulative ms", "self ms", "self %"))
+        for name, entry in entries[:limit]:
+            share = entry.self / total * 100 if total else 0.0
+            stream.write("%-28s %10d %14.3f %14.3f %7.1f%%\n" %
+                         (name, entry.calls, entry.cumulative * 1e3, entry.self * 1e3, share))
+        if len(entries) > limit:
+            stream.write("(%d more)\n" % (len(entries) - limit))
@@ -0,0 +1,260 @@
+# Program to define the embedding API: compile once, run many
+#
+# a Program holds a parsed (and for the "vm" engine compiled) program that is
+# never modified while it runs, so the same Program can be run any number of
+# times, also concurrently from several threads. Every run gets its own
+# global scope and output stream.
+#
+#   prog = program.Program.fromString("b = (a * 2); println b;")
+#   prog.run({"a": 21})                  # prints 42.0, returns {"a": 21.0, "b": 42.0}
+#   prog.run({"a": 1}, io.StringIO())    # output goes to the given stream
+
+import threading
+
+from parser import Parser
+import ast
+import cache
+import closure
+import compiler
+import interpreter
+import lexer as lexers
+import obj
+import optimizer
+import resolver
+import rope
+import runtime
+import transpiler
+
+# the lexer and the parser are built once per process and shared, both can
+# lex/parse several programs at the same time
+lexer = None
+lexerName = "rply"
+parser = None
+buildLock = threading.Lock()
+
+
+# select the lexer implementation by its name in lexer.LEXERS, both produce
+# the same tokens
+def setLexer(name):
+    global lexer, lexerName
+    if name not in lexers.LEXERS:
+        raise ValueError("unknown lexer " + repr(name))
+    with buildLock:
+        if name != lexerName:
+            lexer = None
+            lexerName = name
+
+
+def getLexer():
+    global lexer
+    if lexer is None:
+        with buildLock:
+            if lexer is None:
+                lexer = lexers.LEXERS[lexerName]()
+    return lexer
+
+
+def getParser():
+    global parser
+    if parser is None:
+        with buildLock:
+            if parser is None:
+                parser = Parser()
+    return parser
+
+
+def getRawProgramString(filename):
+    with open(filename, "r") as f:
+        return f.read()
+
+
+def parseString(rawProgramString):
+    return getParser().parse(getLexer().lex(rawProgramString))
+
+
+# lex and parse the program, or load its AST from the compiled program cache
+# the lexer and the parser are only built when the cache misses
+def parseFile(filename, useCache=True):
+    rawString = getRawProgramString(filename)
+    if useCache:
+        parsedAST = cache.loadCompiledProgram(filename, rawString)
+        if parsedAST is not None:
+            return parsedAST
+
+    parsedAST = parseString(rawString)
+
+    if useCache:
+        cache.storeCompiledProgram(filename, rawString, parsedAST)
+    return parsedAST
+
+
+# transpile the program to a Python code object (--engine=python), or load
+# it from the transpiled program cache
+def transpileFile(filename, level=0, useCache=True):
+    rawString = getRawProgramString(filename)
+    if useCache:
+        code = cache.loadTranspiledProgram(filename, rawString, level)
+        if code is not None:
+            return code
+
+    parsedAST = optimizer.optimize(parseFile(filename, useCache), level)
+    resolver.resolve(parsedAST)
+    code = transpiler.compileProgram(parsedAST, filename)
+
+    if useCache:
+        cache.storeTranspiledProgram(filename, rawString, level, code)
+    return code
+
+
+# prepare the program file for the engine like interp.py does (optimized,
+# resolved and compiled), returns a function executing it with an output
+def prepareFile(filename, engine="tree", level=0, useCache=True):
+    if engine == "python":
+        # the transpiled code is cached, the program is only parsed when the
+        # cache misses
+        code = transpileFile(filename, level, useCache)
+        return lambda output: transpiler.run(code, output)
+    return prepareProgram(parseFile(filename, useCache), engine, level)
+
+
+# prepare a parsed program for the engine (see prepareFile), the python
+# engine transpiles it without the cache
+def prepareProgram(parsedAST, engine="tree", level=0):
+    parsedAST = optimizer.optimize(parsedAST, level)
+    resolver.resolve(parsedAST)
+
+    if engine == "python":
+        code = transpiler.compileProgram(parsedAST)
+        return lambda output: transpiler.run(code, output)
+    if engine == "vm":
+        bytecode = compiler.Compiler().compileProgram(parsedAST)
+        return lambda output: interpreter.Interpreter(bytecode, None, output).run()
+    if engine == "closure":
+        compiledProgram = closure.compileProgram(parsedAST)
+        return lambda output: compiledProgram(ast.Context(parsedAST.slotCount, None, output))
+    return lambda output: parsedAST.interpret(ast.Context(parsedAST.slotCount, None, output))
+
+
+# conversion between Python values and the values of the AST interpreter
+def toNode(value):
+    if value is None:
+        return ast.NULL
+    if isinstance(value, bool):
+        return ast.getBoolean(value)
+    if isinstance(value, (int, float)):
+        return ast.getNumber(float(value))
+    if isinstance(value, str):
+        return ast.String(value)
+    raise ast.TypeError("Value of type " + type(value).__name__ + " cannot be converted to a mini-js value")
+
+
+def fromNode(node):
+    return node.getValue()
+
+
+# conversion between Python values and the values of the bytecode interpreter
+def toObject(value):
+    if value is None:
+        return obj.NULL
+    if isinstance(value, bool):
+        return obj.getBoolean(value)
+    if isinstance(value, (int, float)):
+        return obj.getNumber(float(value))
+    if isinstance(value, str):
+        return obj.JSString(value)
+    raise ast.TypeError("Value of type " + type(value).__name__ + " cannot be converted to a mini-js value")
+
+
+def fromObject(value):
+    if isinstance(value, obj.JSNull):
+        return None
+    if isinstance(value, obj.JSString):
+        return value.getString()
+    return value.value
+
+
+# conversion between Python values and the values of transpiled programs
+def toValue(value):
+    if value is None:
+        return runtime.NULL
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return value
+    raise ast.TypeError("Value of type " + type(value).__name__ + " cannot be converted to a mini-js value")
+
+
+def fromValue(value):
+    if value is runtime.NULL:
+        return None
+    if isinstance(value, rope.Rope):
+        return rope.flatten(value)
+    return value
+
+
+class Program(object):
+    def __init__(self, parsedAST, engine="tree"):
+        if engine not in ("tree", "closure", "vm", "python"):
+            raise ValueError("unknown engine " + repr(engine))
+        self.parsedAST = parsedAST
+        self.engine = engine
+
+        # the bytecode is compiled once and shared by every run
+        self.bytecode = None
+        self.compiledProgram = None
+        self.code = None
+        if engine == "vm":
+            self.bytecode = compiler.Compiler().compileProgram(parsedAST)
+        else:
+            # identifiers that are not defined by the program may be provided
+            # by the global variables of a run
+            resolver.resolve(parsedAST, strict=False)
+            if engine == "closure":
+                self.compiledProgram = closure.compileProgram(parsedAST)
+            elif engine == "python":
+                self.code = transpiler.compileProgram(parsedAST)
+
+    @staticmethod
+    def fromString(rawProgramString, engine="tree"):
+        return Program(parseString(rawProgramString), engine)
+
+    @staticmethod
+    def fromFile(filename, engine="tree", useCache=True):
+        return Program(parseFile(filename, useCache), engine)
+
+    # run the program with the given global variables (name -> Python value)
+    # and return the global variables after the run
+    # output is the stream print statements write to (sys.stdout by default)
+    def run(self, globals=None, output=None):
+        if globals is None:
+            globals = {}
+
+        if self.engine == "vm":
+            globalScope = dict((name, toObject(value)) for name, value in globals.items())
+            interpreter.Interpreter(self.bytecode, globalScope, output).run()
+            return dict((name, fromObject(value)) for name, value in globalScope.items())
+
+        if self.engine == "python":
+            values = dict((name, toValue(value)) for name, value in globals.items())
+            values.update(transpiler.run(self.code, output, values))
+            return dict((name, fromValue(value)) for name, value in values.items() if value is not None)
+
+        values = dict((name, toNode(value)) for name, value in globals.items())
+        globalNames = self.parsedAST.globalNames
+        ctx = ast.Context(self.parsedAST.slotCount, None, output)
+        slots = ctx.getSlots()
+        for name, value in values.items():
+            if name in globalNames:
+                slots[globalNames[name]] = value
+
+        if self.engine == "closure":
+            self.compiledProgram(ctx)
+        else:
+            self.parsedAST.interpret(ctx)
+
+        for name, slot in globalNames.items():
+            if slots[slot] is not None:
+                values[name] = slots[slot]
+        return dict((name, fromNode(value)) for name, value in values.items())
@@ -0,0 +1,283 @@
+# Program to define the static resolver
+#
+# The resolver runs between Parser.parse and execution. It gives every scope
+# (the program, if - else if - else, while and for) a fixed number of slots
+# and annotates every Identifier with the (depth, slot) addresses it may
+# refer to, so that a Context stores its variables in a list instead of a
+# dictionary keyed by identifier names:
+#
+#   - Identifier.addresses: the candidate (depth, slot) pairs, innermost
+#     scope first. depth is the number of scopes to walk outwards from the
+#     scope the identifier appears in. At runtime the first candidate whose
+#     slot holds a value is used.
+#   - Identifier.declareSlot: for assignment targets, the slot of the
+#     innermost scope the identifier is declared in when none of the
+#     candidates holds a value (None when it is always defined already).
+#   - slotCount on scope nodes and on the program Block, plus
+#     globalNames (name -> slot) on the program Block.
+#   - countedLoop on ForStatement nodes (see loops.py).
+#
+# Several candidates are only needed when an identifier may be declared in
+# more than one scope, e.g. first inside an if and later in the enclosing
+# loop body. An identifier that is assigned by a statement is definitely
+# defined for the rest of its block, assignments to it in nested scopes
+# never declare it again, so they get no slot there.
+#
+# Identifiers that can never be defined get no candidates, looking them up
+# raises the ContextError at runtime like before: the use may be in code that
+# never runs (e.g. "if (false) { println d; };"). When the program is run with
+# global variables provided by the caller (Program.run), strict is False and
+# every identifier also gets a global slot as its last candidate.
+
+import ast
+import loops
+
+
+class Scope(object):
+    def __init__(self, node, outerScope):
+        self.node = node
+        self.outerScope = outerScope
+        # identifier name -> slot
+        self.slots = {}
+
+    def declare(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots)
+        return self.slots[name]
+
+
+# identifier that is the target of an assignment, None for other LHS. The
+# LHS is interpreted, a parenthesized identifier ("(a) = 1") is a target too
+def getAssignmentTarget(node):
+    identifier = node.identifier
+    while identifier.type() in (ast.Expr, ast.ParentheseValue):
+        identifier = identifier.getValue() if identifier.type() == ast.Expr else identifier.value
+    if identifier.type() == ast.Identifier:
+        return identifier
+    return None
+
+
+# name an expression statement definitely defines for the rest of its block
+# (an assignment to an identifier), None when there is none
+def getDefinedName(expr):
+    if expr.type() == ast.AssignmentExpression:
+        identifier = getAssignmentTarget(expr)
+        if identifier is not None:
+            return identifier.getValue()
+    return None
+
+
+class Resolver(object):
+    def __init__(self, strict=True):
+        self.strict = strict
+        # scope node -> Scope, filled by the first pass
+        self.scopes = {}
+        # every identifier name that is used in the program
+        self.names = set()
+
+    def resolve(self, block):
+        # first pass: find the scopes each identifier may be declared in
+        self.scope = Scope(block, None)
+        self.scopes[id(block)] = self.scope
+        self.declaring = True
+        self.visit(block, set())
+
+        globalScope = self.scope
+        if not self.strict:
+            for name in sorted(self.names):
+                globalScope.declare(name)
+
+        # second pass: annotate the identifiers with their addresses
+        self.declaring = False
+        self.visit(block, set())
+
+        for scope in self.scopes.values():
+            scope.node.slotCount = len(scope.slots)
+        block.globalNames = dict(globalScope.slots)
+        return block
+
+    def visit(self, node, definite):
+        # dispatch on the AST class, e.g. visitBinaryOperator
+        method = getattr(self, "visit" + type(node).__name__, None)
+        if method is not None:
+            method(node, definite)
+
+    # enter the scope of node and visit its children with visitChildren
+    def visitScope(self, node, definite, visitChildren):
+        if self.declaring:
+            self.scope = Scope(node, self.scope)
+            self.scopes[id(node)] = self.scope
+        else:
+            self.scope = self.scopes[id(node)]
+
+        # identifiers defined in the nested scope are not defined after it
+        visitChildren(set(definite))
+        self.scope = self.scope.outerScope
+
+    # candidate addresses of the identifier name, innermost scope first
+    # (empty when it can never be defined)
+    def getAddresses(self, name):
+        addresses = []
+        depth = 0
+        scope = self.scope
+        while scope is not None:
+            if name in scope.slots:
+                addresses.append((depth, scope.slots[name]))
+            scope = scope.outerScope
+            depth += 1
+        return tuple(addresses)
+
+    # statements
+
+    def visitBlock(self, node, definite):
+        # assignments of the block are definite for the rest of the block only
+        definite = set(definite)
+        for statement in node.getASTList():
+            self.visit(statement, definite)
+
+    def visitStatement(self, node, definite):
+        self.visit(node.expr, definite)
+        self.addDefinite(node.expr, definite)
+
+    def addDefinite(self, expr, definite):
+        name = getDefinedName(expr)
+        if name is not None:
+            definite.add(name)
+
+    def visitPrintStatement(self, node, definite):
+        self.visit(node.expr, definite)
+
+    def visitWhileStatement(self, node, definite):
+        def visitChildren(definite):
+            self.visit(node.condition, definite)
+            self.visit(node.body, definite)
+        self.visitScope(node, definite, visitChildren)
+
+    def visitForStatement(self, node, definite):
+        def visitChildren(definite):
+            self.visit(node.condition, definite)
+            self.visit(node.preStatement, definite)
+            self.addDefinite(node.preStatement.expr, definite)
+            self.visit(node.body, definite)
+            self.visit(node.postStatement, definite)
+        self.visitScope(node, definite, visitChildren)
+        if not self.declaring:
+            node.countedLoop = loops.getCountedLoop(node)
+
+    # expressions
+
+    def visitExpr(self, node, definite):
+        self.visit(node.getValue(), definite)
+
+    def visitParentheseValue(self, node, definite):
+        self.visit(node.value, definite)
+
+    def visitIdentifier(self, node, definite):
+        self.names.add(node.getValue())
+        if not self.declaring:
+            node.addresses = self.getAddresses(node.getValue())
+
+    def visitBinaryOperator(self, node, definite):
+        self.visit(node.left, definite)
+        self.visit(node.right, definite)
+
+    def visitAssignmentExpression(self, node, definite):
+        identifier = getAssignmentTarget(node)
+        if identifier is None:
+            # the LHS is interpreted before AssignmentError is raised at
+            # runtime, e.g. "(a = 1) = 2"
+            self.visit(node.identifier, definite)
+            self.visit(node.expr, definite)
+            return
+        self.visit(node.expr, definite)
+
+        name = identifier.getValue()
+        self.names.add(name)
+        if self.declaring:
+            if name not in definite:
+                self.scope.declare(name)
+        else:
+            identifier.addresses = self.getAddresses(name)
+            identifier.declareSlot = self.scope.slots.get(name)
+
+    def visitIfExpression(self, node, definite):
+        def visitChildren(definite):
+            self.visit(node.condition, definite)
+            self.visit(node.if_body, definite)
+        self.visitScope(node, definite, visitChildren)
+
+    def visitIfElseIfElseExpression(self, node, definite):
+        def visitChildren(definite):
+            self.visit(node.condition, definite)
+            self.visit(node.if_body, definite)
+            for elseIfBody in node.else_if_body_list.getASTList():
+                self.visit(elseIfBody.condition, definite)
+                self.visit(elseIfBody.getValue(), definite)
+            self.visit(node.else_body.getValue(), definite)
+        self.visitScope(node, definite, visitChildren)
+
+
+# resolver of a program that is executed one top-level statement at a time
+# (see stream.py): the global scope, and the identifiers that are definitely
+# defined in it, carry over from one statement to the next. An identifier
+# that is not defined by the statements so far gets no candidates.
+class IncrementalResolver(Resolver):
+    def __init__(self):
+        Resolver.__init__(self, True)
+        self.globalScope = None
+        self.definite = set()
+
+    # resolve the statements of block in place and return it, block.slotCount
+    # is the number of global slots so far
+    def resolve(self, block):
+        if self.globalScope is None:
+            self.globalScope = Scope(block, None)
+
+        # nested scopes of earlier statements are not needed any more
+        self.scopes = {}
+        self.scope = self.globalScope
+
+        for statement in block.getASTList():
+            self.declaring = True
+            self.visit(statement, set(self.definite))
+            self.declaring = False
+            self.visit(statement, self.definite)
+
+        for scope in self.scopes.values():
+            scope.node.slotCount = len(scope.slots)
+        block.slotCount = len(self.globalScope.slots)
+        block.globalNames = dict(self.globalScope.slots)
+        return block
+
+
+# resolver of a program whose top-level statements are resolved one at a time
+# and replaced (see watch.py). Every statement gets the addresses a
+# resolution of the whole program would give it: it is resolved with the
+# identifiers definitely defined by the statements before it, in a global
+# scope shared by every statement. The global scope only grows, a global
+# variable that is no longer assigned keeps its slot, which is never set
+# (looking it up raises the ContextError like an identifier without
+# candidates).
+class StatementResolver(Resolver):
+    def __init__(self):
+        Resolver.__init__(self, True)
+        self.globalScope = Scope(None, None)
+
+    # resolve the top-level statement in place, return the names it uses
+    def resolveStatement(self, statement, definite):
+        self.scopes = {}
+        self.names = set()
+        self.scope = self.globalScope
+        self.declaring = True
+        self.visit(statement, set(definite))
+        self.declaring = False
+        self.visit(statement, set(definite))
+
+        for scope in self.scopes.values():
+            scope.node.slotCount = len(scope.slots)
+        return self.names
+
+
+# resolve the program block in place and return it
+def resolve(block, strict=True):
+    return Resolver(strict).resolve(block)
@@ -0,0 +1,75 @@
+# Program to define the ropes of string concatenation
+#
+# "+" with a String operand concatenates (numbers are converted to the text
+# print writes). Copying both strings on every "+" makes building a string
+# in a loop quadratic:
+#
+#   s = "";
+#   for (i = 0; i < n; i = (i + 1);) { s = ((s + i) + ","); };
+#
+# A concatenation therefore returns a Rope: the pieces of the string in a
+# list and the number of pieces that belong to it. Appending to the newest
+# rope of a list appends the piece to the same list, the older ropes keep
+# their number of pieces and still see their own string. Appending to an
+# older rope (or prepending) copies the list of pieces instead.
+#
+# The text of a rope is only joined when it is needed (printing, passing it
+# to Python) by flatten(), the values of the engines keep the joined text.
+
+# two strings shorter than this in total are joined right away
+SHORT_LENGTH = 8
+
+
+class Rope(object):
+    __slots__ = ("pieces", "count")
+
+    def __init__(self, pieces, count):
+        self.pieces = pieces
+        self.count = count
+
+    def __str__(self):
+        return flatten(self)
+
+    def __repr__(self):
+        return "Rope(%r)" % flatten(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, Rope):
+            return NotImplemented
+        return flatten(self) == flatten(other)
+
+    def __hash__(self):
+        return hash(flatten(self))
+
+
+# the pieces of a str or a Rope in a new list
+def getPieces(text):
+    if type(text) is str:
+        return [text]
+    return text.pieces[:text.count]
+
+
+# text of left followed by the text of right, both are a str or a Rope
+def concatenate(left, right):
+    if type(left) is Rope and left.count == len(left.pieces):
+        # left is the newest rope of its list of pieces
+        pieces = left.pieces
+    else:
+        if type(left) is str and type(right) is str and len(left) + len(right) < SHORT_LENGTH:
+            return left + right
+        pieces = getPieces(left)
+
+    if type(right) is str:
+        pieces.append(right)
+    else:
+        pieces.extend(right.pieces[:right.count])
+    return Rope(pieces, len(pieces))
+
+
+# the text of a str or a Rope
+def flatten(text):
+    if type(text) is str:
+        return text
+    if text.count == len(text.pieces):
+        return "".join(text.pieces)
+    return "".join(text.pieces[:text.count])
@@ -0,0 +1,257 @@
+# Program to define the runtime of programs transpiled to Python
+#
+# transpiler.py translates a program to Python source, which represents the
+# values of mini-js by Python values:
+#
+#   Number  -> float
+#   Boolean -> bool
+#   String  -> str (without the quotes), rope.Rope for concatenations
+#   Null    -> NULL
+#
+# The generated code does the common cases (arithmetic on two floats,
+# comparisons, boolean operators) inline and calls the functions of this
+# module for everything else. They follow the rules of the tree-walker in
+# ast.py, and raise the same errors.
+
+import ast
+import rope
+
+
+class NullValue(object):
+    def __repr__(self):
+        return "null"
+
+
+NULL = NullValue()
+
+
+# value of a parenthesized identifier operand, BinaryOperator.interpret does
+# not look it up (e.g. "(a) + 1")
+class Name(object):
+    def __init__(self, name):
+        self.name = name
+
+
+# the AST class of a value, used in error messages
+def getNodeType(value):
+    if type(value) is float:
+        return ast.Number
+    if type(value) is bool:
+        return ast.Boolean
+    if type(value) is str or type(value) is rope.Rope:
+        return ast.String
+    if type(value) is Name:
+        return ast.Identifier
+    return ast.Null
+
+
+def getNodeTypeName(value):
+    return getNodeType(value).__name__
+
+
+def getString(value):
+    if type(value) is float:
+        return str(value)
+    if type(value) is bool:
+        return "true" if value else "false"
+    if type(value) is str or type(value) is rope.Rope:
+        return rope.flatten(value)
+    if value is NULL:
+        return "null"
+    # if expressions whose arm is not taken
+    raise AttributeError("'NoneType' object has no attribute 'type'")
+
+
+# print function of the generated code, writing to output (sys.stdout when
+# None), the output decides when the text is flushed (see output.py)
+def getPrinter(output):
+    def printValue(value, newline):
+        stream = output
+        if stream is None:
+            stream = ast.sys.stdout
+        if newline:
+            stream.write(getString(value) + "\n")
+        else:
+            stream.write(getString(value))
+    return printValue
+
+
+# value of an if expression that is used, None when the taken arm has no value
+def checkValue(value):
+    if value is None:
+        raise AttributeError("'NoneType' object has no attribute 'type'")
+    return value
+
+
+def undefined(name):
+    raise ast.ContextError(
+        "Identifier \"" + name + "\" specified is not in the scope of the context!")
+
+
+# raise the AttributeError of calling a missing method on a node
+def noAttribute(typeName, attribute, *evaluated):
+    raise AttributeError("'" + typeName + "' object has no attribute '" + attribute + "'")
+
+
+# the condition value, when given, is type checked with value.type()
+def conditionError(statement, *value):
+    if value and value[0] is None:
+        noAttribute("NoneType", "type")
+    raise ast.ConditionError(
+        "Conditional statement of " + statement + " statement must be type Boolean.")
+
+
+# evaluated are the values of both sides, the LHS is type checked with type()
+def assignmentError(*evaluated):
+    if evaluated and evaluated[0] is None:
+        noAttribute("NoneType", "type")
+    raise ast.AssignmentError("LHS of assignment statement must be an identifier")
+
+
+# Boolean.isTrue / Boolean.isFalse of a condition value
+def isTrue(value):
+    if type(value) is not bool:
+        noAttribute(getValueTypeName(value), "isTrue")
+    return value
+
+
+def isFalse(value):
+    if type(value) is not bool:
+        noAttribute(getValueTypeName(value), "isFalse")
+    return not value
+
+
+def getValueTypeName(value):
+    if value is None:
+        return "NoneType"
+    return getNodeTypeName(value)
+
+
+def notImplemented(op, leftType, rightType):
+    raise ast.NotImplementedError("Operator \"" + op + "\" is not implemented for Expression Type " +
+                                  str(leftType) + " and Expression Type " + str(rightType))
+
+
+NUMBER_OPERATORS = {
+    "+": lambda left, right: left + right,
+    "-": lambda left, right: left - right,
+    "*": lambda left, right: left * right,
+    "/": lambda left, right: left / right,
+    ">=": lambda left, right: left >= right,
+    "<=": lambda left, right: left <= right,
+    ">": lambda left, right: left > right,
+    "<": lambda left, right: left < right,
+    "==": lambda left, right: left == right,
+    "!=": lambda left, right: left != right,
+}
+
+BOOLEAN_OPERATORS = {
+    "||": lambda left, right: left or right,
+    "&&": lambda left, right: left and right,
+    "==": lambda left, right: left == right,
+    "!=": lambda left, right: left != right,
+}
+
+
+# text of a string or a number operand of "+" (see ast.concatenate)
+def getText(value):
+    if type(value) is float:
+        return str(value)
+    return value
+
+
+# operator on two looked up values or literals (the operands of the operator
+# are not parenthesized), the generated code calls it when the inline fast
+# path does not apply
+def binary(op, left, right):
+    leftType = getNodeType(left)
+    rightType = getNodeType(right)
+
+    if leftType == rightType == ast.Number:
+        if op not in NUMBER_OPERATORS:
+            notImplemented(op, leftType, rightType)
+        return NUMBER_OPERATORS[op](left, right)
+
+    if leftType == rightType == ast.Boolean:
+        if op not in BOOLEAN_OPERATORS:
+            notImplemented(op, leftType, rightType)
+        return BOOLEAN_OPERATORS[op](left, right)
+
+    # (String, String), (String, Number), (Number, String) -> String
+    if (op == "+" and (leftType == ast.String or rightType == ast.String) and
+            leftType in ast.TEXT_TYPES and rightType in ast.TEXT_TYPES):
+        return rope.concatenate(getText(left), getText(right))
+
+    raise ast.TypeError("Left Expression Type " + str(leftType) +
+                        " Does Not Match the Right Expression Type " + str(rightType))
+
+
+# operator method names of Number and Boolean, see OPERATOR_METHODS in closure.py
+NUMBER_METHODS = {
+    "+": "add",
+    "-": "minus",
+    "*": "multiply",
+    "/": "divide",
+    ">=": "greater_than_or_equal_to",
+    "<=": "less_than_or_equal_to",
+    ">": "greater_than",
+    "<": "less_than",
+    "==": "equal_to",
+    "!=": "not_equal_to",
+}
+BOOLEAN_METHODS = {
+    "==": "equal_to",
+    "!=": "not_equal_to",
+}
+
+
+# Node.getValue() of a value passed to an operator method
+def getOperandValue(value):
+    if type(value) is Name:
+        return value.name
+    if value is NULL:
+        return None
+    if value is None:
+        noAttribute("NoneType", "getValue")
+    return value
+
+
+# the operator method of the left value when an operand is parenthesized:
+# BinaryOperator.interpret calls left.add(right) etc. without checking the
+# types. The method is looked up before the right operand is evaluated
+def method(op, left):
+    if type(left) is float and op == "+":
+        # Number.add concatenates a string
+        def numberAdd(right):
+            if type(right) is str or type(right) is rope.Rope:
+                return rope.concatenate(str(left), right)
+            return left + getOperandValue(right)
+        return numberAdd
+
+    if type(left) is float and op in NUMBER_METHODS:
+        operator = NUMBER_OPERATORS[op]
+        return lambda right: operator(left, getOperandValue(right))
+
+    if getNodeType(left) is ast.String and op == "+":
+        # String.add
+        def stringAdd(right):
+            if right is None:
+                noAttribute("NoneType", "type")
+            rightType = getNodeType(right)
+            if rightType is not ast.String and rightType is not ast.Number:
+                raise ast.TypeError("Left Expression Type " + str(ast.String) +
+                                    " Does Not Match the Right Expression Type " + str(rightType))
+            return rope.concatenate(left, getText(right))
+        return stringAdd
+
+    if type(left) is bool and op in BOOLEAN_METHODS:
+        operator = BOOLEAN_OPERATORS[op]
+
+        # Boolean.equal_to compares the value attributes
+        def booleanMethod(right):
+            if type(right) is Name or right is NULL or right is None:
+                noAttribute(getValueTypeName(right), "value")
+            return operator(left, right)
+        return booleanMethod
+
+    noAttribute(getValueTypeName(left), NUMBER_METHODS[op])
@@ -0,0 +1,88 @@
+# Program to define the sampling profiler of the tree-walker
+#
+# interp.py --sample FILE interrupts the interpreter with a profiling timer
+# signal (every 5 milliseconds of CPU time by default) and records which
+# statements of the program it is executing at that moment: the while, for
+# and if nesting down to the current statement, each with the line it starts
+# on (Node.lineno). Nothing is instrumented, the cost is the signal handler
+# walking the Python stack once per sample.
+#
+# The samples are written in the collapsed stack format of flame graph tools
+# (e.g. flamegraph.pl), one line per distinct stack:
+#
+#   loop;WhileStatement:3;Statement:4;IfElseIfElseExpression:4;Statement:5 17
+
+import signal
+import sys
+
+import ast
+
+# seconds of CPU time between samples
+INTERVAL = 0.005
+
+# the AST classes that appear in the sampled stacks
+FRAME_CLASSES = [
+    ast.Statement,
+    ast.PrintStatement,
+    ast.WhileStatement,
+    ast.ForStatement,
+    ast.IfExpression,
+    ast.IfElseIfElseExpression,
+]
+
+
+def isSupported():
+    return hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+
+
+class Sampler(object):
+    def __init__(self, rootName="program", interval=INTERVAL):
+        self.rootName = rootName
+        self.interval = interval
+        self.previousHandler = None
+
+        # samples of every stack (tuple of frame names)
+        self.counts = {}
+
+        # code object of the interpret method of every class in FRAME_CLASSES
+        self.codes = {vars(nodeClass)["interpret"].__code__: nodeClass.__name__ for nodeClass in FRAME_CLASSES}
+
+    def start(self):
+        self.previousHandler = signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previousHandler)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+    # signal handler, frame is the Python frame that was interrupted
+    def sample(self, signum, frame):
+        codes = self.codes
+        stack = []
+        while frame is not None:
+            name = codes.get(frame.f_code)
+            if name is not None:
+                node = frame.f_locals.get("self")
+                stack.append(name + ":" + str(getattr(node, "lineno", None)))
+            frame = frame.f_back
+
+        stack.reverse()
+        stack = tuple(stack)
+        self.counts[stack] = self.counts.get(stack, 0) + 1
+
+    def getSampleCount(self):
+        return sum(self.counts.values())
+
+    # write the samples in the collapsed stack format
+    def write(self, stream=None):
+        if stream is None:
+            stream = sys.stdout
+        for stack, count in sorted(self.counts.items()):
+            stream.write(";".join((self.rootName,) + stack) + " " + str(count) + "\n")
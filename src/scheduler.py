@@ -0,0 +1,113 @@
+# Program to define the cooperative scheduler of scripts (asyncio)
+#
+# Many scripts run concurrently on one thread: every script is an asyncio
+# task executing its bytecode (compiler.py, interpreter.py) SLICE_SIZE
+# instructions at a time and yielding to the event loop in between, so a
+# script that never terminates (e.g. "while (true) { ... }") does not hold
+# up the others.
+#
+# Every script can be given an instruction budget and a wall-clock timeout
+# (seconds from the start of the script, time spent waiting for other
+# scripts included). A script that exceeds either is aborted with
+# BudgetExceeded or DeadlineExceeded, errors of the program itself (e.g. a
+# TypeError) abort it the same way; the other scripts are not affected.
+#
+#   scripts = [scheduler.Script.fromString(name, source, budget=10 ** 6, timeout=1.0)
+#              for name, source in sources]
+#   for script in scheduler.runScripts(scripts):
+#       print(script.name, script.error, script.output.getvalue())
+#
+# The tree-walker interprets nested nodes recursively and cannot stop in the
+# middle of a statement, scripts are therefore always run as bytecode.
+
+import io
+import time
+
+import compiler
+import interpreter
+import optimizer
+import program
+import resolver
+import stdlib
+
+# the standard asyncio module imports the standard ast module (see stdlib.py)
+asyncio = stdlib.importModule("asyncio")
+
+# instructions executed between two yields to the event loop
+SLICE_SIZE = 1000
+
+
+class ScriptAborted(Exception):
+    pass
+
+
+class BudgetExceeded(ScriptAborted):
+    pass
+
+
+class DeadlineExceeded(ScriptAborted):
+    pass
+
+
+class Script(object):
+    # budget is the maximum number of instructions executed and timeout the
+    # maximum number of seconds the script runs (None for no limit); output
+    # is the stream print statements write to (a new StringIO by default)
+    def __init__(self, name, bytecode, budget=None, timeout=None, output=None):
+        self.name = name
+        self.bytecode = bytecode
+        self.budget = budget
+        self.timeout = timeout
+        if output is None:
+            output = io.StringIO()
+        self.output = output
+
+        # set by run(), started is a time.monotonic() value
+        self.instructions = 0
+        self.error = None
+        self.started = None
+        self.elapsed = None
+
+    @staticmethod
+    def fromString(name, rawProgramString, level=0, budget=None, timeout=None, output=None):
+        parsedAST = optimizer.optimize(program.parseString(rawProgramString), level)
+        resolver.resolve(parsedAST)
+        return Script(name, compiler.Compiler().compileProgram(parsedAST), budget, timeout, output)
+
+    @staticmethod
+    def fromFile(filename, level=0, budget=None, timeout=None, output=None):
+        return Script.fromString(filename, program.getRawProgramString(filename), level, budget, timeout, output)
+
+    # run the script to its end, or until it is aborted (error is set to the
+    # exception). Returns the script
+    async def run(self, sliceSize=SLICE_SIZE):
+        machine = interpreter.Interpreter(self.bytecode, None, self.output)
+        start = self.started = time.monotonic()
+        deadline = None if self.timeout is None else start + self.timeout
+        try:
+            while True:
+                count = sliceSize
+                if self.budget is not None:
+                    count = min(count, self.budget - self.instructions)
+                self.instructions += machine.step(count)
+                if machine.isFinished():
+                    break
+
+                if self.budget is not None and self.instructions >= self.budget:
+                    raise BudgetExceeded("instruction budget of %d exceeded" % self.budget)
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded("deadline of %g seconds exceeded" % self.timeout)
+                await asyncio.sleep(0)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed = time.monotonic() - start
+        return self
+
+
+# run the scripts concurrently in a new event loop, return them once every
+# script has terminated or has been aborted
+def runScripts(scripts, sliceSize=SLICE_SIZE):
+    async def runAll():
+        return await asyncio.gather(*[script.run(sliceSize) for script in scripts])
+    return asyncio.run(runAll())
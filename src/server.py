@@ -0,0 +1,267 @@
+# Program to define the mini-js daemon (mini-js --serve)
+#
+# the daemon builds the lexer and the parser once and then runs the programs
+# sent by client.py over a Unix domain socket (see client.py for the
+# messages). The output of every program is streamed back to its client
+# while it runs.
+#
+# Every connection is handled by a pool of worker threads, so a slow program
+# does not hold up the others (they share the interpreter lock, as threads of
+# one process). The prepared programs are kept in memory and reused while
+# the program file does not change. A program is stopped when its client
+# goes away (e.g. interrupted), see ConnectionWatcher.
+
+import argparse
+import ctypes
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import client
+import program
+
+# programs run at the same time, the worker threads share the interpreter
+# lock so more workers than CPUs only let short programs pass long ones
+WORKERS = 8
+
+# prepared programs kept in memory
+PROGRAM_CACHE_SIZE = 256
+
+
+class ServerError(Exception):
+    pass
+
+
+# the exit of the argument parser of a request
+class RequestExit(Exception):
+    def __init__(self, status):
+        Exception.__init__(self, status)
+        self.status = status
+
+
+# raised in the thread running a request when its client goes away; not an
+# Exception, the engines and the request handling must not catch it
+class RequestCancelled(BaseException):
+    pass
+
+
+# argument parser writing its messages (usage, errors, help) to the streams
+# of the request instead of the streams of the daemon
+class RequestArgumentParser(argparse.ArgumentParser):
+    def __init__(self, stdout, stderr, **kwargs):
+        argparse.ArgumentParser.__init__(self, **kwargs)
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def _print_message(self, message, file=None):
+        if message:
+            (self.stderr if file is sys.stderr else self.stdout).write(message)
+
+    def exit(self, status=0, message=None):
+        if message:
+            self.stderr.write(message)
+        raise RequestExit(status)
+
+
+# text stream sending what is written to one channel of a connection
+class ChannelWriter(object):
+    def __init__(self, connection, channel):
+        self.connection = connection
+        self.channel = channel
+
+    def write(self, text):
+        if text:
+            client.sendMessage(self.connection, self.channel, text.encode())
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+# stops the request of a connection when the client closes it: the client
+# sends nothing after its request, a thread waits for the end of the
+# connection and raises RequestCancelled in the thread running the request.
+# The exception is raised the next time that thread runs Python code, so a
+# loop that never ends is stopped with any engine (CPython only).
+class ConnectionWatcher(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.threadId = threading.get_ident()
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = None
+        if hasattr(ctypes, "pythonapi"):
+            self.thread = threading.Thread(target=self.watch, daemon=True)
+            self.thread.start()
+
+    def watch(self):
+        try:
+            while self.connection.recv(4096):
+                pass
+        except OSError:
+            pass
+        with self.lock:
+            if self.running:
+                self.running = False
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.threadId),
+                                                           ctypes.py_object(RequestCancelled))
+
+    # the request is done and can no longer be cancelled
+    def stop(self):
+        with self.lock:
+            self.running = False
+        if self.thread is not None:
+            try:
+                # wakes up the waiting thread
+                self.connection.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+            self.thread.join()
+
+
+# the prepared programs (see interp.prepareProgram), by program file, engine
+# and optimization level; an entry is used while the file has not changed
+class ProgramCache(object):
+    def __init__(self, prepare, size=PROGRAM_CACHE_SIZE):
+        self.prepare = prepare
+        self.size = size
+        self.programs = {}
+        self.lock = threading.Lock()
+
+    def get(self, args):
+        if args.no_cache:
+            return self.prepare(args)
+
+        key = (args.programs[0], args.engine, args.optimize)
+        rawProgramString = program.getRawProgramString(args.programs[0])
+        with self.lock:
+            entry = self.programs.get(key)
+        if entry is not None and entry[0] == rawProgramString:
+            return entry[1]
+
+        execute = self.prepare(args)
+        with self.lock:
+            self.programs.pop(key, None)
+            if len(self.programs) >= self.size:
+                # drop the entry stored first
+                del self.programs[next(iter(self.programs))]
+            self.programs[key] = (rawProgramString, execute)
+        return execute
+
+
+class Server(object):
+    # handle(request, stdout, stderr) runs a request and returns its exit status
+    def __init__(self, socketPath, workers, handle):
+        self.socketPath = client.getSocketPath(socketPath)
+        self.handle = handle
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.listener = None
+
+    def bind(self):
+        directory = os.path.dirname(self.socketPath)
+        try:
+            if directory == client.getSocketDirectory():
+                try:
+                    os.mkdir(directory, 0o700)
+                except FileExistsError:
+                    pass
+                client.checkSocketDirectory(directory)
+            client.connect(self.socketPath).close()
+            raise ServerError("a daemon is already listening on " + self.socketPath)
+        except client.UnsafeSocketError as e:
+            raise ServerError(str(e))
+        except ConnectionRefusedError:
+            # left behind by a daemon that did not exit cleanly
+            if stat.S_ISSOCK(os.stat(self.socketPath).st_mode):
+                try:
+                    os.unlink(self.socketPath)
+                except PermissionError:
+                    raise ServerError("cannot remove the socket " + self.socketPath +
+                                      " left behind by another daemon, it belongs to another user")
+        except PermissionError:
+            raise ServerError("cannot connect to " + self.socketPath + ", it belongs to another user")
+        except FileNotFoundError:
+            pass
+
+        # the socket is created without access for the other users, they
+        # could connect and run programs before a chmod after the bind
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)
+        try:
+            self.listener.bind(self.socketPath)
+        finally:
+            os.umask(umask)
+        os.chmod(self.socketPath, 0o600)
+        self.listener.listen()
+
+    def serveForever(self):
+        try:
+            while True:
+                connection, address = self.listener.accept()
+                self.pool.submit(self.handleConnection, connection)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            try:
+                os.unlink(self.socketPath)
+            except OSError:
+                pass
+        self.pool.shutdown(wait=False)
+
+    def handleConnection(self, connection):
+        with connection:
+            try:
+                client.checkPeer(connection)
+            except client.UnsafeSocketError as e:
+                print("mini-js: connection refused, " + str(e), file=sys.stderr, flush=True)
+                return
+
+            message = client.receiveMessage(connection)
+            if message is None or message[0] != client.REQUEST:
+                return
+
+            stdout = ChannelWriter(connection, client.STDOUT)
+            stderr = ChannelWriter(connection, client.STDERR)
+            watcher = ConnectionWatcher(connection)
+            try:
+                try:
+                    try:
+                        status = self.handle(json.loads(message[1].decode()), stdout, stderr)
+                    finally:
+                        watcher.stop()
+                except Exception:
+                    # reported like an uncaught error of interp.py
+                    stderr.write(traceback.format_exc())
+                    status = 1
+                client.sendMessage(connection, client.EXIT, str(status).encode())
+            except (OSError, RequestCancelled):
+                # the client went away
+                pass
+
+
+# serve until interrupted
+def serve(socketPath, workers, handle):
+    # built once, shared by every request
+    program.getLexer()
+    program.getParser()
+
+    server = Server(socketPath, workers, handle)
+    server.bind()
+    print("mini-js daemon listening on " + server.socketPath, flush=True)
+
+    # the socket is removed when the daemon is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,39 @@
+# Program to define the import of modules that need the standard module ast
+#
+# ast.py of mini-js has the name of a module of the standard library, and
+# src/ is the first entry of sys.path, so "import ast" in the standard library
+# (e.g. in inspect, imported by asyncio and NumPy) finds the mini-js module
+# and fails. importModule imports a module while the standard ast module is
+# in sys.modules; the modules it imports keep a reference to it, and the
+# mini-js ast module is restored afterwards.
+
+import importlib
+import importlib.util
+import os
+import sys
+import sysconfig
+
+
+# the ast module of the standard library
+def getStandardAst():
+    path = os.path.join(sysconfig.get_paths()["stdlib"], "ast.py")
+    spec = importlib.util.spec_from_file_location("ast", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def importModule(name):
+    shadowing = sys.modules.get("ast")
+    if name in sys.modules or (shadowing is not None and hasattr(shadowing, "NodeVisitor")):
+        # imported already, or the standard ast module is loaded
+        return importlib.import_module(name)
+
+    sys.modules["ast"] = getStandardAst()
+    try:
+        return importlib.import_module(name)
+    finally:
+        if shadowing is None:
+            del sys.modules["ast"]
+        else:
+            sys.modules["ast"] = shadowing
@@ -0,0 +1,146 @@
+# Program to define the streaming execution of large programs
+#
+# interp.py --stream executes a program one top-level statement at a time
+# instead of parsing the whole file first:
+#
+#   - the source is read in chunks of whole lines (no token spans a line),
+#   - every chunk is lexed on its own, the token positions are shifted to the
+#     position of the chunk in the file,
+#   - the tokens are split into top-level statements, every statement is
+#     parsed, resolved and executed as soon as it is complete, and then
+#     discarded.
+#
+# Only the current chunk and the current statement are held in memory, the
+# global variables carry over from one statement to the next. Errors are
+# reported when the statement containing them is reached, the statements
+# before it have already been executed.
+
+import codecs
+
+from rply.token import SourcePosition
+
+import ast
+import closure
+import compiler
+import interpreter
+import optimizer
+import program
+import resolver
+import transpiler
+
+# characters read from the source file at a time
+CHUNK_SIZE = 1024 * 1024
+
+
+# read the file in chunks that end at a line boundary (except the last one)
+def readChunks(filename, chunkSize=CHUNK_SIZE):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    rest = ""
+    with open(filename, "rb") as f:
+        while True:
+            data = f.read(chunkSize)
+            text = rest + decoder.decode(data, not data)
+            if not data:
+                if text:
+                    yield text
+                return
+
+            end = text.rfind("\n") + 1
+            if end:
+                yield text[:end]
+            rest = text[end:]
+
+
+# lex every chunk, with the source positions of the whole file (the first
+# chunk starts at the given offset, after the given number of lines)
+def lexChunks(lexer, chunks, offset=0, lines=0):
+    for chunk in chunks:
+        for token in lexer.lex(chunk):
+            position = token.getsourcepos()
+            token.source_pos = SourcePosition(position.idx + offset, position.lineno + lines, position.colno)
+            yield token
+        offset += len(chunk)
+        lines += chunk.count("\n")
+
+
+# split the token stream into the tokens of each top-level statement
+#
+# a statement ends with a semicolon outside of any parentheses and braces,
+# while and for statements may also end with the closing brace of their body
+# (the semicolon after it is optional)
+def splitStatements(tokens):
+    statement = []
+    depth = 0
+    tokens = iter(tokens)
+    for token in tokens:
+        statement.append(token)
+        name = token.gettokentype()
+        if name in ("LPAREN", "LBRACE"):
+            depth += 1
+        elif name in ("RPAREN", "RBRACE"):
+            depth -= 1
+
+        if depth != 0:
+            continue
+        if name == "SEMICOLON":
+            yield statement
+            statement = []
+        elif name == "RBRACE" and statement[0].gettokentype() in ("WHILE", "FOR"):
+            # the statement ends here unless a semicolon follows
+            following = next(tokens, None)
+            if following is not None and following.gettokentype() == "SEMICOLON":
+                statement.append(following)
+                following = None
+            yield statement
+            statement = [following] if following is not None else []
+            if following is not None and following.gettokentype() in ("LPAREN", "LBRACE"):
+                depth += 1
+
+    if statement:
+        # incomplete statement, the parser reports the error
+        yield statement
+
+
+# executes the statements of one program, keeping its global variables
+class StreamExecutor(object):
+    def __init__(self, engine="tree", level=0, output=None):
+        self.engine = engine
+        self.level = level
+        self.output = output
+        self.resolver = resolver.IncrementalResolver()
+
+        # global variables of the engine in use
+        self.ctx = ast.Context(0, None, output)
+        self.globalScope = {}
+        self.globals = {}
+
+    def execute(self, block):
+        block = optimizer.optimize(block, self.level)
+
+        if self.engine == "vm":
+            # the bytecode interpreter looks up identifiers by name
+            bytecode = compiler.Compiler().compileProgram(block)
+            interpreter.Interpreter(bytecode, self.globalScope, self.output).run()
+            return
+
+        self.resolver.resolve(block)
+        if self.engine == "python":
+            self.globals.update(transpiler.run(transpiler.compileProgram(block), self.output, self.globals))
+            return
+
+        # new global variables get their slot in the global context
+        slots = self.ctx.getSlots()
+        slots.extend([None] * (block.slotCount - len(slots)))
+        if self.engine == "closure":
+            closure.compileProgram(block)(self.ctx)
+        else:
+            block.interpret(self.ctx)
+
+
+# execute the program file one top-level statement at a time
+def run(filename, engine="tree", level=0, output=None, chunkSize=CHUNK_SIZE):
+    executor = StreamExecutor(engine, level, output)
+    parser = program.getParser()
+    tokens = lexChunks(program.getLexer(), readChunks(filename, chunkSize))
+    for statementTokens in splitStatements(tokens):
+        executor.execute(parser.parse(iter(statementTokens)))
@@ -0,0 +1,586 @@
+# Program to define the Python transpiler
+#
+# The transpiler translates a resolved AST (see resolver.py) to the source of
+# a Python function, which is compiled with compile() so that loops and
+# arithmetic run as CPython bytecode. Values are represented as described in
+# runtime.py, the generated function calls runtime.py for printing, errors and
+# the operator cases that are not done inline.
+#
+# Every slot of every scope is a local variable of the generated function,
+# s<scope>_<slot>. Entering a scope sets its variables to None (undefined),
+# exactly like the fresh Context of the tree-walker. The generated function
+# takes and returns the global variables as a dictionary (name -> value):
+#
+#   def program(rt, output, globals):
+#       s0_0 = globals.get('a')
+#       ...
+#       return {'a': s0_0}
+#
+# if - else expressions are Python if statements, an if - else used as a value
+# stores its value in a temporary variable first. The operands evaluated
+# before it are stored in temporaries too, so that the order of evaluation is
+# the one of the tree-walker.
+#
+# CPython refuses a function with more than 20 statically nested loops
+# ("too many statically nested blocks"). A loop nested deeper than
+# MAX_NESTED_LOOPS in the generated function is emitted in a nested helper
+# function, which declares the variables of the enclosing scopes it uses
+# nonlocal and starts counting the nested loops again. The Python parser
+# still limits the indentation of the generated source to 100 levels, which
+# very deeply nested if - else expressions can exceed.
+
+import ast
+import runtime
+
+PROGRAM_FUNCTION = "program"
+
+# loops nested in one generated function, CPython allows 20 nested blocks
+MAX_NESTED_LOOPS = 20
+
+# operators done inline when both operands are floats
+NUMBER_OPERATORS = {"+", "-", "*", "/", ">=", "<=", ">", "<"}
+
+# operators done inline when both operands are bools (Python operator)
+BOOLEAN_OPERATORS = {"||": "or", "&&": "and"}
+
+# operators done inline when both operands are floats or both are bools
+EQUALITY_OPERATORS = {"==", "!="}
+
+
+# the result of interpreting node is an Identifier, which the node using it
+# has to look up (e.g. "a" or "(a)")
+def isIdentifierResult(node):
+    while node.type() in (ast.Expr, ast.ParentheseValue):
+        node = node.getValue() if node.type() == ast.Expr else node.value
+    return node.type() == ast.Identifier
+
+
+# innermost value of Expr and ParentheseValue wrappers
+def unwrap(node):
+    while node.type() in (ast.Expr, ast.ParentheseValue):
+        node = node.getValue() if node.type() == ast.Expr else node.value
+    return node
+
+
+# whether generating node emits statements (if - else expressions)
+def needsStatements(node):
+    if node.type() in (ast.IfExpression, ast.IfElseIfElseExpression):
+        return True
+    if node.type() in (ast.Expr, ast.ParentheseValue):
+        return needsStatements(node.getValue() if node.type() == ast.Expr else node.value)
+    if node.type() == ast.BinaryOperator:
+        return needsStatements(node.left) or needsStatements(node.right)
+    if node.type() == ast.AssignmentExpression:
+        return needsStatements(node.identifier) or needsStatements(node.expr)
+    return False
+
+
+# whether evaluating the node twice has the same effect as evaluating it once
+def isPure(node):
+    node = unwrap(node)
+    if node.type() == ast.BinaryOperator:
+        return isPure(node.left) and isPure(node.right)
+    return node.type() in (ast.Number, ast.String, ast.Boolean, ast.Identifier)
+
+
+class Transpiler(object):
+    def __init__(self):
+        self.lines = []
+        self.indentation = 1
+        self.temporaryCount = 0
+
+        # scope numbers of the scopes enclosing the generated code, innermost
+        # last, and the number of scopes so far
+        self.scopes = []
+        self.scopeCount = 0
+        # loops enclosing the generated code in the current function, and the
+        # (scope, slot) of every variable used in it
+        self.loopDepth = 0
+        self.variables = set()
+
+    # python source of the program block
+    def transpile(self, block):
+        self.lines.append("def " + PROGRAM_FUNCTION + "(rt, output, globals):")
+        for name in ["binary", "method", "isTrue", "isFalse", "undefined", "noAttribute",
+                     "conditionError", "assignmentError", "checkValue", "NULL", "Name"]:
+            self.emit(name + " = rt." + name)
+        self.emit("printValue = rt.getPrinter(output)")
+
+        globalScope = self.enterScope(0)
+        globalNames = sorted(block.globalNames.items(), key=lambda item: item[1])
+        for name, slot in globalNames:
+            self.emit("%s = globals.get(%r)" % (self.getVariable(globalScope, slot), name))
+
+        self.genBlock(block)
+
+        values = ", ".join("%r: %s" % (name, self.getVariable(globalScope, slot)) for name, slot in globalNames)
+        self.emit("return {" + values + "}")
+        return "\n".join(self.lines) + "\n"
+
+    def emit(self, line):
+        self.lines.append("    " * self.indentation + line)
+
+    def getTemporary(self):
+        self.temporaryCount += 1
+        return "_t%d" % self.temporaryCount
+
+    def getVariable(self, scope, slot):
+        self.variables.add((scope, slot))
+        return "s%d_%d" % (scope, slot)
+
+    # enter the scope of a node, all its variables are undefined
+    def enterScope(self, slotCount):
+        scope = self.scopeCount
+        self.scopeCount += 1
+        self.scopes.append(scope)
+        if slotCount and scope != 0:
+            self.emit(" = ".join(self.getVariable(scope, slot) for slot in range(slotCount)) + " = None")
+        return scope
+
+    def exitScope(self):
+        self.scopes.pop()
+
+    # variable names of the (depth, slot) addresses of an identifier
+    def getCandidates(self, identifier):
+        return [self.getVariable(self.scopes[-1 - depth], slot) for depth, slot in identifier.addresses]
+
+    # python expression looking up the identifier (Context.lookup)
+    def genLoad(self, identifier):
+        expression = "undefined(%r)" % identifier.getValue()
+        for variable in reversed(self.getCandidates(identifier)):
+            expression = "%s if %s is not None else %s" % (variable, variable, expression)
+        return "(" + expression + ")"
+
+    # python expression assigning value to the identifier (Context.add)
+    def genStore(self, identifier, value):
+        candidates = self.getCandidates(identifier)
+        if identifier.declareSlot is not None:
+            declared = self.getVariable(self.scopes[-1], identifier.declareSlot)
+        else:
+            declared = None
+
+        # declareSlot is None only when the identifier is always defined
+        if candidates == [declared] or (declared is None and len(candidates) == 1):
+            return "(%s := %s)" % (candidates[0], value)
+
+        temporary = self.getTemporary()
+        if declared is None:
+            expression = "undefined(%r)" % identifier.getValue()
+        else:
+            expression = "(%s := %s)" % (declared, temporary)
+        for variable in reversed(candidates):
+            expression = "(%s := %s) if %s is not None else %s" % (variable, temporary, variable, expression)
+        return "(%s := %s, %s)[1]" % (temporary, value, expression)
+
+    # generate the expressions in order, the ones evaluated before an
+    # expression that emits statements are stored in temporaries first
+    def genInOrder(self, generators):
+        expressions = []
+        for index, (node, generate) in enumerate(generators):
+            later = [laterNode for laterNode, _ in generators[index + 1:]]
+            expression = generate(node)
+            if any(needsStatements(laterNode) for laterNode in later):
+                temporary = self.getTemporary()
+                self.emit(temporary + " = " + expression)
+                expression = temporary
+            expressions.append(expression)
+        return expressions
+
+    # statements
+
+    def genBlock(self, node):
+        for statement in node.getASTList():
+            self.generate(statement)
+
+    # emit the statements of an indented Python block, which must not be empty
+    def genBody(self, node, postStatement=None):
+        self.indentation += 1
+        start = len(self.lines)
+        self.genBlock(node)
+        if postStatement is not None:
+            self.generate(postStatement)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indentation -= 1
+
+    # emit a statement node
+    def generate(self, node):
+        # dispatch on the AST class, e.g. genWhileStatement
+        method = getattr(self, "gen" + type(node).__name__, None)
+        if method is None:
+            raise ast.NotImplementedError("Node type " + type(node).__name__ + " cannot be transpiled")
+        method(node)
+
+    def genStatement(self, node):
+        # an identifier is never looked up by a statement
+        if isIdentifierResult(node.expr):
+            return
+        if unwrap(node.expr).type() in (ast.IfExpression, ast.IfElseIfElseExpression):
+            self.genIf(unwrap(node.expr), False)
+            return
+        self.emit(self.genRaw(node.expr))
+
+    def genPrintStatement(self, node):
+        self.emit("printValue(%s, %r)" % (self.genValue(node.expr), node.cmd == "println"))
+
+    # python expression of a loop condition after its type check
+    def genLoopCondition(self, condition):
+        temporary = self.getTemporary()
+        return "(%s := %s) is True or isTrue(%s)" % (temporary, self.genValue(condition), temporary)
+
+    # check the type of the condition once before the loop
+    def genConditionCheck(self, condition, statement):
+        if isIdentifierResult(condition):
+            self.emit("conditionError(%r)" % statement)
+            return
+        temporary = self.getTemporary()
+        self.emit("if type(%s := %s) is not bool: conditionError(%r, %s)" %
+                  (temporary, self.genValue(condition), statement, temporary))
+
+    def genLoop(self, condition, body, postStatement=None):
+        if self.loopDepth == MAX_NESTED_LOOPS:
+            self.genLoopFunction(condition, body, postStatement)
+            return
+
+        self.loopDepth += 1
+        if needsStatements(condition):
+            self.emit("while True:")
+            self.indentation += 1
+            self.emit("if not (%s): break" % self.genLoopCondition(condition))
+            self.indentation -= 1
+        else:
+            self.emit("while %s:" % self.genLoopCondition(condition))
+
+        self.genBody(body, postStatement)
+        self.loopDepth -= 1
+
+    # emit the loop in a helper function called in its place
+    def genLoopFunction(self, condition, body, postStatement):
+        function = self.getTemporary()
+        enclosingScopes = set(self.scopes)
+        loopDepth = self.loopDepth
+        variables = self.variables
+        self.loopDepth = 0
+        self.variables = set()
+
+        self.emit("def %s():" % function)
+        self.indentation += 1
+        start = len(self.lines)
+        self.genLoop(condition, body, postStatement)
+        # every variable of an enclosing scope is set when the scope is
+        # entered, a nonlocal declaration always finds it
+        nonlocals = sorted(variable for variable in self.variables if variable[0] in enclosingScopes)
+        if nonlocals:
+            self.lines.insert(start, "    " * self.indentation + "nonlocal " +
+                              ", ".join(self.getVariable(scope, slot) for scope, slot in nonlocals))
+        self.indentation -= 1
+        self.emit(function + "()")
+
+        self.loopDepth = loopDepth
+        self.variables = variables | self.variables
+
+    def genWhileStatement(self, node):
+        self.enterScope(node.slotCount)
+        self.genConditionCheck(node.condition, "while")
+        self.genLoop(node.condition, node.body)
+        self.exitScope()
+
+    def genForStatement(self, node):
+        self.enterScope(node.slotCount)
+        # the condition is type checked before the pre statement runs
+        self.genConditionCheck(node.condition, "while")
+        self.generate(node.preStatement)
+        self.genLoop(node.condition, node.body, node.postStatement)
+        self.exitScope()
+
+    # expressions
+
+    # python expression of the value of node, identifiers are looked up
+    def genValue(self, node):
+        value = unwrap(node)
+        if value.type() == ast.Identifier:
+            return self.genLoad(value)
+        return self.genRaw(value)
+
+    # python expression of node.interpret(ctx), identifier results are only
+    # possible in operands of operators (see runtime.Name)
+    def genRaw(self, node):
+        node = unwrap(node)
+        method = getattr(self, "gen" + type(node).__name__ + "Value", None)
+        if method is None:
+            raise ast.NotImplementedError("Node type " + type(node).__name__ + " cannot be transpiled")
+        return method(node)
+
+    def genNumberValue(self, node):
+        return repr(node.getValue())
+
+    def genStringValue(self, node):
+        return repr(node.getValue())
+
+    def genBooleanValue(self, node):
+        return repr(node.getValue())
+
+    def genNullValue(self, node):
+        return "NULL"
+
+    def genIdentifierValue(self, node):
+        return "Name(%r)" % node.getValue()
+
+    def genAssignmentExpressionValue(self, node):
+        # "(a) = 1" assigns to a, the LHS is interpreted to the identifier
+        identifier = unwrap(node.identifier)
+        if identifier.type() != ast.Identifier:
+            # both sides are interpreted before the error is raised
+            left, right = self.genInOrder([(node.identifier, self.genRaw), (node.expr, self.genRaw)])
+            return "assignmentError(%s, %s)" % (left, right)
+
+        value = self.genValue(node.expr)
+        if unwrap(node.expr).type() in (ast.IfExpression, ast.IfElseIfElseExpression):
+            # the value of an if expression whose arm is not taken is None
+            value = "checkValue(%s)" % value
+        return self.genStore(identifier, value)
+
+    def genBinaryOperatorValue(self, node):
+        left = node.left
+        right = node.right
+        op = node.op
+
+        # operands are wrapped in an Expr, except for chained operators
+        # (e.g. "1 + 2 + 3"), BinaryOperator.interpret fails on getValue
+        if left.type() != ast.Expr:
+            return "noAttribute(%r, 'getValue')" % type(left).__name__
+        if right.type() != ast.Expr:
+            if left.getValue().type() == ast.Identifier:
+                return "noAttribute(%r, 'getValue', %s)" % (type(right).__name__, self.genLoad(left.getValue()))
+            return "noAttribute(%r, 'getValue')" % type(right).__name__
+
+        leftValue = left.getValue()
+        rightValue = right.getValue()
+        if leftValue.type() == ast.ParentheseValue or rightValue.type() == ast.ParentheseValue:
+            return self.genMethodOperator(node)
+
+        # literals and identifiers, both operands are evaluated first
+        leftExpression = self.genValue(left)
+        rightExpression = self.genValue(right)
+        leftType = leftValue.type()
+        rightType = rightValue.type()
+
+        if op in NUMBER_OPERATORS:
+            return self.genInlineOperator(op, op, leftExpression, rightExpression, leftType, rightType, "float")
+        if op in BOOLEAN_OPERATORS:
+            return self.genInlineOperator(op, BOOLEAN_OPERATORS[op], leftExpression, rightExpression,
+                                          leftType, rightType, "bool")
+        if op in EQUALITY_OPERATORS and ast.Number in (leftType, rightType):
+            return self.genInlineOperator(op, op, leftExpression, rightExpression, leftType, rightType, "float")
+        if op in EQUALITY_OPERATORS and ast.Boolean in (leftType, rightType):
+            return self.genInlineOperator(op, op, leftExpression, rightExpression, leftType, rightType, "bool")
+        if op in EQUALITY_OPERATORS:
+            leftTemporary = self.getTemporary()
+            rightTemporary = self.getTemporary()
+            return ("(%s %s %s if type(%s := %s) is type(%s := %s) and (type(%s) is float or type(%s) is bool) "
+                    "else binary(%r, %s, %s))" % (leftTemporary, op, rightTemporary, leftTemporary, leftExpression,
+                                                  rightTemporary, rightExpression, leftTemporary, leftTemporary,
+                                                  op, leftTemporary, rightTemporary))
+        return "binary(%r, %s, %s)" % (op, leftExpression, rightExpression)
+
+    # operator with an inline fast path when both operands are of pythonType,
+    # literals of the right type are not checked at runtime
+    def genInlineOperator(self, op, pythonOp, leftExpression, rightExpression, leftType, rightType, pythonType):
+        literalType = ast.Number if pythonType == "float" else ast.Boolean
+        checks = []
+        operands = []
+        for expression, valueType in [(leftExpression, leftType), (rightExpression, rightType)]:
+            if valueType == literalType:
+                operands.append(expression)
+            elif valueType == ast.Identifier:
+                temporary = self.getTemporary()
+                checks.append("(type(%s := %s) is %s)" % (temporary, expression, pythonType))
+                operands.append(temporary)
+            else:
+                # a literal of another type, the runtime raises the error
+                return "binary(%r, %s, %s)" % (op, leftExpression, rightExpression)
+
+        fast = "%s %s %s" % (operands[0], pythonOp, operands[1])
+        if not checks:
+            return "(" + fast + ")"
+        # & evaluates both checks, so both operands are always looked up
+        return "(%s if %s else binary(%r, %s, %s))" % (fast, " & ".join(checks), op, operands[0], operands[1])
+
+    # operator with a parenthesized operand: the operator method of the left
+    # value is called without type checks (see runtime.method)
+    def genMethodOperator(self, node):
+        left = node.left.getValue()
+        right = node.right.getValue()
+        op = node.op
+
+        # identifiers that are not parenthesized are looked up first
+        lookups = []
+        leftExpression = None
+        rightExpression = None
+        if left.type() == ast.Identifier:
+            leftExpression = self.getTemporary()
+            lookups.append("%s := %s" % (leftExpression, self.genLoad(left)))
+        if right.type() == ast.Identifier:
+            rightExpression = self.getTemporary()
+            lookups.append("%s := %s" % (rightExpression, self.genLoad(right)))
+
+        if op not in runtime.NUMBER_METHODS:
+            # BinaryOperator.interpret raises before evaluating the operands,
+            # the type of an identifier operand is the type of its value
+            types = []
+            for operand, expression in [(left, leftExpression), (right, rightExpression)]:
+                if operand.type() == ast.Identifier:
+                    types.append("rt.getNodeType(%s)" % expression)
+                else:
+                    types.append("rt.ast." + type(operand).__name__)
+            return "(%s)[-1]" % ", ".join(["(" + lookup + ")" for lookup in lookups] +
+                                          ["rt.notImplemented(%r, %s, %s)" % (op, types[0], types[1])])
+
+        if needsStatements(node.left) or needsStatements(node.right):
+            for lookup in lookups:
+                self.emit(lookup.replace(" := ", " = "))
+            if leftExpression is None:
+                leftExpression = self.genRaw(node.left)
+            boundMethod = self.getTemporary()
+            self.emit("%s = method(%r, %s)" % (boundMethod, op, leftExpression))
+            if rightExpression is None:
+                rightExpression = self.genRaw(node.right)
+            return "%s(%s)" % (boundMethod, rightExpression)
+
+        if leftExpression is None:
+            leftExpression = self.genRaw(node.left)
+        if rightExpression is None:
+            rightExpression = self.genRaw(node.right)
+        expression = "method(%r, %s)(%s)" % (op, leftExpression, rightExpression)
+        if lookups:
+            expression = "(%s, %s)[-1]" % (", ".join("(" + lookup + ")" for lookup in lookups), expression)
+        return expression
+
+    def genIfExpressionValue(self, node):
+        return self.genIf(node, True)
+
+    def genIfElseIfElseExpressionValue(self, node):
+        return self.genIf(node, True)
+
+    # emit an if - else expression, return the temporary holding its value
+    # (None when wantValue is False)
+    def genIf(self, node, wantValue):
+        result = self.getTemporary() if wantValue else None
+        self.enterScope(node.slotCount)
+
+        condition = self.getTemporary()
+        if isIdentifierResult(node.condition):
+            self.emit("conditionError('if')")
+        else:
+            self.emit("%s = %s" % (condition, self.genValue(node.condition)))
+            self.emit("if type(%s) is not bool: conditionError('if', %s)" % (condition, condition))
+
+        if node.type() == ast.IfExpression:
+            # IfExpression only executes statement bodies
+            self.emit("if %s:" % condition)
+            if node.if_body.type() == ast.Block:
+                self.genArm(node.if_body, result)
+            else:
+                self.indentation += 1
+                self.emit(("%s = None" % result) if result else "pass")
+                self.indentation -= 1
+            self.emit("else:")
+            self.indentation += 1
+            self.emit(("%s = NULL" % result) if result else "pass")
+            self.indentation -= 1
+        else:
+            self.emit("if %s:" % condition)
+            self.genArm(node.if_body, result)
+            self.genElseIfArms(node.else_if_body_list.getASTList(), node.else_body.getValue(), result)
+
+        self.exitScope()
+        return result
+
+    # the else if arms and the else arm, following ElseIfBodyList.interpret
+    def genElseIfArms(self, elseIfBodies, elseBody, result):
+        # an arm is emitted as an elif unless its condition has to be kept in
+        # a temporary, then the remaining arms are nested in an else
+        keyword = "elif"
+        nested = 0
+        for elseIfBody in elseIfBodies:
+            body = elseIfBody.getValue()
+            taken = body.type() in (ast.Expr, ast.Block)
+            pure = isPure(elseIfBody.condition)
+
+            if taken and pure and not needsStatements(elseIfBody.condition):
+                self.emit("%s isTrue(%s):" % (keyword, self.genCondition(elseIfBody.condition)))
+                self.genArm(body, result)
+                keyword = "elif"
+                continue
+
+            if keyword == "elif":
+                self.emit("else:")
+                self.indentation += 1
+                nested += 1
+            condition = self.getTemporary()
+            self.emit("%s = %s" % (condition, self.genCondition(elseIfBody.condition)))
+            # an arm with a body that is neither an Expr nor a Block is never
+            # taken, its condition is evaluated a second time
+            self.emit("if isTrue(%s) and %r:" % (condition, taken))
+            self.genArm(body, result)
+            self.emit("else:")
+            self.indentation += 1
+            nested += 1
+            if not pure:
+                self.emit("isFalse(%s)" % self.genCondition(elseIfBody.condition))
+            keyword = "if"
+
+        if keyword == "elif":
+            self.emit("else:")
+            self.genArm(elseBody, result)
+        else:
+            self.indentation -= 1
+            self.genArm(elseBody, result)
+            self.indentation += 1
+        self.indentation -= nested
+
+    # condition of an else if arm, an identifier has no isTrue method
+    def genCondition(self, condition):
+        if isIdentifierResult(condition):
+            return "noAttribute('Identifier', 'isTrue')"
+        return self.genValue(condition)
+
+    # body of an arm: the value of an Expr body, Null after a statement body
+    # and None for other bodies (which are not evaluated)
+    def genArm(self, body, result):
+        if body.type() == ast.Block:
+            self.genBody(body)
+            value = "NULL"
+        elif body.type() == ast.Expr:
+            # an identifier is looked up even when the value is not used
+            self.indentation += 1
+            value = self.genValue(body)
+            self.indentation -= 1
+        else:
+            value = "None"
+
+        self.indentation += 1
+        if result:
+            self.emit("%s = %s" % (result, value))
+        elif body.type() == ast.Expr:
+            self.emit(value)
+        elif body.type() != ast.Block:
+            self.emit("pass")
+        self.indentation -= 1
+
+
+# python source of the resolved program block
+def transpile(block):
+    return Transpiler().transpile(block)
+
+
+# compile the resolved program block to a Python code object
+def compileProgram(block, filename="<mini-js>"):
+    return compile(transpile(block), filename, "exec")
+
+
+# run a compiled program, return its global variables (name -> value)
+def run(code, output=None, globals=None):
+    namespace = {}
+    exec(code, namespace)
+    return namespace[PROGRAM_FUNCTION](runtime, output, globals or {})
@@ -0,0 +1,553 @@
+# Program to define the vectorized evaluation of programs over columns
+#
+# A program made of assignments and if - else if - else expressions (e.g. a
+# formula over the rows of a dataset) can be run once over whole columns of
+# values instead of once per row:
+#
+#   prog = vectorize.VectorProgram.fromString("c = if (a < b) { (a * 2) } else { b };")
+#   prog.run({"a": numpy.array([1, 5]), "b": numpy.array([3, 4])})["c"]   # array([2., 4.])
+#
+# Every identifier is bound to a NumPy array holding its value in every row
+# (numbers as float64, booleans as bool, strings as object arrays); a scalar
+# is used for every row. Operators are evaluated as whole-array operations,
+# and the arms of if - else expressions run only on the rows whose condition
+# selects them (boolean masks). Row i of the result is what running the
+# program with the values of row i gives (Program.run), including the type
+# rules and quirks of the tree-walker. An error the program raises for any
+# row (a type error, a division by zero, ...) is raised for the columns.
+#
+# Loops and print statements are not supported, nor using a value whose type
+# differs from row to row (e.g. an if - else with a number in one arm and a
+# boolean in another): VectorizeError is raised, run the program per row.
+#
+# NumPy is optional, it is only imported when it is installed and is only
+# needed to create a VectorProgram.
+
+import ast
+import program
+import stdlib
+
+try:
+    numpy = stdlib.importModule("numpy")
+except ImportError:
+    numpy = None
+
+
+class VectorizeError(Exception):
+    pass
+
+
+# the value method called for every operator of the number branch of
+# BinaryOperator.interpret
+NUMBER_METHODS = {
+    "+": "add",
+    "-": "minus",
+    "*": "multiply",
+    "/": "divide",
+    ">=": "greater_than_or_equal_to",
+    "<=": "less_than_or_equal_to",
+    ">": "greater_than",
+    "<": "less_than",
+    "==": "equal_to",
+    "!=": "not_equal_to",
+}
+
+# operators of the boolean branch of BinaryOperator.interpret
+BOOLEAN_OPERATORS = ("||", "&&", "==", "!=")
+
+# value types kept as one array element per row, with the dtype of the array
+ARRAY_TYPES = {
+    ast.Number: "float64",
+    ast.Boolean: "bool",
+    ast.String: "object",
+}
+
+
+# the values of one expression in every row of a frame. Values of the types
+# in ARRAY_TYPES are kept in an array (data), every other value is the same
+# object in every row (e.g. NULL or an Identifier) and data is that object.
+# valueType is None when the rows hold values of different types.
+class Value(object):
+    def __init__(self, valueType, data):
+        self.valueType = valueType
+        self.data = data
+
+    def isArray(self):
+        return self.valueType in ARRAY_TYPES
+
+    # a value of the type of the rows, to call the methods the tree-walker
+    # calls on every row (they raise the same errors)
+    def getSample(self):
+        if self.valueType is None:
+            raise VectorizeError("the rows hold values of different types")
+        if self.valueType is ast.Number:
+            return ast.Number(1.0)
+        if self.valueType is ast.Boolean:
+            return ast.TRUE
+        if self.valueType is ast.String:
+            return ast.String("")
+        return self.data
+
+    # the values of the selected rows (index array, None for every row)
+    def select(self, selection):
+        if selection is None or not self.isArray():
+            return self
+        return Value(self.valueType, self.data[selection])
+
+
+MIXED = Value(None, None)
+
+
+# an operand wrapped in an Expr of the type BinaryOperator.interpret checks
+def getSampleOfType(valueType):
+    if valueType is ast.ParentheseValue:
+        return ast.ParentheseValue(ast.Expr(ast.Number(1.0)))
+    if valueType is ast.Null:
+        return ast.NULL
+    if valueType in ARRAY_TYPES:
+        return Value(valueType, None).getSample()
+    raise VectorizeError("values of type " + valueType.__name__ + " cannot be evaluated on columns")
+
+
+# the value of every row set to the same runtime value
+def toValue(value, rows):
+    valueType = type(value)
+    if valueType in ARRAY_TYPES:
+        return Value(valueType, numpy.full(rows, value.getValue(), dtype=ARRAY_TYPES[valueType]))
+    return Value(valueType, value)
+
+
+# the value of rows of a column passed to VectorProgram.run
+def toColumn(column, rows):
+    if column is None:
+        return Value(ast.Null, ast.NULL)
+
+    array = numpy.asarray(column)
+    if array.dtype.kind == "b":
+        valueType = ast.Boolean
+    elif array.dtype.kind in "iuf":
+        valueType = ast.Number
+    elif array.dtype.kind in "UO" and all(isinstance(value, str) for value in array.flat):
+        valueType = ast.String
+    else:
+        raise ast.TypeError("Column of type " + str(array.dtype) + " cannot be converted to mini-js values")
+
+    if array.ndim == 0:
+        array = numpy.full(rows, array.item(), dtype=ARRAY_TYPES[valueType])
+    return Value(valueType, array.astype(ARRAY_TYPES[valueType]))
+
+
+def fromValue(value):
+    if value.valueType is None:
+        raise VectorizeError("the rows hold values of different types")
+    if value.isArray():
+        return value.data
+    return program.fromNode(value.data)
+
+
+# the text of every row of a String or Number value, numbers are converted
+# as ast.concatenate does
+def getTexts(value):
+    if value.valueType is ast.String:
+        return value.data
+    return numpy.array([str(number) for number in value.data.tolist()], dtype=object)
+
+
+# "+" of String and Number values, one concatenation per row
+def concatenate(leftValue, rightValue):
+    return Value(ast.String, numpy.add(getTexts(leftValue), getTexts(rightValue)))
+
+
+# the values of row selection of old replaced by new
+def updateRows(old, selection, new):
+    if old.valueType is not new.valueType:
+        return MIXED
+    if not old.isArray():
+        return old
+    data = old.data.copy()
+    data[selection] = new.data
+    return Value(old.valueType, data)
+
+
+# the variables of a scope (see Context) for every row the scope is entered
+# in. A variable declared in an arm of an if - else is only defined in the
+# rows that run the arm, undefined marks the other rows.
+class Scope(object):
+    def __init__(self, rows, outerScope=None, outerSelection=None):
+        self.rows = rows
+        self.outerScope = outerScope
+
+        # the rows of the outer scope the rows of this scope are (index
+        # array, None when they are the same rows)
+        self.outerSelection = outerSelection
+
+        # name -> Value for every row
+        self.values = {}
+        # name -> bool array of the rows the name is not defined in
+        self.undefined = {}
+
+    # is name defined in every row of selection (None when it is defined
+    # in none of them)
+    def isDefined(self, name, selection):
+        if name not in self.values:
+            return None
+        undefined = self.undefined.get(name)
+        if undefined is None:
+            return True
+        if selection is not None:
+            undefined = undefined[selection]
+        if undefined.all():
+            return None
+        if undefined.any():
+            raise VectorizeError("identifier \"" + name + "\" is only defined in some rows")
+        return True
+
+    def set(self, name, selection, value):
+        if selection is None:
+            self.values[name] = value
+            self.undefined.pop(name, None)
+            return
+
+        if name not in self.values:
+            # declared in the selected rows only
+            if value.isArray():
+                self.values[name] = Value(value.valueType, numpy.empty(self.rows, dtype=ARRAY_TYPES[value.valueType]))
+            else:
+                self.values[name] = value
+            self.undefined[name] = numpy.ones(self.rows, dtype=bool)
+        self.values[name] = updateRows(self.values[name], selection, value)
+        if name in self.undefined:
+            self.undefined[name][selection] = False
+
+
+# some rows of a scope, code runs on a frame (selection is an index array of
+# the rows of the scope, None for every row)
+class Frame(object):
+    def __init__(self, scope, selection=None):
+        self.scope = scope
+        self.selection = selection
+
+    def getRows(self):
+        if self.selection is None:
+            return self.scope.rows
+        return len(self.selection)
+
+    # the frame of the rows of selection (an index array of the rows of
+    # this frame) in the same scope
+    def select(self, selection):
+        if self.selection is not None:
+            selection = self.selection[selection]
+        return Frame(self.scope, selection)
+
+    # the frame of a scope nested in this one
+    def enterScope(self):
+        return Frame(Scope(self.getRows(), self.scope, self.selection))
+
+    # the scope defining name in the rows of the frame (see Context.lookup)
+    # and the rows of the frame in that scope
+    def find(self, name):
+        scope = self.scope
+        selection = self.selection
+        while scope is not None:
+            if scope.isDefined(name, selection):
+                return scope, selection
+            if scope.outerSelection is not None:
+                selection = scope.outerSelection if selection is None else scope.outerSelection[selection]
+            scope = scope.outerScope
+        return None, None
+
+    def lookup(self, name):
+        scope, selection = self.find(name)
+        if scope is None:
+            raise ast.ContextError(
+                "Identifier \"" + name + "\" specified is not in the scope of the context!")
+        return scope.values[name].select(selection)
+
+    # assign like Context.add: update the scope defining name, otherwise
+    # declare it in the scope of the frame
+    def add(self, name, value):
+        scope, selection = self.find(name)
+        if scope is None:
+            scope, selection = self.scope, self.selection
+        scope.set(name, selection, value)
+
+
+# the operations of NumPy doing what the value methods do on every row
+def getOperation(op):
+    return {
+        "+": numpy.add,
+        "-": numpy.subtract,
+        "*": numpy.multiply,
+        "/": numpy.true_divide,
+        ">=": numpy.greater_equal,
+        "<=": numpy.less_equal,
+        ">": numpy.greater,
+        "<": numpy.less,
+        "==": numpy.equal,
+        "!=": numpy.not_equal,
+        "||": numpy.logical_or,
+        "&&": numpy.logical_and,
+    }[op]
+
+
+class Vectorizer(object):
+    def visit(self, node, frame):
+        # dispatch on the AST class, e.g. visitBinaryOperator
+        method = getattr(self, "visit" + type(node).__name__, None)
+        if method is None:
+            raise VectorizeError(type(node).__name__ + " cannot be evaluated on columns")
+        return method(node, frame)
+
+    # statements, a block has the value of its last statement
+
+    def visitBlock(self, node, frame):
+        value = toValue(None, 0)
+        for statement in node.getASTList():
+            value = self.visit(statement, frame)
+        return value
+
+    def visitStatement(self, node, frame):
+        return self.visit(node.expr, frame)
+
+    # values
+
+    def visitNumber(self, node, frame):
+        return toValue(node, frame.getRows())
+
+    visitString = visitNumber
+    visitBoolean = visitNumber
+
+    def visitIdentifier(self, node, frame):
+        return Value(ast.Identifier, node)
+
+    def visitExpr(self, node, frame):
+        return self.visit(node.getValue(), frame)
+
+    def visitParentheseValue(self, node, frame):
+        return self.visit(node.value, frame)
+
+    # expressions
+
+    def visitAssignmentExpression(self, node, frame):
+        identifier = self.visit(node.identifier, frame)
+        value = self.visit(node.expr, frame)
+
+        if identifier.getSample().type() != ast.Identifier:
+            raise ast.AssignmentError(
+                "LHS of assignment statement must be an identifier")
+        if value.getSample().type() == ast.Identifier:
+            value = frame.lookup(value.data.getValue())
+        frame.add(identifier.data.getValue(), value)
+        return value
+
+    # the value of an operand: left.interpret(ctx) in BinaryOperator.interpret
+    def interpretOperand(self, operand, lookedUp, frame):
+        if lookedUp is None:
+            return self.visit(operand, frame)
+        if lookedUp.isArray():
+            return lookedUp
+        return toValue(lookedUp.data.interpret(None), frame.getRows())
+
+    def visitBinaryOperator(self, node, frame):
+        op = node.op
+        left = node.left
+        right = node.right
+
+        # identifiers are looked up first and the operands are typed by what
+        # they are wrapped in, like BinaryOperator.interpret does
+        leftLookedUp = None
+        rightLookedUp = None
+        if (left.getValue().type() == ast.Identifier):
+            leftLookedUp = frame.lookup(left.getValue().getValue())
+        if (right.getValue().type() == ast.Identifier):
+            rightLookedUp = frame.lookup(right.getValue().getValue())
+        leftType = leftLookedUp.getSample().type() if leftLookedUp is not None else left.getValue().type()
+        rightType = rightLookedUp.getSample().type() if rightLookedUp is not None else right.getValue().type()
+
+        isParenthesized = ast.ParentheseValue in (leftType, rightType)
+        if (leftType == rightType == ast.Number or isParenthesized) and op in NUMBER_METHODS:
+            leftValue = self.interpretOperand(left, leftLookedUp, frame)
+            # the method must exist before the right operand is evaluated
+            method = getattr(leftValue.getSample(), NUMBER_METHODS[op])
+            rightValue = self.interpretOperand(right, rightLookedUp, frame)
+            return self.applyNumberMethod(op, method, leftValue, rightValue, frame)
+
+        if (op == "+" and ast.String in (leftType, rightType) and
+                leftType in ast.TEXT_TYPES and rightType in ast.TEXT_TYPES):
+            leftValue = self.interpretOperand(left, leftLookedUp, frame)
+            rightValue = self.interpretOperand(right, rightLookedUp, frame)
+            return concatenate(leftValue, rightValue)
+
+        if leftType == rightType == ast.Boolean and not isParenthesized and op in BOOLEAN_OPERATORS:
+            leftValue = self.interpretOperand(left, leftLookedUp, frame)
+            rightValue = self.interpretOperand(right, rightLookedUp, frame)
+            return Value(ast.Boolean, getOperation(op)(leftValue.data, rightValue.data))
+
+        # NotImplementedError or TypeError, raised by the tree-walker itself
+        # on operands of the same types
+        samples = [ast.Expr(getSampleOfType(leftType)), ast.Expr(getSampleOfType(rightType))]
+        ast.BinaryOperator(op, samples[0], samples[1]).interpret(ast.Context())
+        raise VectorizeError("operator \"" + op + "\" cannot be evaluated on columns")
+
+    def applyNumberMethod(self, op, method, leftValue, rightValue, frame):
+        numeric = (ast.Number, ast.Boolean)
+        if leftValue.valueType in numeric and rightValue.valueType in numeric:
+            if op == "/" and not numpy.all(rightValue.data):
+                raise ZeroDivisionError("float division by zero")
+            result = getOperation(op)(leftValue.data, rightValue.data)
+            return Value(ast.Number if result.dtype.kind == "f" else ast.Boolean, result)
+
+        # raises the error of the tree-walker, except for == and != which
+        # compare values of different types (never equal)
+        result = method(rightValue.getSample())
+        if op == "+" and result.type() == ast.String:
+            return concatenate(leftValue, rightValue)
+        if op in ("==", "!="):
+            return toValue(result, frame.getRows())
+        raise VectorizeError("operator \"" + op + "\" cannot be evaluated on columns")
+
+    def visitIfExpression(self, node, frame):
+        frame = frame.enterScope()
+        condition = self.visit(node.condition, frame)
+        if (condition.getSample().type() != ast.Boolean):
+            raise ast.ConditionError(
+                "Conditional statement of if statement must be type Boolean.")
+
+        # a true condition with a body other than statements evaluates to
+        # None (see IfExpression.interpret), a false one to NULL
+        taken = numpy.flatnonzero(condition.data)
+        value = toValue(None, 0)
+        if (node.if_body.type() == ast.Block):
+            if len(taken):
+                self.visit(node.if_body, frame.select(taken))
+            value = toValue(ast.NULL, 0)
+        arms = [(taken, value), (numpy.flatnonzero(~condition.data), toValue(ast.NULL, 0))]
+        return self.merge(arms, frame.getRows())
+
+    def visitIfElseIfElseExpression(self, node, frame):
+        frame = frame.enterScope()
+        arms = []
+        for selection, value in self.interpretArms(node, frame):
+            # an identifier is looked up in the scope it was resolved in
+            sample = value.getSample()
+            if (sample is not None and sample.type() == ast.Identifier):
+                value = frame.select(selection).lookup(sample.getValue())
+            arms.append((selection, value))
+        return self.merge(arms, frame.getRows())
+
+    # (rows, value) of every arm of the if - else if - else that rows run,
+    # see IfElseIfElseExpression.interpretArms and ElseIfBodyList.interpret
+    def interpretArms(self, node, frame):
+        condition = self.visit(node.condition, frame)
+        if (condition.getSample().type() != ast.Boolean):
+            raise ast.ConditionError(
+                "Conditional statement of if statement must be type Boolean.")
+
+        arms = []
+        taken = numpy.flatnonzero(condition.data)
+        if len(taken):
+            value = self.interpretBody(node.if_body, frame.select(taken))
+            arms.append((taken, value if value is not None else toValue(None, 0)))
+
+        rest = numpy.flatnonzero(~condition.data)
+        for elseIfBody in node.else_if_body_list.getASTList():
+            if not len(rest):
+                return arms
+            condition = self.visit(elseIfBody.condition, frame.select(rest))
+            # raises like the tree-walker when the condition is no Boolean
+            condition.getSample().isTrue
+            notTaken = rest
+            if elseIfBody.getValue().type() in (ast.Expr, ast.Block):
+                taken = rest[condition.data]
+                notTaken = rest[~condition.data]
+                if len(taken):
+                    arms.append((taken, self.interpretBody(elseIfBody.getValue(), frame.select(taken))))
+
+            # the condition is evaluated again for the rows that go on
+            if len(notTaken):
+                self.visit(elseIfBody.condition, frame.select(notTaken)).getSample().isFalse
+            rest = notTaken
+
+        if len(rest):
+            value = self.interpretBody(node.else_body.getValue(), frame.select(rest))
+            arms.append((rest, value if value is not None else toValue(None, 0)))
+        return arms
+
+    # the value of an arm body, None for bodies that are neither an Expr
+    # nor a Block
+    def interpretBody(self, body, frame):
+        if (body.type() == ast.Expr):
+            return self.visit(body, frame)
+        if (body.type() == ast.Block):
+            self.visit(body, frame)
+            return toValue(ast.NULL, 0)
+        return None
+
+    # the value of every row from the values of the arms (disjoint rows)
+    def merge(self, arms, rows):
+        arms = [(selection, value) for selection, value in arms if len(selection)]
+        if len(arms) == 1 and len(arms[0][0]) == rows:
+            return arms[0][1]
+
+        valueTypes = set(value.valueType for selection, value in arms)
+        if len(valueTypes) != 1 or None in valueTypes:
+            return MIXED
+        valueType = valueTypes.pop()
+        if valueType not in ARRAY_TYPES:
+            return arms[0][1]
+
+        data = numpy.empty(rows, dtype=ARRAY_TYPES[valueType])
+        for selection, value in arms:
+            data[selection] = value.data
+        return Value(valueType, data)
+
+
+class VectorProgram(object):
+    def __init__(self, parsedAST):
+        if numpy is None:
+            raise ImportError("vectorized evaluation needs NumPy")
+        self.parsedAST = parsedAST
+
+    @staticmethod
+    def fromString(rawProgramString):
+        return VectorProgram(program.parseString(rawProgramString))
+
+    @staticmethod
+    def fromFile(filename, useCache=True):
+        return VectorProgram(program.parseFile(filename, useCache))
+
+    # run the program over columns (name -> array or scalar), return the
+    # frame of the global scope and the value of the last statement
+    def execute(self, columns):
+        rows = None
+        for column in columns.values():
+            if column is not None and numpy.ndim(column) > 0:
+                if rows is not None and len(column) != rows:
+                    raise ValueError("columns of different lengths")
+                rows = len(column)
+        if rows is None:
+            rows = 1
+
+        scope = Scope(rows)
+        for name, column in columns.items():
+            scope.set(name, None, toColumn(column, rows))
+
+        frame = Frame(scope)
+        with numpy.errstate(all="ignore"):
+            value = Vectorizer().visit(self.parsedAST, frame)
+        return frame, value
+
+    # run the program and return the global variables after the run, each
+    # an array (one value per row) or a Python value (the same in every row)
+    def run(self, columns):
+        frame, value = self.execute(columns)
+        return dict((name, fromValue(value)) for name, value in frame.scope.values.items())
+
+    # the value of the last statement of the program (an expression, an
+    # identifier is looked up) in every row
+    def evaluate(self, columns):
+        frame, value = self.execute(columns)
+        sample = value.getSample()
+        if sample is not None and sample.type() == ast.Identifier:
+            value = frame.lookup(sample.getValue())
+        return fromValue(value)
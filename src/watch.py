@@ -0,0 +1,438 @@
+# Program to define the watch mode (mini-js --watch FILE)
+#
+# the program is executed again every time its file changes, until
+# interrupted. Between two runs an IncrementalProgram keeps the text of the
+# program, the parsed program Block, the source range (from its first to its
+# last token) and the first line of every top-level statement. The line
+# numbers of the nodes are relative to the first line of their top-level
+# statement (1 on that line), so a statement does not change when lines are
+# added or removed before it. When the file changes, only the lines between
+# the first and the last changed character are lexed and parsed again,
+# together with the statements they overlap; the new statements replace the
+# old ones in the Block and the source ranges and first lines of the
+# statements after them are moved.
+#
+# A token never spans a newline, so lexing can start at the beginning of any
+# line; statements are split like stream.py does. When the changed lines do
+# not parse on their own (e.g. a brace opened there is closed further down),
+# the whole program is parsed again, which also reports syntax errors
+# exactly like a normal run.
+#
+# The program is optimized, resolved and compiled for the engine one
+# top-level statement at a time (PreparedProgram), only the new statements
+# are prepared again. Every run executes the prepared statements in order in
+# one global scope, like a normal run of the whole program.
+
+import os
+import sys
+import time
+import traceback
+from bisect import bisect_left, bisect_right
+
+import ast
+import closure
+import compiler
+import interpreter
+import loops
+import optimizer
+import program
+import resolver
+import stream
+import transpiler
+
+# seconds between two checks of the file
+POLL_INTERVAL = 0.2
+
+
+# length of the common prefix of two strings (compared in C, in halves)
+def getCommonPrefix(old, new):
+    low = 0
+    high = min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[low:middle] == new[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+# length of the common suffix of two strings, at most limit characters
+def getCommonSuffix(old, new, limit):
+    low = 0
+    high = limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[len(old) - middle:len(old) - low] == new[len(new) - middle:len(new) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+# offset of the first character of the line containing offset
+def getLineStart(text, offset):
+    return text.rfind("\n", 0, offset) + 1
+
+
+# offset after the newline ending the line containing offset
+def getLineEnd(text, offset):
+    end = text.find("\n", offset)
+    return len(text) if end < 0 else end + 1
+
+
+# add delta to the line of every node of the tree (makes the lines of a
+# parsed statement relative to its first line)
+def shiftLines(node, delta):
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        if node.lineno is not None:
+            node.lineno += delta
+        for value in node.getFields().values():
+            if isinstance(value, ast.Node):
+                nodes.append(value)
+            elif isinstance(value, list):
+                nodes.extend(value)
+
+
+# increasing numbers of the top-level statements (source offsets or lines)
+# that move when statements before them are replaced. The numbers from index
+# on are stored without the shift added to them, so moving the numbers after
+# an edit only updates the numbers between the previous edit and this one.
+class ShiftedTable(object):
+    def __init__(self, values):
+        self.values = values
+        self.index = len(values)
+        self.shift = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if index >= self.index:
+            return self.values[index] + self.shift
+        return self.values[index]
+
+    def bisectLeft(self, value):
+        index = bisect_left(self.values, value, 0, self.index)
+        if index < self.index:
+            return index
+        return bisect_left(self.values, value - self.shift, self.index)
+
+    def bisectRight(self, value):
+        index = bisect_right(self.values, value, 0, self.index)
+        if index < self.index:
+            return index
+        return bisect_right(self.values, value - self.shift, self.index)
+
+    # replace the numbers first to last - 1 by values and add delta to the
+    # numbers after them
+    def replace(self, first, last, values, delta):
+        if self.shift == 0:
+            # the numbers are stored as they are on both sides of index
+            self.values[first:last] = values
+        elif first <= self.index:
+            # the numbers stored as they are up to index move with the others
+            end = max(last, self.index)
+            self.values[first:end] = values + [value - self.shift for value in self.values[last:end]]
+        else:
+            self.values[self.index:last] = [value + self.shift for value in self.values[self.index:first]] + values
+        self.index = first + len(values)
+        self.shift += delta
+
+
+# a top-level statement prepared for the engine
+class PreparedStatement(object):
+    def __init__(self, block):
+        # the optimized statement in a program block of its own, without
+        # statements when the optimizer removed it
+        self.block = block
+        # the identifier it definitely defines for the statements after it
+        self.definedName = None
+        for statement in block.getASTList():
+            if statement.type() == ast.Statement:
+                self.definedName = resolver.getDefinedName(statement.expr)
+        # the names of the identifiers it uses (not for the vm engine)
+        self.names = set()
+        # the statement compiled for the engine
+        self.code = None
+
+
+# the program optimized, resolved (resolver.StatementResolver) and compiled
+# for the engine one top-level statement at a time. Replacing statements
+# prepares the new statements, and the statements after them that use
+# identifiers which now resolve differently: a global variable assigned for
+# the first time, or an identifier that is now definitely defined by more or
+# fewer statements before them (the statements before the new ones run
+# before these can change a variable). The bytecode interpreter looks up
+# identifiers by name, the vm engine only compiles the new statements.
+class PreparedProgram(object):
+    def __init__(self, engine="tree", level=0):
+        self.engine = engine
+        self.level = level
+        self.resolver = resolver.StatementResolver()
+        # PreparedStatement of every top-level statement, and its definedName
+        self.statements = []
+        self.definedNames = []
+        # identifier name -> the prepared statements using it
+        self.users = {}
+
+    # whether a statement before index definitely defines the name
+    def isDefinedBefore(self, name, index):
+        try:
+            self.definedNames.index(name, 0, index)
+        except ValueError:
+            return False
+        return True
+
+    # replace the prepared statements first to last - 1 by the parsed
+    # statements; nothing is replaced when preparing them raises an error
+    def update(self, first, last, statements):
+        globalCount = len(self.resolver.globalScope.slots)
+
+        # only the assignments of a statement depend on the identifiers
+        # defined before it
+        definite = set()
+        preparedStatements = []
+        for statement in statements:
+            prepared = PreparedStatement(optimizer.optimize(ast.Block([statement]), self.level))
+            for name in loops.getAssignedNames(prepared.block):
+                if self.isDefinedBefore(name, first):
+                    definite.add(name)
+            self.prepare(prepared, definite)
+            if prepared.definedName is not None:
+                definite.add(prepared.definedName)
+            preparedStatements.append(prepared)
+
+        for prepared in self.statements[first:last]:
+            for name in prepared.names:
+                self.users[name].discard(prepared)
+        for prepared in preparedStatements:
+            for name in prepared.names:
+                self.users.setdefault(name, set()).add(prepared)
+
+        definedNames = [prepared.definedName for prepared in preparedStatements]
+        changed = set(self.definedNames[first:last]).symmetric_difference(definedNames)
+        changed = set(name for name in changed if name is not None and not self.isDefinedBefore(name, first))
+        globalNames = self.resolver.globalScope.slots
+        if len(globalNames) > globalCount:
+            changed.update(list(globalNames)[globalCount:])
+        self.statements[first:last] = preparedStatements
+        self.definedNames[first:last] = definedNames
+        if changed:
+            self.prepareUsers(changed, first + len(preparedStatements))
+
+    # prepare the statements from start on that use the names again, each
+    # with the identifiers defined before it
+    def prepareUsers(self, names, start):
+        users = set()
+        for name in names:
+            users.update(self.users.get(name, ()))
+        if not users:
+            return
+
+        definite = set(self.definedNames[:start])
+        for index in range(start, len(self.statements)):
+            prepared = self.statements[index]
+            if prepared in users:
+                self.prepare(prepared, definite)
+            if prepared.definedName is not None:
+                definite.add(prepared.definedName)
+
+    def prepare(self, prepared, definite):
+        block = prepared.block
+        if self.engine == "vm":
+            prepared.code = compiler.Compiler().compileProgram(block)
+            return
+
+        for statement in block.getASTList():
+            prepared.names = self.resolver.resolveStatement(statement, definite)
+        if self.engine == "python":
+            # the global variables of the statement are read from and
+            # written back to the global variables of the run
+            slots = self.resolver.globalScope.slots
+            block.globalNames = dict((name, slots[name]) for name in prepared.names if name in slots)
+            prepared.code = transpiler.compileProgram(block)
+        elif self.engine == "closure":
+            prepared.code = closure.compileProgram(block)
+        else:
+            prepared.code = block.interpret
+
+    # execute the statements in order in one global scope
+    def execute(self, output):
+        if self.engine == "vm":
+            vm = interpreter.Interpreter(interpreter.Bytecode([], [], []), None, output)
+            for prepared in self.statements:
+                vm.runBytecode(prepared.code)
+        elif self.engine == "python":
+            globalValues = {}
+            for prepared in self.statements:
+                globalValues.update(transpiler.run(prepared.code, output, globalValues))
+        else:
+            ctx = ast.Context(len(self.resolver.globalScope.slots), None, output)
+            for prepared in self.statements:
+                prepared.code(ctx)
+
+
+class IncrementalProgram(object):
+    def __init__(self, rawProgramString, engine="tree", level=0):
+        self.text = ""
+        self.block = ast.Block([])
+        # source range and first line of every top-level statement of the
+        # block
+        self.starts = ShiftedTable([])
+        self.ends = ShiftedTable([])
+        self.lines = ShiftedTable([])
+        self.prepared = PreparedProgram(engine, level)
+        self.update(rawProgramString)
+
+    # statements of text[start:end] (start is the beginning of line
+    # startLine), their source ranges and first lines
+    def parseLines(self, text, start, end, startLine=1):
+        parser = program.getParser()
+        tokens = stream.lexChunks(program.getLexer(), [text[start:end]], start, startLine - 1)
+
+        starts = []
+        ends = []
+        lines = []
+        statements = []
+        for statementTokens in stream.splitStatements(tokens):
+            first = statementTokens[0]
+            last = statementTokens[-1]
+            line = first.getsourcepos().lineno
+            for statement in parser.parse(iter(statementTokens)).getASTList():
+                shiftLines(statement, 1 - line)
+                statements.append(statement)
+                starts.append(first.getsourcepos().idx)
+                ends.append(last.getsourcepos().idx + len(last.getstr()))
+                lines.append(line)
+        return starts, ends, lines, statements
+
+    # parse the whole text, syntax errors are raised like a normal run does
+    def parseAll(self, text):
+        try:
+            starts, ends, lines, statements = self.parseLines(text, 0, len(text))
+        except Exception:
+            statements = None
+        if not statements:
+            # a syntax error, or a program without statements
+            program.parseString(text)
+            raise SyntaxError("the top-level statements of the program cannot be parsed one by one")
+        self.prepared.update(0, len(self.prepared.statements), statements)
+        self.starts = ShiftedTable(starts)
+        self.ends = ShiftedTable(ends)
+        self.lines = ShiftedTable(lines)
+        self.text = text
+        self.block = ast.Block(statements)
+
+    # update the program to the new text, returns the number of statements
+    # parsed again (0 when the text did not change)
+    def update(self, text):
+        old = self.text
+        if text == old:
+            return 0
+        if not self.block.getASTList():
+            self.parseAll(text)
+            return len(self.block.getASTList())
+
+        prefix = getCommonPrefix(old, text)
+        suffix = getCommonSuffix(old, text, min(len(old), len(text)) - prefix)
+
+        # the changed lines of the old text, extended to the lines of the
+        # statements they overlap: statements first to last - 1
+        start = getLineStart(old, prefix)
+        oldEnd = getLineEnd(old, len(old) - suffix)
+        while True:
+            first = self.ends.bisectRight(start)
+            last = self.starts.bisectLeft(oldEnd)
+            if first >= last:
+                break
+            newStart = min(start, getLineStart(old, self.starts[first]))
+            newEnd = max(oldEnd, getLineEnd(old, self.ends[last - 1] - 1))
+            if (newStart, newEnd) == (start, oldEnd):
+                break
+            start, oldEnd = newStart, newEnd
+
+        # the line of start, counted from the statement before it
+        if first > 0:
+            line = self.lines[first - 1] + old.count("\n", self.starts[first - 1], start)
+        else:
+            line = 1 + old.count("\n", 0, start)
+
+        delta = len(text) - len(old)
+        newEnd = oldEnd + delta
+        try:
+            starts, ends, lines, statements = self.parseLines(text, start, newEnd, line)
+        except Exception:
+            # e.g. a statement that now continues after the changed lines
+            statements = None
+        if statements is None or (not statements and first == 0 and last == len(self.starts)):
+            # every statement was removed: raises the error of a normal run
+            self.parseAll(text)
+            return len(self.block.getASTList())
+
+        self.prepared.update(first, last, statements)
+        self.block.getASTList()[first:last] = statements
+        self.starts.replace(first, last, starts, delta)
+        self.ends.replace(first, last, ends, delta)
+        self.lines.replace(first, last, lines, text.count("\n", start, newEnd) - old.count("\n", start, oldEnd))
+        self.text = text
+        return len(statements)
+
+
+# the modification time and size of the file, None when it cannot be read
+def getFileState(filename):
+    try:
+        status = os.stat(filename)
+    except OSError:
+        return None
+    return status.st_mtime_ns, status.st_size
+
+
+# execute the program every time its file changes, until interrupted.
+# getOutput() returns the output of a run (a context manager, see output.py)
+def run(filename, engine="tree", level=0, getOutput=None, stdout=None, stderr=None, interval=POLL_INTERVAL):
+    if stdout is None:
+        stdout = sys.stdout
+    if stderr is None:
+        stderr = sys.stderr
+
+    watched = None
+    state = None
+    try:
+        while True:
+            newState = getFileState(filename)
+            if newState is None or newState == state:
+                time.sleep(interval)
+                continue
+            state = newState
+
+            start = time.perf_counter()
+            try:
+                text = program.getRawProgramString(filename)
+                if watched is None:
+                    watched = IncrementalProgram(text, engine, level)
+                    parsed = len(watched.block.getASTList())
+                else:
+                    parsed = watched.update(text)
+                elapsed = time.perf_counter() - start
+            except Exception:
+                stderr.write(traceback.format_exc())
+                stderr.flush()
+                continue
+
+            print("watch: %s: %d of %d statements parsed and prepared in %.1f ms" %
+                  (filename, parsed, len(watched.block.getASTList()), elapsed * 1e3), file=stderr, flush=True)
+            print("\n>>> Executing >>>", file=stdout, flush=True)
+            try:
+                with getOutput() as programOutput:
+                    watched.prepared.execute(programOutput)
+            except Exception:
+                stderr.write(traceback.format_exc())
+                stderr.flush()
+                continue
+            print("<<< Terminated <<<\n", file=stdout, flush=True)
+    except KeyboardInterrupt:
+        pass
+    return 0